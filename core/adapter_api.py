@@ -8,12 +8,13 @@ import pandas as pd
 from datetime import datetime
 from .research.experiment import run_walkforward_xgb
 from .research.portfolio import backtest_portfolio
-from .research.factors import compute_alpha_factors, compute_pca_diagnostics
 from .research.models import feature_columns
 from .research.stats import sharpe_ratio, sortino_ratio, max_drawdown, cagr_from_equity
 from .research.decay import compute_signal_decay
 from .research.ff import fama_french_exposure
-import yfinance as yf
+from .research.marketdata import get_ohlcv, get_close
+from .research.warmup import DEFAULT_UNIVERSE
+from .research.precompute import factor_table, pca_diagnostics
 import numpy as np
 
 adapter_bp = Blueprint('adapter', __name__, url_prefix='/api')
@@ -76,20 +77,8 @@ def compute_factors_adapter():
     try:
         # Use first ticker for demo
         ticker = tickers[0]
-        px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-        
-        if px_raw.empty:
-            return jsonify({"error": f"No data for {ticker}"}), 400
-        
-        # Flatten if needed
-        if isinstance(px_raw.columns, pd.MultiIndex):
-            px_raw.columns = px_raw.columns.get_level_values(0)
-        
-        # Get SPY/VIX for cross-asset factors
-        spy = yf.download("SPY", start=start, auto_adjust=True, progress=False)['Close']
-        vix = yf.download("^VIX", start=start, auto_adjust=True, progress=False)['Close']
-        
-        df = compute_alpha_factors(px_raw, spy=spy, vix=vix, sector=None)
+        # factor table (with SPY/VIX cross-asset factors) from the factor store
+        df = factor_table(ticker, start)
         cols = feature_columns(df)
         
         # Return last 100 rows
@@ -101,6 +90,8 @@ def compute_factors_adapter():
             "row_count": len(preview),
             "data": preview.reset_index().to_dict(orient='records')
         })
+    except RuntimeError as e:  # no price data for the ticker
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -112,22 +103,12 @@ def pca_adapter():
     start = data.get('start', '2015-01-01')
     
     try:
-        px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-        if px_raw.empty:
-            return jsonify({"error": f"No data for {ticker}"}), 400
-        
-        if isinstance(px_raw.columns, pd.MultiIndex):
-            px_raw.columns = px_raw.columns.get_level_values(0)
-        
-        spy = yf.download("SPY", start=start, auto_adjust=True, progress=False)['Close']
-        vix = yf.download("^VIX", start=start, auto_adjust=True, progress=False)['Close']
-        
-        df = compute_alpha_factors(px_raw, spy=spy, vix=vix, sector=None)
-        cols = feature_columns(df)
-        
-        pca_result = compute_pca_diagnostics(df, cols, n_components=8, topk_loadings=8)
+        pca_result = pca_diagnostics(ticker, start, n_components=8, topk_loadings=8,
+                                     rolling_window=data.get('rollingWindow', 252))
         
         return jsonify(pca_result)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -143,17 +124,15 @@ def train_model_adapter():
     params = data.get('params', {})
     
     try:
-        px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
+        px_raw = get_ohlcv(ticker, start)
         if px_raw.empty:
             return jsonify({"error": f"No data for {ticker}"}), 400
         
-        if isinstance(px_raw.columns, pd.MultiIndex):
-            px_raw.columns = px_raw.columns.get_level_values(0)
-        
-        spy = yf.download("SPY", start=start, auto_adjust=True, progress=False)['Close']
-        vix = yf.download("^VIX", start=start, auto_adjust=True, progress=False)['Close']
+        spy = get_close("SPY", start)
+        vix = get_close("^VIX", start)
         
-        result = run_walkforward_xgb(px_raw, spy=spy, vix=vix, sector=None, horizon=horizon, params=params)
+        result = run_walkforward_xgb(px_raw, spy=spy, vix=vix, sector=None, horizon=horizon, params=params,
+                                     df_all=factor_table(ticker, start))
         
         # Format for React frontend
         eq = result.get('equity_curve', pd.Series(dtype='float'))
@@ -234,14 +213,11 @@ def risk_metrics_adapter():
     
     try:
         # Quick demo using single ticker
-        px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
+        px_raw = get_ohlcv(ticker, start)
         if px_raw.empty:
             return jsonify({"error": f"No data for {ticker}"}), 400
         
-        if isinstance(px_raw.columns, pd.MultiIndex):
-            px = px_raw['Close']
-        else:
-            px = px_raw['Close'] if 'Close' in px_raw else px_raw['Adj Close']
+        px = px_raw['Close'] if 'Close' in px_raw else px_raw['Adj Close']
         
         returns = np.log(px).diff().dropna()
         equity = returns.cumsum().apply(np.exp)
@@ -267,11 +243,16 @@ def sentiment_analyze_adapter():
     if not tickers:
         return jsonify({"error": "No tickers provided"}), 400
     
+    from main import fetch_news_many, analyze_sentiment
+    # one concurrent round of NewsAPI calls for the stale tickers; fresh ones come from the store
+    fetched = fetch_news_many(tickers)
     results = []
     for ticker in tickers:
+        headlines = fetched.get(str(ticker).upper().strip())
+        if isinstance(headlines, Exception):
+            results.append({"ticker": ticker, "error": str(headlines)})
+            continue
         try:
-            from main import fetch_news, analyze_sentiment
-            headlines = fetch_news(ticker)
             sentiments = analyze_sentiment(headlines)
             results.append({
                 "ticker": ticker,
@@ -289,7 +270,7 @@ def settings_adapter():
     if request.method == 'GET':
         return jsonify({
             "theme": "dark",
-            "default_universe": ["AAPL", "MSFT", "GOOGL", "AMZN"],
+            "default_universe": DEFAULT_UNIVERSE,
             "default_allocator": "equal_weight",
             "default_rebalance": "weekly"
         })
@@ -0,0 +1,177 @@
+# core/news.py
+"""
+Headline store + NewsAPI fetcher used by main.fetch_news and /api/sentiment/analyze.
+
+Headlines are kept in SQLite (data/cache/news.sqlite), keyed by (ticker, url) so a
+re-fetched article is stored once. A ticker fetched less than NEWS_TTL_SECONDS ago
+is answered from the store; otherwise NewsAPI is asked through one pooled
+requests.Session. Multi-ticker requests fetch their stale tickers concurrently on a
+bounded pool (NEWS_WORKERS), so N tickers cost about one round-trip.
+"""
+from __future__ import annotations
+import os, sqlite3, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Dict, List
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.research.singleflight import SingleFlight
+
+NEWS_URL = "https://newsapi.org/v2/everything"
+NEWS_DB = os.path.join("data", "cache", "news.sqlite")
+NEWS_TTL_SECONDS = float(os.getenv("NEWS_TTL_SECONDS", 900))
+NEWS_WORKERS = int(os.getenv("NEWS_WORKERS", 8))
+PAGE_SIZE = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS headlines (
+    ticker       TEXT NOT NULL,
+    url          TEXT NOT NULL,
+    title        TEXT NOT NULL,
+    source       TEXT,
+    published_at TEXT,
+    fetched_at   REAL NOT NULL,
+    PRIMARY KEY (ticker, url)
+);
+CREATE INDEX IF NOT EXISTS headlines_recent ON headlines (ticker, published_at DESC);
+CREATE TABLE IF NOT EXISTS fetches (
+    ticker     TEXT PRIMARY KEY,
+    fetched_at REAL NOT NULL
+);
+"""
+
+_session: requests.Session | None = None
+_flights = SingleFlight(ttl=0, max_entries=64)  # coalesce only; freshness lives in the store
+
+
+def _get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(NEWS_WORKERS, 1))
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        _session = s
+    return _session
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(NEWS_DB), exist_ok=True)
+    conn = sqlite3.connect(NEWS_DB, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+# ---------------------------
+# Store
+# ---------------------------
+def _last_fetch(conn: sqlite3.Connection, ticker: str) -> float | None:
+    row = conn.execute("SELECT fetched_at FROM fetches WHERE ticker = ?", (ticker,)).fetchone()
+    return row[0] if row else None
+
+
+def _stored_titles(conn: sqlite3.Connection, ticker: str, limit: int) -> List[str]:
+    rows = conn.execute(
+        "SELECT title FROM headlines WHERE ticker = ? ORDER BY published_at DESC, fetched_at DESC LIMIT ?",
+        (ticker, limit),
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def _store_articles(conn: sqlite3.Connection, ticker: str, articles: List[dict]) -> None:
+    now = time.time()
+    rows = []
+    for a in articles:
+        title = (a.get("title") or "").strip()
+        if not title:
+            continue
+        url = a.get("url") or f"title:{title}"  # articles without a URL de-duplicate on title
+        rows.append((ticker, url, title, (a.get("source") or {}).get("name"), a.get("publishedAt"), now))
+    with conn:
+        conn.executemany(
+            "INSERT INTO headlines (ticker, url, title, source, published_at, fetched_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(ticker, url) DO UPDATE SET title = excluded.title, source = excluded.source, "
+            "published_at = excluded.published_at, fetched_at = excluded.fetched_at",
+            rows,
+        )
+        conn.execute(
+            "INSERT INTO fetches (ticker, fetched_at) VALUES (?, ?) "
+            "ON CONFLICT(ticker) DO UPDATE SET fetched_at = excluded.fetched_at",
+            (ticker, now),
+        )
+
+
+def _is_fresh(fetched_at: float | None, ttl: float) -> bool:
+    return fetched_at is not None and time.time() - fetched_at < ttl
+
+
+# ---------------------------
+# Fetch
+# ---------------------------
+def _request_articles(ticker: str, api_key: str, page_size: int) -> List[dict]:
+    params = {
+        "q": ticker,
+        "language": "en",
+        "sortBy": "publishedAt",
+        "pageSize": page_size,
+        "apiKey": api_key,
+    }
+    r = _get_session().get(NEWS_URL, params=params, timeout=15)
+    r.raise_for_status()
+    return r.json().get("articles", [])
+
+
+def _refresh(ticker: str, api_key: str, limit: int) -> List[str]:
+    articles = _request_articles(ticker, api_key, limit)
+    with closing(_connect()) as conn:
+        _store_articles(conn, ticker, articles)
+        return _stored_titles(conn, ticker, limit)
+
+
+def fetch_headlines(ticker: str, api_key: str | None, limit: int = PAGE_SIZE, ttl: float | None = None) -> List[str]:
+    """
+    Latest `limit` headline titles for `ticker`, from the store when fetched within
+    `ttl` seconds (default NEWS_TTL_SECONDS). If NewsAPI fails, stored headlines are
+    served (stale) when there are any; otherwise the error is raised.
+    """
+    ticker = ticker.upper().strip()
+    ttl = NEWS_TTL_SECONDS if ttl is None else ttl
+    with closing(_connect()) as conn:
+        if _is_fresh(_last_fetch(conn, ticker), ttl):
+            return _stored_titles(conn, ticker, limit)
+    if not api_key:
+        raise RuntimeError("Missing NEWS_API_KEY environment variable.")
+    try:
+        return _flights.do((ticker, limit), lambda: _refresh(ticker, api_key, limit))
+    except requests.RequestException:
+        with closing(_connect()) as conn:
+            stale = _stored_titles(conn, ticker, limit)
+        if stale:
+            print(f"[news] NewsAPI failed for {ticker}; serving stored headlines")
+            return stale
+        raise
+
+
+def fetch_headlines_many(
+    tickers: List[str],
+    api_key: str | None,
+    limit: int = PAGE_SIZE,
+    ttl: float | None = None,
+) -> Dict[str, List[str] | Exception]:
+    """
+    fetch_headlines for several tickers: stale ones are fetched concurrently (at most
+    NEWS_WORKERS at a time). Per-ticker failures are returned as the exception.
+    """
+    names = list(dict.fromkeys(t.upper().strip() for t in tickers))
+    out: Dict[str, List[str] | Exception] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(NEWS_WORKERS, len(names) or 1))) as pool:
+        futs = {tk: pool.submit(fetch_headlines, tk, api_key, limit, ttl) for tk in names}
+        for tk, fut in futs.items():
+            try:
+                out[tk] = fut.result()
+            except Exception as e:
+                out[tk] = e
+    return out
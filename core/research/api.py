@@ -2,13 +2,11 @@
 from flask import Blueprint, request, jsonify
 from matplotlib import ticker
 import pandas as pd
-import yfinance as yf
 import numpy as np
 import os
 
 
-from .experiment import run_walkforward_xgb
-from .factors import compute_alpha_factors, compute_pca_diagnostics
+from .factors import FACTORS
 from .models import feature_columns
 from .stats import (
     sharpe_ratio, sortino_ratio, information_ratio, alpha_beta,
@@ -17,78 +15,18 @@ from .stats import (
 from .decay import compute_signal_decay, quantile_time_buckets  # <-- NEW
 from .portfolio import backtest_portfolio
 from .ff import fama_french_exposure
+from .marketdata import get_ohlcv, get_close, flight_stats
+from .precompute import factor_table, factor_columns, walkforward_result, pca_diagnostics, cache_stats
+from .warmup import warmup_status
 
 
 research_bp = Blueprint("research", __name__)
 
 # ---------------------------
-# Helpers to normalize yfinance shapes
+# Market data (served from the shared cache via marketdata.py)
 # ---------------------------
-def _flatten_ohlcv(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
-    if df is None or df.empty:
-        return df
-    out = df.copy()
-    if isinstance(out.columns, pd.MultiIndex):
-        extracted = None
-        for lvl in range(out.columns.nlevels):
-            vals = out.columns.get_level_values(lvl)
-            if ticker in vals:
-                try:
-                    extracted = out.xs(ticker, axis=1, level=lvl, drop_level=True)
-                    break
-                except Exception:
-                    pass
-        out = extracted if extracted is not None else out
-        if isinstance(out.columns, pd.MultiIndex):
-            try:
-                level0 = out.columns.get_level_values(0)
-                if set(level0).intersection({"Open","High","Low","Close","Adj Close","Volume"}):
-                    out.columns = level0
-                else:
-                    out.columns = ["|".join(map(str, tpl)) for tpl in out.columns]
-            except Exception:
-                out.columns = ["|".join(map(str, tpl)) for tpl in out.columns]
-    out = out.rename(columns=lambda c: str(c).strip().title())
-    keep = [c for c in ["Open","High","Low","Close","Adj Close","Volume"] if c in out.columns]
-    if keep:
-        out = out[keep]
-    out.index = pd.to_datetime(out.index).tz_localize(None)
-    return out
-
 def _get_close_series(ticker: str, start: str) -> pd.Series:
-    df = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if df is None or df.empty:
-        raise RuntimeError(f"No data for {ticker}")
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            s = df.xs("Close", axis=1, level=0, drop_level=False)
-            if isinstance(s, pd.DataFrame):
-                s = s.iloc[:, 0]
-        except Exception:
-            s = None
-        if s is None:
-            try:
-                s = df.xs("Adj Close", axis=1, level=0, drop_level=False)
-                if isinstance(s, pd.DataFrame):
-                    s = s.iloc[:, 0]
-            except Exception:
-                flat = df.copy()
-                flat.columns = ["|".join(map(str, c)) for c in flat.columns]
-                candidates = [c for c in flat.columns if c.lower().startswith("close")]
-                if not candidates:
-                    candidates = [c for c in flat.columns if "adj close" in c.lower()]
-                if not candidates:
-                    raise KeyError("No Close/Adj Close column found (multiindex).")
-                s = flat[candidates[0]]
-    else:
-        col = "Close" if "Close" in df.columns else ("Adj Close" if "Adj Close" in df.columns else None)
-        if col is None:
-            raise KeyError("No Close/Adj Close column found.")
-        s = df[col]
-    s = pd.to_numeric(s, errors="coerce").dropna()
-    s.index = pd.to_datetime(s.index).tz_localize(None)
-    s.name = ticker
-    return s
+    return get_close(ticker, start)
 
 def _series_to_jsonable(s: pd.Series, n_tail: int | None = None) -> dict:
     obj = s.copy()
@@ -125,15 +63,10 @@ def predict_endpoint():
     start   = request.args.get("start") or "2015-01-01"
     horizon = request.args.get("horizon") or "1d"
 
-    px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if px_raw is None or px_raw.empty:
+    try:
+        out = walkforward_result(ticker, start, horizon)
+    except RuntimeError:
         return jsonify({"error": f"No data for {ticker}"}), 400
-    px = _flatten_ohlcv(px_raw, ticker)
-
-    spy = _get_close_series("SPY", start)
-    vix = _get_close_series("^VIX", start)
-
-    out = run_walkforward_xgb(px, spy=spy, vix=vix, sector=None, horizon=horizon)
     preds = out.get("predictions", pd.DataFrame())
     if preds is None or preds.empty:
         return jsonify({"error": "No predictions produced."}), 400
@@ -169,15 +102,11 @@ def model_backtest():
     horizon = data.get("horizon", "1d")
     model   = data.get("model", "xgb")
 
-    px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if px_raw is None or px_raw.empty:
-        return jsonify({"error": f"No data for {ticker}"}), 400
-    px = _flatten_ohlcv(px_raw, ticker)
-    spy = _get_close_series("SPY", start)
-    vix = _get_close_series("^VIX", start)
-
     if model == "xgb":
-        out = run_walkforward_xgb(px, spy=spy, vix=vix, sector=None, horizon=horizon)
+        try:
+            out = walkforward_result(ticker, start, horizon)
+        except RuntimeError:
+            return jsonify({"error": f"No data for {ticker}"}), 400
     elif model == "lstm":
         return jsonify({"error": "LSTM not implemented yet"}), 400
     elif model == "ens":
@@ -211,6 +140,8 @@ def experiment_run():
         "horizon": "1d",
         "train_window": 750,
         "test_window": 63,
+        "workers": 4,
+        "search": "grid",
         "param_grid": {
           "n_estimators": [300,500],
           "max_depth": [3,5],
@@ -218,38 +149,79 @@ def experiment_run():
           "subsample": [0.8,1.0],
           "colsample_bytree": [0.8,1.0],
           "reg_lambda": [1.0,3.0]
-        }
+        },
+        "param_space": {
+          "learning_rate": {"low": 0.01, "high": 0.2, "log": true},
+          "max_depth": [2, 7],
+          "subsample": [0.6, 1.0]
+        },
+        "n_trials": 30,
+        "time_budget": 600
       }
+    search: "grid" (every param_grid combination), "halving" (successive halving over
+    param_grid) or "tpe" (param_space ranges, up to n_trials or time_budget seconds).
     """
-    from .experiment import run_walkforward_xgb_sweep
+    from .experiment import DEFAULT_PARAM_SPACE, run_walkforward_xgb_sweep
+    from .tpe import TPESampler
 
     data = request.get_json(force=True) or {}
     ticker  = data.get("ticker", "AAPL")
     start   = data.get("start", "2015-01-01")
     horizon = data.get("horizon", "1d")
-    trw     = int(data.get("train_window", 750))
-    tew     = int(data.get("test_window", 63))
     grid    = data.get("param_grid", None)
-    
+    search  = data.get("search", "grid")
+    space   = data.get("param_space")
+
     persist  = bool(data.get("persist", False))
     ticker_safe = "".join(ch for ch in ticker if ch.isalnum() or ch in ("-", "_")).strip()
 
-    px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if px_raw is None or px_raw.empty:
+    # validate the search before any data is loaded
+    try:
+        trw      = int(data.get("train_window", 750))
+        tew      = int(data.get("test_window", 63))
+        workers  = int(data["workers"]) if data.get("workers") else None
+        n_trials = int(data.get("n_trials", 30))
+        budget   = float(data["time_budget"]) if data.get("time_budget") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "train_window, test_window, workers and n_trials must be integers "
+                                 "and time_budget a number of seconds."}), 400
+    if search not in ("grid", "halving", "tpe"):
+        return jsonify({"error": f"Unknown search '{search}' (use 'grid', 'halving' or 'tpe')."}), 400
+    if (workers is not None and workers < 1) or n_trials < 1 or (budget is not None and budget <= 0):
+        return jsonify({"error": "workers and n_trials must be at least 1, time_budget positive."}), 400
+    if search == "tpe":
+        if space is not None and not isinstance(space, dict):
+            return jsonify({"error": "param_space must be an object of parameter ranges."}), 400
+        try:
+            TPESampler(space or DEFAULT_PARAM_SPACE)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid param_space: {e}"}), 400
+
+    px = get_ohlcv(ticker, start)
+    if px is None or px.empty:
         return jsonify({"error": f"No data for {ticker}"}), 400
-    px = _flatten_ohlcv(px_raw, ticker)
     spy = _get_close_series("SPY", start)
     vix = _get_close_series("^VIX", start)
 
-    res = run_walkforward_xgb_sweep(
-        px=px, spy=spy, vix=vix, sector=None,
-        horizon=horizon, train_window=trw, test_window=tew, param_grid=grid
-    )
+    try:
+        df_all = factor_table(ticker, start)
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        res = run_walkforward_xgb_sweep(
+            px=px, spy=spy, vix=vix, sector=None,
+            horizon=horizon, train_window=trw, test_window=tew, param_grid=grid,
+            df_all=df_all, workers=workers, search=search,
+            param_space=space, n_trials=n_trials, time_budget=budget,
+        )
+    except ValueError as e:  # e.g. an unsupported horizon
+        return jsonify({"error": str(e)}), 400
 
     # JSON-normalize series like other endpoints
     out = {
         "best_params": res.get("best_params", {}),
         "summary": res.get("summary", []),
+        **({"search": res["search"]} if "search" in res else {}),
         "equity_curve": _series_to_jsonable(res.get("equity_curve", pd.Series(dtype=float)), n_tail=2000),
         "daily_returns": _series_to_jsonable(res.get("daily_returns", pd.Series(dtype=float)), n_tail=2000),
     }
@@ -259,12 +231,10 @@ def experiment_run():
 
     # Optionally persist the best model
     if persist and out["best_params"]:
-        # Recompute factors once so we can pass to persistence helper
-        from .factors import compute_alpha_factors
+        # same factor table the sweep used
         from .models import feature_columns
         from .experiment import persist_final_xgb_model
 
-        df_all = compute_alpha_factors(px, spy=spy, vix=vix, sector=None)
         feats = feature_columns(df_all)
         # keep only valid, present features
         feats = [c for c in feats if c in df_all.columns]
@@ -295,15 +265,10 @@ def run():
     horizon = data.get("horizon", "1d")
     include_diag = bool(data.get("diagnostics", False))
 
-    px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if px_raw is None or px_raw.empty:
+    try:
+        out = walkforward_result(ticker, start, horizon)
+    except RuntimeError:
         return jsonify({"error": f"No data for {ticker}"}), 400
-    px = _flatten_ohlcv(px_raw, ticker)
-
-    spy = _get_close_series("SPY", start)
-    vix = _get_close_series("^VIX", start)
-
-    out = run_walkforward_xgb(px, spy=spy, vix=vix, sector=None, horizon=horizon)
 
     eq = out.get("equity_curve", pd.Series(dtype="float"))
     if isinstance(eq, pd.Series) and not eq.empty:
@@ -318,9 +283,9 @@ def run():
         out["predictions"] = _frame_to_jsonable(pred, n_tail=500)
 
     if include_diag:
-        factors_df = compute_alpha_factors(px, spy=spy, vix=vix, sector=None)
-        feats = feature_columns(factors_df)
-        diag = compute_pca_diagnostics(factors_df, feats, n_components=8, topk_loadings=8)
+        diag = pca_diagnostics(ticker, start, n_components=8, topk_loadings=8,
+                               rolling_window=data.get("rolling_window"))
+        feats = diag.get("features_used") or feature_columns(factor_table(ticker, start))
         out["diagnostics"] = {
             "feature_count": len(feats),
             "features": feats,
@@ -340,15 +305,10 @@ def factors_endpoint():
     rows   = int(data.get("rows", 150))
     want_diag = bool(data.get("diagnostics", False))
 
-    px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if px_raw is None or px_raw.empty:
+    try:
+        df = factor_table(ticker, start)
+    except RuntimeError:
         return jsonify({"error": f"No data for {ticker}"}), 400
-    px = _flatten_ohlcv(px_raw, ticker)
-
-    spy = _get_close_series("SPY", start)
-    vix = _get_close_series("^VIX", start)
-
-    df = compute_alpha_factors(px, spy=spy, vix=vix, sector=None)
     cols = feature_columns(df)
     preview = df[cols].tail(rows)
 
@@ -364,7 +324,8 @@ def factors_endpoint():
     }
 
     if want_diag:
-        out["pca"] = compute_pca_diagnostics(df, cols, n_components=8, topk_loadings=8)
+        out["pca"] = pca_diagnostics(ticker, start, n_components=8, topk_loadings=8,
+                                     rolling_window=data.get("rolling_window"))
 
     return jsonify(out)
 
@@ -392,15 +353,11 @@ def risk_endpoint():
     window  = int(data.get("window", 63))
 
     # Run the same model backtest to get daily strategy returns
-    px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if px_raw is None or px_raw.empty:
+    try:
+        res = walkforward_result(ticker, start, horizon)
+    except RuntimeError:
         return jsonify({"error": f"No data for {ticker}"}), 400
-    px = _flatten_ohlcv(px_raw, ticker)
-
     spy = _get_close_series("SPY", start)
-    vix = _get_close_series("^VIX", start)
-
-    res = run_walkforward_xgb(px, spy=spy, vix=vix, sector=None, horizon=horizon)
     daily = res.get("daily_returns", pd.Series(dtype="float"))
     eq = res.get("equity_curve", pd.Series(dtype="float"))
 
@@ -433,6 +390,27 @@ def risk_endpoint():
 
     return jsonify({"metrics": metrics, "rolling": roll})
 
+# ---------------------------
+# Signal frames for /api/decay and /api/quantiles
+# ---------------------------
+def _signal_frame(ticker: str, start: str, model_hz: str, signal: str | None, ret_cols) -> pd.DataFrame:
+    """
+    Signal + forward-return frame for /api/decay and /api/quantiles. A factor signal
+    only needs its own column and `ret_cols`, evaluated through the factor registry
+    without a model run; otherwise the full factor table gets the walk-forward
+    probability column prob_up_{model_hz}.
+    """
+    outputs = FACTORS.outputs()
+    if signal in outputs:
+        return factor_columns(ticker, start, [signal] + [c for c in ret_cols if c in outputs])
+    df = factor_table(ticker, start)
+    res = walkforward_result(ticker, start, model_hz)
+    preds = res.get("predictions", pd.DataFrame())
+    prob_col = f"prob_up_{model_hz}"
+    if isinstance(preds, pd.DataFrame) and prob_col in preds.columns:
+        df[prob_col] = preds[prob_col].reindex(df.index)
+    return df
+
 # ---------------------------
 # /api/decay — Information Coefficient & bucketed averages
 # ---------------------------
@@ -455,25 +433,13 @@ def decay_endpoint():
     signal    = data.get("signal", None)
     horizons  = data.get("horizons", [1, 3, 5, 10, 20])
 
-    # Data
-    px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if px_raw is None or px_raw.empty:
+    # Factors (+ forward returns) and the default signal = model probability
+    try:
+        df = _signal_frame(ticker, start, model_hz, signal, [f"target_ret_{h}d" for h in horizons])
+    except RuntimeError:
         return jsonify({"error": f"No data for {ticker}"}), 400
-    px = _flatten_ohlcv(px_raw, ticker)
-    spy = _get_close_series("SPY", start)
-    vix = _get_close_series("^VIX", start)
-
-    # Factors (+ forward returns)
-    df = compute_alpha_factors(px, spy=spy, vix=vix, sector=None)
 
-    # Default signal = model probability
-    res = run_walkforward_xgb(px, spy=spy, vix=vix, sector=None, horizon=model_hz)
-    preds = res.get("predictions", pd.DataFrame())
-    prob_col = f"prob_up_{model_hz}"
-    if isinstance(preds, pd.DataFrame) and prob_col in preds.columns:
-        df[prob_col] = preds[prob_col].reindex(df.index)
-
-    sig_col = signal or prob_col
+    sig_col = signal or f"prob_up_{model_hz}"
     if sig_col not in df.columns:
         return jsonify({"error": f"Signal '{sig_col}' not available."}), 400
 
@@ -515,24 +481,13 @@ def quantiles_endpoint():
     n_quants    = int(data.get("n_quantiles", 5))
     roll        = int(data.get("roll", 252))
 
-    # Data
-    px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if px_raw is None or px_raw.empty:
+    # Factors (+ forward returns) and the default signal = model probability
+    try:
+        df = _signal_frame(ticker, start, model_hz, signal, [f"target_ret_{ret_h}d"])
+    except RuntimeError:
         return jsonify({"error": f"No data for {ticker}"}), 400
-    px = _flatten_ohlcv(px_raw, ticker)
-    spy = _get_close_series("SPY", start)
-    vix = _get_close_series("^VIX", start)
-
-    df = compute_alpha_factors(px, spy=spy, vix=vix, sector=None)
 
-    # Default signal = model probability
-    res = run_walkforward_xgb(px, spy=spy, vix=vix, sector=None, horizon=model_hz)
-    preds = res.get("predictions", pd.DataFrame())
-    prob_col = f"prob_up_{model_hz}"
-    if isinstance(preds, pd.DataFrame) and prob_col in preds.columns:
-        df[prob_col] = preds[prob_col].reindex(df.index)
-
-    sig_col = signal or prob_col
+    sig_col = signal or f"prob_up_{model_hz}"
     ret_col = f"target_ret_{ret_h}d"
     if sig_col not in df.columns:
         return jsonify({"error": f"Signal '{sig_col}' not available."}), 400
@@ -714,8 +669,9 @@ def ff_exposure_endpoint():
     except Exception as e:
         return jsonify({"error": f"portfolio backtest failed: {e}"}), 500
 
-    daily_returns = result.get("daily_returns")
-    if daily_returns is None or daily_returns.empty:
+    daily = result.get("daily") or []
+    daily_returns = pd.Series({pd.Timestamp(r["date"]): r["ret"] for r in daily}, dtype=float)
+    if daily_returns.empty:
         return jsonify({"error": "No portfolio daily returns to regress."}), 400
 
     try:
@@ -724,3 +680,14 @@ def ff_exposure_endpoint():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@research_bp.route("/api/marketdata/stats", methods=["GET"])
+def marketdata_stats_endpoint():
+    """Single-flight / memo counters for shared Close series (saved = loads avoided)."""
+    return jsonify(flight_stats())
+
+@research_bp.route("/api/warmup/status", methods=["GET"])
+def warmup_status_endpoint():
+    """Readiness of the default-universe warm-up (state, progress 0..1, ready, per-ticker errors)."""
+    out = warmup_status()
+    out["caches"] = cache_stats()
+    return jsonify(out)
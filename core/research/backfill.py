@@ -0,0 +1,183 @@
+# core/research/backfill.py
+"""
+Out-of-core factor backfill for histories and universes too large for one panel run.
+
+backfill_factors(panel) computes the factor table of every ticker of a PricePanel
+(the panel factor engine, i.e. compute_alpha_factors column for column). It
+processes a block of tickers over a few calendar years at a time, and writes each
+block's rows to the partitioned store as soon as they are done:
+
+    data/cache/factor_backfill/ticker=<T>/year=<YYYY>/part.parquet
+
+One partition holds a ticker's factor table for one year, on the dates it traded.
+read_backfill(ticker) reads it back like factor_table.
+
+Memory stays within FACTOR_MEMORY_MB (per call: memory_mb), however long or wide the
+panel. The prices are memory-mapped, and the tickers per block follow from the
+budget and the rows per chunk.
+
+Each chunk is computed on the ticker's own bars, from ROLL_CHUNK-aligned bar
+numbers. It starts at least FACTOR_LOOKBACK bars (plus one spare chunk) before its
+first year, and ends TARGET_HORIZON bars after its last year, rounded up to the
+next chunk boundary. The rolling kernels restart on those boundaries (rolling.py,
+panel_factors._roll_skew_kurt), so every window in the kept rows is summed
+exactly as in a single pass over the whole history. The output is therefore
+identical to the in-memory engine, bit for bit, not merely within tolerance.
+"""
+from __future__ import annotations
+import os, time
+from typing import Callable, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .cache import CACHE_DIR
+from .factors import FACTOR_LOOKBACK, TARGET_HORIZON, compact_factors
+from .panel_factors import _aligned, _factor_block
+from .rolling import ROLL_CHUNK
+from .store import read_partitions, write_years
+
+BACKFILL_DIR = os.path.join(CACHE_DIR, "factor_backfill")
+FACTOR_MEMORY_MB = float(os.getenv("FACTOR_MEMORY_MB", 1024))
+BACKFILL_YEARS = int(os.getenv("BACKFILL_YEARS", 4))  # calendar years per time chunk
+
+# Peak bytes per (bar x ticker) cell of one chunk: the engine's temporaries (~1 KB,
+# measured with tracemalloc) plus the gathered inputs.
+_CELL_BYTES = 1200
+_PRICE_COLUMNS = {"Close": "close", "High": "high", "Low": "low", "Volume": "volume"}
+
+
+def _floor(b: int) -> int:
+    return b - b % ROLL_CHUNK
+
+
+def _ceil(b: int) -> int:
+    return -(-b // ROLL_CHUNK) * ROLL_CHUNK
+
+
+def _chunks(dates: pd.DatetimeIndex, years_per_chunk: int) -> List[slice]:
+    """Date-row ranges of consecutive groups of whole calendar years."""
+    years = dates.year
+    firsts = np.flatnonzero(np.r_[True, years[1:] != years[:-1]])
+    bounds = list(firsts[::max(years_per_chunk, 1)]) + [len(dates)]
+    return [slice(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def _chunk_rows(chunks: List[slice]) -> int:
+    """Most bar rows any chunk's span can cover (see _span), whatever the ticker."""
+    longest = max((c.stop - c.start for c in chunks), default=0)
+    return _ceil(longest + TARGET_HORIZON) + _ceil(FACTOR_LOOKBACK) + 2 * ROLL_CHUNK
+
+
+def _block_size(n_dates: int, rows: int, memory_mb: float) -> int:
+    """Tickers per block: each costs `rows` cells per chunk plus its bar positions."""
+    per_ticker = rows * _CELL_BYTES + n_dates * 4
+    return max(1, int(memory_mb * 2**20 // per_ticker))
+
+
+def _span(bars: np.ndarray, rows: slice) -> tuple:
+    """
+    For a ticker's bar date-rows `bars`: its bars inside `rows` ([keep_lo, keep_hi)) and
+    the bar range [lo, hi) to compute them from. lo and hi sit on chunk boundaries,
+    FACTOR_LOOKBACK bars plus one whole chunk before keep_lo and TARGET_HORIZON bars
+    after keep_hi. The spare chunk keeps the first bar out of every window's chunks:
+    its one-bar returns are NaN in the slice but not in a full run.
+    """
+    keep_lo = int(np.searchsorted(bars, rows.start))
+    keep_hi = int(np.searchsorted(bars, rows.stop))
+    lo = max(_floor(max(keep_lo - FACTOR_LOOKBACK, 0)) - ROLL_CHUNK, 0)
+    hi = min(_ceil(keep_hi + TARGET_HORIZON), len(bars))
+    return keep_lo, keep_hi, lo, hi
+
+
+def _gather(arr, idx: np.ndarray, cols: Sequence[int], shape) -> np.ndarray:
+    """(bars x tickers) array of arr[idx[:, j], cols[j]]; NaN where idx < 0 (padding)."""
+    out = np.full(shape, np.nan, order="F")
+    for j, c in enumerate(cols):
+        n = int((idx[:, j] >= 0).sum())
+        out[:n, j] = arr[idx[:n, j], c]
+    return out
+
+
+def _write_ticker(root: str, ticker: str, dates: pd.DatetimeIndex, prices: Dict[str, np.ndarray],
+                  factors: Dict[str, np.ndarray], compact: bool) -> int:
+    cols = {**prices, **factors}
+    df = pd.DataFrame(cols, index=dates)
+    for c in df.columns:
+        if c.startswith("y_up_"):
+            df[c] = df[c].astype(int)
+    if compact:
+        df = compact_factors(df)
+    return write_years(root, ticker, df)
+
+
+def backfill_factors(
+    panel,
+    tickers: Sequence[str] | None = None,
+    spy: pd.Series | None = None,
+    vix: pd.Series | None = None,
+    root: str = BACKFILL_DIR,
+    memory_mb: float | None = None,
+    years_per_chunk: int | None = None,
+    compact: bool = False,
+    progress: Callable[[dict], None] | None = None,
+) -> dict:
+    """
+    Compute and store the factor tables of `tickers` (default: all) of a PricePanel,
+    block by block and chunk by chunk, within `memory_mb` (default FACTOR_MEMORY_MB).
+    spy/vix are close series, aligned to the panel dates as panel_alpha_factors does.
+    `progress` is called with a stats dict after every block. Returns the final stats.
+    """
+    memory_mb = FACTOR_MEMORY_MB if memory_mb is None else memory_mb
+    years_per_chunk = years_per_chunk or BACKFILL_YEARS
+    names = list(tickers) if tickers is not None else list(panel.tickers)
+    fields = [f for f in _PRICE_COLUMNS if f in panel.fields]
+    arrays = {f: panel.array(f) for f in fields}
+    ref = {k: _aligned(s, panel.dates) for k, s in (("spy", spy), ("vix", vix)) if s is not None}
+
+    chunks = _chunks(panel.dates, years_per_chunk)
+    block = _block_size(len(panel.dates), _chunk_rows(chunks), memory_mb)
+    stats = {"tickers": len(names), "done": 0, "partitions": 0, "chunks": len(chunks),
+             "block": block, "seconds": 0.0}
+    t0 = time.perf_counter()
+
+    for b0 in range(0, len(names), block):
+        tks = names[b0:b0 + block]
+        cols = [panel.col[t] for t in tks]
+        # date rows of every ticker's bars (int32: n_dates x 4 bytes per ticker)
+        bars = [np.flatnonzero(~np.isnan(arrays["Close"][:, c])).astype(np.int32) for c in cols]
+        for rows_c in chunks:
+            spans = [_span(b, rows_c) for b in bars]
+            length = max((hi - lo for _, _, lo, hi in spans), default=0)
+            if length == 0 or all(kh == kl for kl, kh, _, _ in spans):
+                continue
+            idx = np.full((length, len(tks)), -1, dtype=np.int64)
+            for j, (b, (_, _, lo, hi)) in enumerate(zip(bars, spans)):
+                idx[:hi - lo, j] = b[lo:hi]
+            shape = (length, len(tks))
+            inputs = {_PRICE_COLUMNS[f]: _gather(arrays[f], idx, cols, shape) for f in fields}
+            for k, series in ref.items():
+                inputs[k] = _gather(series[:, None], idx, [0] * len(tks), shape)
+            inputs = {k: inputs.get(k) for k in ("close", "high", "low", "volume", "spy", "vix")}
+            out = _factor_block({**inputs, "sector": None})
+
+            for j, (t, (keep_lo, keep_hi, lo, _)) in enumerate(zip(tks, spans)):
+                if keep_hi == keep_lo:
+                    continue
+                keep = slice(keep_lo - lo, keep_hi - lo)
+                dates = panel.dates[bars[j][keep_lo:keep_hi]]
+                prices = {_PRICE_COLUMNS[f]: inputs[_PRICE_COLUMNS[f]][keep, j] for f in fields}
+                stats["partitions"] += _write_ticker(root, t, dates, prices,
+                                                     {k: v[keep, j] for k, v in out.items()}, compact)
+            del out, inputs, idx
+        stats["done"] += len(tks)
+        stats["seconds"] = round(time.perf_counter() - t0, 2)
+        if progress is not None:
+            progress(dict(stats))
+    return stats
+
+
+def read_backfill(ticker: str, start=None, end=None, columns: List[str] | None = None,
+                  root: str = BACKFILL_DIR) -> pd.DataFrame | None:
+    """A backfilled factor table (or its `columns`) over [start, end]; None when not stored."""
+    return read_partitions(root, ticker, start, end, columns)
@@ -1,11 +1,22 @@
 # core/research/cache.py
 from __future__ import annotations
-import os
+import os, json, hashlib, shutil
+from contextlib import contextmanager, ExitStack
+from typing import Callable, Dict, List
 import pandas as pd
 import yfinance as yf
 
+from .ohlcv import flatten_ohlcv
+from .market_calendar import last_closed_session
+from .store import (
+    safe_name, atomic_write, has_data, key_dir, split_years, new_part_name,
+    write_partition, drop_partitions, prune_partitions, read_partitions,
+)
+
 CACHE_DIR = os.path.join("data", "cache")
 os.makedirs(CACHE_DIR, exist_ok=True)
+# Partitioned OHLCV: prices/ticker=<SAFE>/year=<YYYY>/part.parquet (see store.py)
+PRICE_STORE = os.path.join(CACHE_DIR, "prices")
 
 # Detect parquet availability once
 try:
@@ -19,76 +30,465 @@ except Exception:
         _PARQUET_OK = False
 
 def _base_path(ticker: str) -> str:
-    safe = "".join(ch for ch in ticker if ch.isalnum() or ch in ("-", "_")).strip()
-    return os.path.join(CACHE_DIR, safe)
+    return os.path.join(CACHE_DIR, safe_name(ticker))
 
 def _cache_path(ticker: str) -> str:
+    """Pre-partitioning single-file cache; only read to migrate it into PRICE_STORE."""
     base = _base_path(ticker)
     return base + (".parquet" if _PARQUET_OK else ".pkl")
 
-def _save(df: pd.DataFrame, path: str) -> None:
-    if _PARQUET_OK and path.endswith(".parquet"):
-        df.to_parquet(path)
-    else:
-        df.to_pickle(path)
+# Advisory inter-process locks (fcntl on POSIX, msvcrt on Windows)
+try:
+    import fcntl
+
+    def _lock_file(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f) -> None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+except ImportError:  # pragma: no cover - Windows
+    import msvcrt
+
+    def _lock_file(f) -> None:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:  # LK_LOCK gives up after ~10s; keep waiting
+                continue
+
+    def _unlock_file(f) -> None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def ticker_lock(ticker: str):
+    """
+    Exclusive per-ticker lock held while a ticker is refreshed, so that only one
+    process (or thread) downloads it; the others wait and then read its result.
+    """
+    with open(_base_path(ticker) + ".lock", "a+") as f:
+        _lock_file(f)
+        try:
+            yield
+        finally:
+            _unlock_file(f)
 
 def _load(path: str) -> pd.DataFrame:
     if _PARQUET_OK and path.endswith(".parquet"):
         return pd.read_parquet(path)
     return pd.read_pickle(path)
 
-def load_prices(ticker: str, start: str, auto_adjust: bool = True, force_refresh: bool = False) -> pd.DataFrame:
+# Downloader signatures: (ticker, start, auto_adjust) / (tickers, start, auto_adjust)
+# -> yfinance-shaped frame; the batch form returns (ticker, field) MultiIndex columns.
+Downloader = Callable[[str, str, bool], pd.DataFrame]
+BatchDownloader = Callable[[List[str], str, bool], pd.DataFrame]
+
+# Tolerance before a request starting earlier than the cache triggers a backfill
+# (covers weekends/holidays between `start` and the first cached session).
+_BACKFILL_SLACK = pd.Timedelta(days=7)
+
+# Tickers per grouped download in load_prices_many
+CHUNK_SIZE = 100
+
+# A ticker that is behind the calendar (halted, delisted, late data) is asked
+# again at most this often.
+RECHECK_SECONDS = float(os.getenv("CACHE_RECHECK_SECONDS", 900))
+
+# Sidecar re-reads when the partitions it named were pruned by a newer rewrite
+_READ_ATTEMPTS = 5
+
+def _yf_download(ticker: str, start: str, auto_adjust: bool = True) -> pd.DataFrame:
+    return yf.download(ticker, start=start, auto_adjust=auto_adjust, progress=False)
+
+def _yf_download_many(tickers: List[str], start: str, auto_adjust: bool = True) -> pd.DataFrame:
+    return yf.download(tickers, start=start, auto_adjust=auto_adjust, progress=False,
+                       group_by="ticker", threads=True)
+
+# ---------------------------
+# Freshness metadata (<ticker>.meta.json next to the lock file)
+# ---------------------------
+def _meta_path(ticker: str) -> str:
+    return _base_path(ticker) + ".meta.json"
+
+def _content_hash(df: pd.DataFrame) -> str:
+    return hashlib.sha1(pd.util.hash_pandas_object(df, index=True).values.tobytes()).hexdigest()
+
+def read_meta(ticker: str) -> dict | None:
     """
-    Cached daily OHLCV for a ticker; incremental updates if a cache exists.
+    Sidecar for a cached ticker: first/last bar, last check (UTC), adjust mode, rows,
+    content hash, and per-year partition {rows, hash, file}; readers go through it.
     """
-    path = _cache_path(ticker)
-    df_cached = None
+    try:
+        with open(_meta_path(ticker)) as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def _write_meta(ticker: str, meta: dict) -> None:
+    def _dump(tmp: str) -> None:
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=2)
+    atomic_write(_meta_path(ticker), _dump)
+
+def _files(meta: dict) -> Dict[int, str | None]:
+    # partitions written before versioned file names have no "file" (part.parquet)
+    return {int(y): p.get("file") for y, p in meta["partitions"].items()}
+
+def _build_meta(ticker: str, parts: Dict[str, dict], first_bar, last_bar, auto_adjust: bool, covered_from) -> dict:
+    first_bar = pd.Timestamp(first_bar)
+    covered = min(pd.Timestamp(covered_from), first_bar) if covered_from is not None else first_bar
+    parts = {y: parts[y] for y in sorted(parts)}
+    combined = hashlib.sha1("|".join(f"{y}:{p['hash']}" for y, p in parts.items()).encode()).hexdigest()
+    return {
+        "ticker": ticker,
+        "first_bar": first_bar.strftime("%Y-%m-%d"),
+        "last_bar": pd.Timestamp(last_bar).strftime("%Y-%m-%d"),
+        "covered_from": covered.strftime("%Y-%m-%d"),
+        "last_check": pd.Timestamp.now(tz="UTC").isoformat(),
+        "auto_adjust": bool(auto_adjust),
+        "rows": int(sum(p["rows"] for p in parts.values())),
+        "content_hash": combined,
+        "partitions": parts,
+    }
+
+def _touch_meta(ticker: str, meta: dict, **changes) -> None:
+    meta = dict(meta, last_check=pd.Timestamp.now(tz="UTC").isoformat(), **changes)
+    _write_meta(ticker, meta)
 
-    if (not force_refresh) and os.path.exists(path):
+def _is_current(meta: dict | None, auto_adjust: bool, now: pd.Timestamp | None = None) -> bool:
+    """
+    Current = holds the latest closed NYSE session, or was already asked for it
+    within RECHECK_SECONDS. A different adjust mode is never current.
+    """
+    if not meta or bool(meta.get("auto_adjust", True)) != bool(auto_adjust):
+        return False
+    if pd.Timestamp(meta["last_bar"]) >= last_closed_session(now):
+        return True
+    checked = pd.Timestamp(meta["last_check"])
+    return (pd.Timestamp.now(tz="UTC") - checked).total_seconds() < RECHECK_SECONDS
+
+def is_stale(ticker: str, auto_adjust: bool = True, now: pd.Timestamp | None = None) -> bool:
+    return not _is_current(read_meta(ticker), auto_adjust, now)
+
+def stale_tickers(tickers: List[str], auto_adjust: bool = True, now: pd.Timestamp | None = None) -> List[str]:
+    """Tickers that are missing or behind the calendar; reads only the small sidecars."""
+    return [tk for tk in dict.fromkeys(tickers) if is_stale(tk, auto_adjust, now)]
+
+# ---------------------------
+# Store read/write
+# ---------------------------
+def read_prices(
+    ticker: str,
+    start=None,
+    end=None,
+    columns: List[str] | None = None,
+) -> pd.DataFrame | None:
+    """
+    Cached bars in [start, end] straight from the partitioned store, restricted to
+    `columns` (e.g. ["Close"]). No freshness check or download; None if not cached.
+    Partitions are resolved through the sidecar, so a read sees one published
+    history even while a rewrite is in progress.
+    """
+    for attempt in range(_READ_ATTEMPTS):
+        meta = read_meta(ticker)
+        if not meta or "partitions" not in meta:
+            return None
         try:
-            df_cached = _load(path)
-        except Exception:
-            df_cached = None
+            return read_partitions(PRICE_STORE, ticker, start, end, columns, files=_files(meta))
+        except OSError:
+            # pruned by a rewrite published after the sidecar was read: read the new one
+            if attempt == _READ_ATTEMPTS - 1:
+                raise
+
+def _usable(meta: dict | None, ticker: str) -> bool:
+    # sidecars written before partitioning have no "partitions" entry
+    return bool(meta and "partitions" in meta and has_data(PRICE_STORE, ticker, _files(meta)))
+
+def _publish(ticker: str, meta: dict) -> dict:
+    """Switch the sidecar to the new partitions, then drop the files it no longer lists."""
+    _write_meta(ticker, meta)
+    prune_partitions(PRICE_STORE, ticker, _files(meta))
+    return meta
 
+def _store_full(ticker: str, df: pd.DataFrame, auto_adjust: bool, covered_from, prev_meta: dict | None = None) -> dict:
+    """
+    Store a complete history. Changed years are written to new partition files
+    (unchanged ones are kept) and published together by the sidecar, so readers see
+    either the old or the new history, never old years next to re-adjusted ones.
+    """
+    prev = (prev_meta or {}).get("partitions", {})
+    name, parts = new_part_name(), {}
+    for y, part in split_years(df).items():
+        info = {"rows": int(len(part)), "hash": _content_hash(part)}
+        if prev.get(str(y), {}).get("hash") == info["hash"]:
+            parts[str(y)] = prev[str(y)]
+            continue
+        write_partition(PRICE_STORE, ticker, y, part, name)
+        parts[str(y)] = dict(info, file=name)
+    return _publish(ticker, _build_meta(ticker, parts, df.index.min(), df.index.max(), auto_adjust, covered_from))
+
+def _store_append(ticker: str, df_new: pd.DataFrame, meta: dict, auto_adjust: bool) -> dict:
+    """Append bars after meta['last_bar']: only the year partition(s) they fall in are rewritten."""
+    since = pd.Timestamp(year=int(df_new.index.min().year), month=1, day=1)
+    merged = _merge_new(read_partitions(PRICE_STORE, ticker, start=since, files=_files(meta)), df_new)
+    parts, name = dict(meta["partitions"]), new_part_name()
+    for y, part in split_years(merged).items():
+        write_partition(PRICE_STORE, ticker, y, part, name)
+        parts[str(y)] = {"rows": int(len(part)), "hash": _content_hash(part), "file": name}
+    return _publish(ticker, _build_meta(ticker, parts, meta["first_bar"], merged.index.max(),
+                                        auto_adjust, meta.get("covered_from")))
+
+def _read_legacy(ticker: str) -> pd.DataFrame | None:
+    path = _cache_path(ticker)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = flatten_ohlcv(_load(path), ticker)
+    except Exception:
+        return None
+    return None if df is None or df.empty else df
+
+def _migrate_legacy(ticker: str, auto_adjust: bool) -> None:
+    """
+    Move a pre-partitioning <ticker>.parquet into PRICE_STORE (caller holds the
+    ticker lock). Its freshness carries over, so no download is triggered by this.
+    """
+    meta = read_meta(ticker)
+    if _usable(meta, ticker):
+        return
+    df = _read_legacy(ticker)
+    if df is None:
+        return
+    adjusted = meta.get("auto_adjust", auto_adjust) if meta else auto_adjust
+    new_meta = _store_full(ticker, df, adjusted, meta.get("covered_from") if meta else None)
+    # keep the old check time (none: unknown, so staleness is judged by last_bar alone)
+    checked = meta.get("last_check") if meta else pd.Timestamp(0, tz="UTC").isoformat()
+    _write_meta(ticker, dict(new_meta, last_check=checked))
+
+def _closed_bars(df: pd.DataFrame | None) -> pd.DataFrame | None:
+    """Drop an in-progress bar for today so it is never cached as final."""
+    if df is None or df.empty:
+        return df
+    return df.loc[df.index <= last_closed_session()]
+
+def _needs_backfill(meta: dict, start: str) -> bool:
+    covered = pd.Timestamp(meta["first_bar"])
+    if meta.get("covered_from"):
+        covered = min(covered, pd.Timestamp(meta["covered_from"]))
+    return pd.Timestamp(start) < covered - _BACKFILL_SLACK
+
+def _merge_new(df_cached: pd.DataFrame | None, df_new: pd.DataFrame | None) -> pd.DataFrame:
+    if df_new is None or df_new.empty:
+        return df_cached
     if df_cached is None or df_cached.empty:
-        df_dl = yf.download(ticker, start=start, auto_adjust=auto_adjust, progress=False)
-        if df_dl is None or df_dl.empty:
-            raise ValueError(f"No data for {ticker}")
-        df_dl.index = pd.to_datetime(df_dl.index)
-        _save(df_dl, path)
-        return df_dl
-
-    # Incremental update from last cached date + 1 day
-    last_dt = pd.to_datetime(df_cached.index).max()
-    fetch_start = (pd.Timestamp(last_dt) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
-    df_new = yf.download(ticker, start=fetch_start, auto_adjust=auto_adjust, progress=False)
-
-    if df_new is not None and not df_new.empty:
-        df_new.index = pd.to_datetime(df_new.index)
-        df_out = pd.concat([df_cached, df_new]).sort_index()
-        # Drop exact duplicate index rows if any
-        df_out = df_out[~df_out.index.duplicated(keep="last")]
-    else:
-        df_out = df_cached
-
-    _save(df_out, path)
-    return df_out
+        return df_new.sort_index()
+    df_out = pd.concat([df_cached, df_new]).sort_index()
+    # Drop exact duplicate index rows if any
+    return df_out[~df_out.index.duplicated(keep="last")]
+
+def _next_day(ts) -> str:
+    return (pd.Timestamp(ts) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+
+def _apply_full(ticker, df_dl, meta, start, auto_adjust) -> bool:
+    """Store a from-`start` download; on an empty one keep serving an existing (backfill) cache."""
+    df_dl = _closed_bars(df_dl)
+    if df_dl is None or df_dl.empty:
+        if not _usable(meta, ticker) or bool(meta.get("auto_adjust", True)) != bool(auto_adjust):
+            return False
+        # provider has nothing earlier: remember that so we do not ask again
+        covered = min(pd.Timestamp(start), pd.Timestamp(meta["covered_from"])).strftime("%Y-%m-%d")
+        _touch_meta(ticker, meta, covered_from=covered)
+        return True
+    _store_full(ticker, df_dl, auto_adjust, start, prev_meta=meta)
+    return True
+
+def _apply_incremental(ticker, df_new, meta, auto_adjust) -> None:
+    """Append new closed bars; a no-op check only bumps last_check (no data rewrite)."""
+    df_new = _closed_bars(df_new)
+    if df_new is not None:
+        df_new = df_new.loc[df_new.index > pd.Timestamp(meta["last_bar"])]
+    if df_new is None or df_new.empty:
+        _touch_meta(ticker, meta)
+        return
+    _store_append(ticker, df_new, meta, auto_adjust)
+
+def _plan(ticker: str, start: str, auto_adjust: bool, force_refresh: bool):
+    """('current' | 'full' | 'incremental', meta) for one ticker; reads only the sidecar."""
+    if force_refresh:
+        return "full", None
+    meta = read_meta(ticker)
+    if not _usable(meta, ticker):
+        return "full", None
+    if bool(meta.get("auto_adjust", True)) != bool(auto_adjust) or _needs_backfill(meta, start):
+        return "full", meta
+    if _is_current(meta, auto_adjust):
+        return "current", meta
+    return "incremental", meta
+
+def _window(ticker: str, start, end, columns) -> pd.DataFrame:
+    df = read_prices(ticker, start, end, columns)
+    return pd.DataFrame() if df is None else df
+
+def load_prices(
+    ticker: str,
+    start: str,
+    auto_adjust: bool = True,
+    force_refresh: bool = False,
+    *,
+    end: str | None = None,
+    columns: List[str] | None = None,
+    downloader: Downloader | None = None,
+) -> pd.DataFrame:
+    """
+    Cached daily OHLCV for a ticker from `start` (to `end`, if given); incremental
+    updates if a cache exists. Frames are stored and returned flat (Open/High/Low/Close/Volume).
+      - columns: read only these fields (e.g. ["Close"]); the date filter and the
+        projection are pushed down to the partitioned store
+      - downloader: replaces yf.download (see marketdata.py for pluggable providers)
+    A cache holding the latest closed session (see _is_current) is read straight
+    from disk. A cache that starts well after `start` is re-downloaded from `start`.
+    Refreshes run under ticker_lock; a caller that waited on the lock re-reads the
+    sidecar and only downloads if the ticker is still stale.
+    """
+    download = downloader or _yf_download
+    action, meta = _plan(ticker, start, auto_adjust, force_refresh)
+    if action == "current":
+        return _window(ticker, start, end, columns)
+
+    with ticker_lock(ticker):
+        if not force_refresh:
+            _migrate_legacy(ticker, auto_adjust)
+            action, meta = _plan(ticker, start, auto_adjust, False)
+
+        if action == "full":
+            df_dl = flatten_ohlcv(download(ticker, start, auto_adjust), ticker)
+            if not _apply_full(ticker, df_dl, meta, start, auto_adjust):
+                raise ValueError(f"No data for {ticker}")
+        elif action == "incremental":
+            # Incremental update from last cached date + 1 day
+            df_new = flatten_ohlcv(download(ticker, _next_day(meta["last_bar"]), auto_adjust), ticker)
+            _apply_incremental(ticker, df_new, meta, auto_adjust)
+        return _window(ticker, start, end, columns)
+
+def _split_batch(raw: pd.DataFrame, ticker: str) -> pd.DataFrame | None:
+    """Pull one ticker's flat OHLCV out of a grouped multi-ticker download."""
+    if raw is None or raw.empty:
+        return None
+    if isinstance(raw.columns, pd.MultiIndex) and not any(
+        ticker in raw.columns.get_level_values(lvl) for lvl in range(raw.columns.nlevels)
+    ):
+        return None
+    df = flatten_ohlcv(raw, ticker)
+    # rows where this ticker did not trade come back all-NaN in a grouped download
+    df = df.dropna(how="all")
+    return None if df.empty else df
+
+def refresh_many(
+    tickers: List[str],
+    start: str,
+    auto_adjust: bool = True,
+    force_refresh: bool = False,
+    *,
+    downloader: BatchDownloader | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> List[str]:
+    """
+    Bring the cache for `tickers` up to date from `start` without reading any bars;
+    returns the tickers that have data. Current caches cost one sidecar read. The
+    rest is refreshed a chunk of `chunk_size` tickers at a time while holding their
+    ticker locks: missing (or backfill) tickers in one grouped download from `start`,
+    stale ones in one grouped incremental download from their earliest last-cached date.
+    """
+    download = downloader or _yf_download_many
+    have: set = set()
+    todo: List[str] = []
+
+    for tk in dict.fromkeys(tickers):  # de-duplicate, keep order
+        action, _ = _plan(tk, start, auto_adjust, force_refresh)
+        if action == "current":
+            have.add(tk)
+        else:
+            todo.append(tk)
+
+    for i in range(0, len(todo), chunk_size):
+        chunk = todo[i:i + chunk_size]
+        with ExitStack() as stack:
+            for tk in sorted(chunk):  # fixed order: no lock-order deadlocks
+                stack.enter_context(ticker_lock(tk))
+
+            full: Dict[str, dict | None] = {}
+            incr: Dict[str, dict] = {}
+            for tk in chunk:  # re-check: another process may have refreshed meanwhile
+                if not force_refresh:
+                    _migrate_legacy(tk, auto_adjust)
+                action, meta = _plan(tk, start, auto_adjust, force_refresh)
+                if action == "current":
+                    have.add(tk)
+                elif action == "full":
+                    full[tk] = meta
+                else:
+                    incr[tk] = meta
+
+            if full:
+                raw = download(list(full), start, auto_adjust)
+                for tk, meta in full.items():
+                    if _apply_full(tk, _split_batch(raw, tk), meta, start, auto_adjust):
+                        have.add(tk)
+
+            if incr:
+                fetch_start = _next_day(min(pd.Timestamp(meta["last_bar"]) for meta in incr.values()))
+                raw = download(list(incr), fetch_start, auto_adjust)
+                for tk, meta in incr.items():
+                    _apply_incremental(tk, _split_batch(raw, tk), meta, auto_adjust)
+                    have.add(tk)
+
+    return [tk for tk in dict.fromkeys(tickers) if tk in have]
+
+def load_prices_many(
+    tickers: List[str],
+    start: str,
+    auto_adjust: bool = True,
+    force_refresh: bool = False,
+    *,
+    end: str | None = None,
+    columns: List[str] | None = None,
+    downloader: BatchDownloader | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Bulk variant of load_prices: returns {ticker: flat OHLCV from start (to end)}.
+    Stale tickers are refreshed with grouped downloads (see refresh_many).
+    Tickers the provider has no data for are left out.
+    """
+    have = refresh_many(tickers, start, auto_adjust, force_refresh,
+                        downloader=downloader, chunk_size=chunk_size)
+    return {tk: _window(tk, start, end, columns) for tk in have}
 
 def clear_cache(ticker: str | None = None) -> int:
     """
-    Remove cached file(s). Returns count removed.
+    Remove cached ticker(s): store partitions, sidecars and old single-file caches.
+    Returns the number of tickers removed.
     """
     if ticker:
-        p = _cache_path(ticker)
-        if os.path.exists(p):
-            os.remove(p)
-            return 1
-        return 0
-    cnt = 0
+        found = os.path.isdir(key_dir(PRICE_STORE, ticker)) or os.path.exists(_cache_path(ticker))
+        drop_partitions(PRICE_STORE, ticker)
+        for p in (_cache_path(ticker), _meta_path(ticker)):
+            if os.path.exists(p):
+                os.remove(p)
+        return int(found)
+    names = set()
+    if os.path.isdir(PRICE_STORE):
+        names.update(d[len("ticker="):] for d in os.listdir(PRICE_STORE) if d.startswith("ticker="))
+        shutil.rmtree(PRICE_STORE, ignore_errors=True)
     for f in os.listdir(CACHE_DIR):
-        if f.endswith(".parquet") or f.endswith(".pkl"):
+        path = os.path.join(CACHE_DIR, f)
+        if f.endswith(".meta.json") or f.endswith(".parquet") or f.endswith(".pkl"):
             try:
-                os.remove(os.path.join(CACHE_DIR, f)); cnt += 1
+                os.remove(path)
             except Exception:
-                pass
-    return cnt
+                continue
+            if not f.endswith(".meta.json"):
+                names.add(os.path.splitext(f)[0])
+    return len(names)
@@ -1,13 +1,17 @@
 # core/research/cli.py
 from __future__ import annotations
-import os, json, sys, pathlib
+import os, json, sys, pathlib, time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import click
 import pandas as pd
 import numpy as np
 
 # Local imports
-from .cache import load_prices
-from .factors import compute_alpha_factors
+from .cache import CHUNK_SIZE, load_prices, load_prices_many
+from .marketdata import get_close, get_ohlcv, refresh_prices
+from .ohlcv import canonical_ohlcv
+from .precompute import factor_table
 from .walkforward import walk_forward_splits
 from .models import feature_columns, train_xgb_prob
 from .backtest import backtest_prob_strategy
@@ -15,120 +19,131 @@ from .experiment import run_walkforward_xgb_sweep, persist_final_xgb_model
 from .stats import sharpe_ratio
 
 # ---------- helpers ----------
-def _flatten_ohlcv(px_raw, ticker: str | None = None) -> pd.DataFrame:
-    """
-    Normalize a variety of yfinance/pandas OHLCV column shapes to a flat, lowercase set:
-    ['open','high','low','close','volume'].
-    Handles:
-      - Plain Index of strings (e.g., 'Open', 'Adj Close', ...)
-      - Tuple-like columns or MultiIndex columns (e.g., ('AAPL','Open') or ('Open',))
-      - Multi-ticker downloads (filters to the provided ticker if present)
-    """
-    if px_raw is None or px_raw.empty:
-        return pd.DataFrame(index=pd.Index([], dtype='datetime64[ns]'))
-
-    df = px_raw.copy()
-
-    # Convert any MultiIndex/tuple columns into strings like "AAPL_Open" or just "Open"
-    if isinstance(df.columns, pd.MultiIndex):
-        new_cols = []
-        for tup in df.columns:
-            # tup is a tuple; keep non-empty parts
-            parts = [str(x) for x in tup if x not in (None, "", "None")]
-            new_cols.append("_".join(parts))
-        df.columns = new_cols
-    else:
-        # some pandas/yf versions may still yield tuple-ish entries in a plain Index
-        def _col_to_str(c):
-            if isinstance(c, tuple):
-                parts = [str(x) for x in c if x not in (None, "", "None")]
-                return "_".join(parts)
-            return str(c)
-        df.columns = [_col_to_str(c) for c in df.columns]
-
-    # If this came from a multi-ticker pull and a ticker is provided, isolate that ticker's columns
-    if ticker:
-        prefix = f"{ticker}_"
-        ticker_cols = [c for c in df.columns if c.startswith(prefix)]
-        if ticker_cols:
-            df = df[ticker_cols]
-            # drop the ticker prefix -> leave bare field names
-            df.columns = [c[len(prefix):] for c in df.columns]
-
-    # standardize naming
-    rename_map = {
-        "open": "open",
-        "high": "high",
-        "low": "low",
-        "close": "close",
-        "adj_close": "close",   # prefer adjusted close if that's what we have
-        "adjclose": "close",
-        "volume": "volume",
-    }
+def _ensure_dir(path: str): pathlib.Path(path).mkdir(parents=True, exist_ok=True)
 
-    def _norm(c: str) -> str:
-        c_low = c.lower().replace(" ", "_")
-        # common yf variations like "AAPL_Close", "Close_x", etc. handled above
-        return rename_map.get(c_low, c_low)
+# ---------- CLI ----------
+@click.group(help="Research pipeline CLI (train | backtest | report | fetch | factors | backfill | warmup | ff-refresh | bench-factors | bench-compact | bench-folds | bench-ohlcv | bench-backfill | bench-locks | bench-rewrite | check-history)")
+def cli():
+    pass
 
-    df.columns = [_norm(c) for c in df.columns]
+# ---------- process pool ----------
+_SHARED: dict = {}  # per-process data installed once by a pool initializer
 
-    # If both 'close' and 'adj_close' ended up in cols, keep one 'close'
-    if "adj_close" in px_raw.columns:
-        # already mapped above; ensure single 'close' column if duplicates pop up
-        if isinstance(df.columns, pd.Index):
-            df = df.loc[:, ~df.columns.duplicated()]
+def _set_shared(shared: dict):
+    _SHARED.update(shared)
 
-    # keep known fields that actually exist
-    keep = [c for c in ["open", "high", "low", "close", "volume"] if c in df.columns]
-    if not keep:
-        # fall back to whatever we have, at least return something
-        return df
+def _pool_map(fn, items, workers: int, initializer=None, initargs=()):
+    """
+    Yields (item, result or exception) for every item, in order. With workers > 1 the
+    items run on a process pool; `initializer(*initargs)` runs once per worker, so
+    large shared inputs travel once per process rather than with every task.
+    """
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for it in items:
+            try:
+                yield it, fn(it)
+            except Exception as e:
+                yield it, e
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        futs = [(it, pool.submit(fn, it)) for it in items]
+        for it, fut in futs:
+            try:
+                yield it, fut.result()
+            except Exception as e:
+                yield it, e
 
-    df = df[keep].copy()
-    df.index = pd.to_datetime(df.index)
-    df = df.sort_index()
-    return df
+def _summary(what: str, done: int, failed: dict, seconds: float):
+    click.echo(f"{what}: {done} ok, {len(failed)} failed in {seconds:.1f}s")
+    for tk, err in failed.items():
+        click.echo(f"  {tk}: {err}", err=True)
+    if failed:
+        sys.exit(1)
 
-def _ensure_dir(path: str): pathlib.Path(path).mkdir(parents=True, exist_ok=True)
+def _fetch_chunk(tickers, start, force_refresh):
+    got = load_prices_many(list(tickers), start=start, force_refresh=force_refresh)
+    return {tk: len(df) for tk, df in got.items()}
 
-# ---------- CLI ----------
-@click.group(help="Research pipeline CLI (train | backtest | report | fetch | factors)")
-def cli():
-    pass
+def _factors_one(tk, start, outdir):
+    # SPY/^VIX come from the worker's shared copy (see _set_shared)
+    df = factor_table(tk, start, spy=_SHARED.get("spy"), vix=_SHARED.get("vix"))
+    path = os.path.join(outdir, f"{tk.upper()}_factors.parquet")
+    df.to_parquet(path)
+    return path, len(df)
 
 @cli.command(help="Fetch & cache prices for a list of tickers.")
 @click.option("--tickers", "-t", multiple=True, required=True, help="Tickers, repeat flag or comma-separated.")
 @click.option("--start", default="2015-01-01", show_default=True)
 @click.option("--force-refresh", is_flag=True, default=False)
-def fetch(tickers, start, force_refresh):
+@click.option("--workers", type=int, default=1, show_default=True,
+              help="Processes downloading groups of tickers concurrently.")
+def fetch(tickers, start, force_refresh, workers):
     tickers = sum([t.split(",") for t in tickers], [])
-    for tk in tickers:
-        df = load_prices(tk, start=start, force_refresh=force_refresh)
-        click.echo(f"Fetched {tk}: {len(df)} rows")
+    t0 = time.perf_counter()
+    # one grouped download per chunk of tickers instead of one per ticker
+    chunks = [tuple(tickers)] if workers <= 1 else \
+        [tuple(tickers[i:i + CHUNK_SIZE]) for i in range(0, len(tickers), CHUNK_SIZE)]
+    failed, done = {}, 0
+    for chunk, got in _pool_map(partial(_fetch_chunk, start=start, force_refresh=force_refresh), chunks, workers):
+        for tk in chunk:
+            if isinstance(got, Exception):
+                failed[tk] = got
+            elif tk in got:
+                done += 1
+                click.echo(f"Fetched {tk}: {got[tk]} rows")
+            else:
+                failed[tk] = "no data"
+    _summary("fetch", done, failed, time.perf_counter() - t0)
 
 @cli.command(help="Compute and persist factors parquet for a list of tickers.")
 @click.option("--tickers", "-t", multiple=True, required=True)
 @click.option("--start", default="2015-01-01", show_default=True)
 @click.option("--outdir", default="data/factors", show_default=True)
-def factors(tickers, start, outdir):
+@click.option("--workers", type=int, default=1, show_default=True,
+              help="Processes computing factor tables concurrently.")
+def factors(tickers, start, outdir, workers):
     tickers = sum([t.split(",") for t in tickers], [])
     _ensure_dir(outdir)
+    t0 = time.perf_counter()
 
-    # load SPY/VIX for cross-asset features if present
-    spy = load_prices("SPY", start=start)
-    spy = (spy["Close"] if "Close" in spy.columns else spy.iloc[:, 0]).squeeze("columns")
+    # warm the whole universe (plus SPY/VIX for cross-asset features) in bulk
+    have = set(refresh_prices(tickers + ["SPY", "^VIX"], start))
+    failed = {tk: "no data" for tk in tickers if tk not in have}
+    # cross-asset inputs loaded once here, handed to each worker once
+    spy, vix = get_close("SPY", start), get_close("^VIX", start)
 
-    vix = load_prices("^VIX", start=start)
-    vix = (vix["Close"] if "Close" in vix.columns else vix.iloc[:, 0]).squeeze("columns")
+    done = 0
+    todo = [tk for tk in tickers if tk in have]
+    task = partial(_factors_one, start=start, outdir=outdir)
+    # read from / written to the factor store, keyed by the price data and the factor code
+    for tk, res in _pool_map(task, todo, workers, initializer=_set_shared, initargs=({"spy": spy, "vix": vix},)):
+        if isinstance(res, Exception):
+            failed[tk] = res
+            continue
+        done += 1
+        click.echo(f"Wrote {res[0]} ({res[1]} rows)")
+    _summary("factors", done, failed, time.perf_counter() - t0)
 
-    for tk in tickers:
-        px = load_prices(tk, start=start)
-        px_flat = _flatten_ohlcv(px, tk)
-        df = compute_alpha_factors(px_flat, spy=spy, vix=vix, sector=None)
-        path = os.path.join(outdir, f"{tk.upper()}_factors.parquet")
-        df.to_parquet(path)
-        click.echo(f"Wrote {path} ({len(df)} rows)")
+@cli.command(help="Backfill factor tables for a large universe out of core, into the partitioned factor store.")
+@click.option("--tickers", "-t", multiple=True, required=True)
+@click.option("--start", default="1995-01-01", show_default=True)
+@click.option("--memory-mb", type=float, default=None, help="Peak memory budget (default FACTOR_MEMORY_MB).")
+@click.option("--years", type=int, default=None, help="Calendar years per time chunk (default BACKFILL_YEARS).")
+@click.option("--compact/--no-compact", default=False, show_default=True, help="Store compact dtypes (see FACTOR_COMPACT).")
+def backfill(tickers, start, memory_mb, years, compact):
+    from .backfill import backfill_factors
+    from .panel import build_panel
+    tickers = sum([t.split(",") for t in tickers], [])
+    panel = build_panel(tickers, start)
+    missing = sorted(set(tickers) - set(panel.tickers))
+    if missing:
+        click.echo(f"No data for {len(missing)} tickers: {', '.join(missing[:20])}", err=True)
+    stats = backfill_factors(panel, spy=get_close("SPY", start), vix=get_close("^VIX", start),
+                             memory_mb=memory_mb, years_per_chunk=years, compact=compact,
+                             progress=lambda st: click.echo(json.dumps(st)))
+    click.echo(json.dumps(stats))
 
 @cli.command(help="Train best XGB via walk-forward and optionally persist.")
 @click.option("--ticker", required=True)
@@ -138,20 +153,26 @@ def factors(tickers, start, outdir):
 @click.option("--test-window", type=int, default=63, show_default=True)
 @click.option("--persist/--no-persist", default=True, show_default=True)
 @click.option("--models-dir", default="models", show_default=True)
-def train(ticker, start, horizon, train_window, test_window, persist, models_dir):
-    spy = load_prices("SPY", start=start)["Close"]
-    vix = load_prices("^VIX", start=start)["Close"]
-    px  = load_prices(ticker, start=start)
-    df_px = _flatten_ohlcv(px, ticker)
+@click.option("--workers", type=int, default=None, help="Candidates scored concurrently (default SWEEP_WORKERS).")
+@click.option("--search", type=click.Choice(["grid", "halving", "tpe"]), default="grid", show_default=True,
+              help="halving = successive halving on the most recent folds, full walk-forward for the survivors; "
+                   "tpe = model-based search over DEFAULT_PARAM_SPACE ranges.")
+@click.option("--trials", type=int, default=30, show_default=True, help="--search tpe: trial budget.")
+@click.option("--time-budget", type=float, default=None, help="--search tpe: wall-clock budget in seconds.")
+def train(ticker, start, horizon, train_window, test_window, persist, models_dir, workers, search, trials, time_budget):
+    spy = get_close("SPY", start)
+    vix = get_close("^VIX", start)
+    df_px = canonical_ohlcv(get_ohlcv(ticker, start), ticker)
+    df_all = factor_table(ticker, start)
     res = run_walkforward_xgb_sweep(
         px=df_px, spy=spy, vix=vix, sector=None,
-        horizon=horizon, train_window=train_window, test_window=test_window, param_grid=None
+        horizon=horizon, train_window=train_window, test_window=test_window, param_grid=None,
+        df_all=df_all, workers=workers, search=search, n_trials=trials, time_budget=time_budget,
+        on_result=lambda r: click.echo(f"[{r['done']}/{r['total']}] sharpe={r['sharpe']:.3f} {r['params']}", err=True),
     )
-    click.echo(json.dumps({"best_params": res.get("best_params", {}), "summary_len": len(res.get("summary", []))}, indent=2))
+    click.echo(json.dumps({"best_params": res.get("best_params", {}), "summary_len": len(res.get("summary", [])),
+                           **({"search": res["search"]} if "search" in res else {})}, indent=2))
     if persist and res.get("best_params"):
-        from .factors import compute_alpha_factors
-        from .models import feature_columns
-        df_all = compute_alpha_factors(df_px, spy=spy, vix=vix, sector=None)
         feats = [c for c in feature_columns(df_all) if c in df_all.columns]
         model_dir = os.path.join(models_dir, ticker.upper())
         paths = persist_final_xgb_model(
@@ -174,13 +195,8 @@ def train(ticker, start, horizon, train_window, test_window, persist, models_dir
 @click.option("--threshold", type=float, default=0.5, show_default=True)
 @click.option("--cost-bps", type=float, default=5.0, show_default=True)
 def backtest(ticker, start, signal_col, horizon, train_window, test_window, threshold, cost_bps):
-    spy = load_prices("SPY", start=start)["Close"]
-    vix = load_prices("^VIX", start=start)["Close"]
-    px  = load_prices(ticker, start=start)
-    df_px = _flatten_ohlcv(px, ticker)
-
     # Factors (for signal_col existence or to train)
-    df_all = compute_alpha_factors(df_px, spy=spy, vix=vix, sector=None)
+    df_all = factor_table(ticker, start)
 
     ret_col = f"target_ret_{horizon}"
     if signal_col.startswith("prob_up"):
@@ -223,11 +239,7 @@ def backtest(ticker, start, signal_col, horizon, train_window, test_window, thre
 @click.option("--start", default="2020-01-01", show_default=True)
 @click.option("--horizon", default="1d", show_default=True)
 def report(ticker, start, horizon):
-    spy = load_prices("SPY", start=start)["Close"]
-    vix = load_prices("^VIX", start=start)["Close"]
-    px  = load_prices(ticker, start=start)
-    df_px = _flatten_ohlcv(px, ticker)
-    factors = compute_alpha_factors(df_px, spy=spy, vix=vix, sector=None)
+    factors = factor_table(ticker, start)
     payload = {
         "ticker": ticker.upper(),
         "rows": int(len(factors)),
@@ -237,5 +249,562 @@ def report(ticker, start, horizon):
     }
     click.echo(json.dumps(payload, indent=2))
 
+@cli.command(help="Pre-fetch prices, factor tables and default walk-forward models for a universe.")
+@click.option("--tickers", "-t", multiple=True, help="Defaults to DEFAULT_UNIVERSE (as served by /api/settings).")
+@click.option("--start", default=None, help="Defaults to WARMUP_START (2015-01-01).")
+@click.option("--horizons", default=None, help="Comma-separated, e.g. 1d,5d (default WARMUP_HORIZONS).")
+@click.option("--workers", type=int, default=None, help="Tickers warmed concurrently (default WARMUP_WORKERS).")
+def warmup(tickers, start, horizons, workers):
+    from .warmup import run_warmup
+    tickers = sum([t.split(",") for t in tickers], []) or None
+    status = run_warmup(
+        tickers=tickers, start=start,
+        horizons=horizons.split(",") if horizons else None, workers=workers,
+    )
+    for tk, err in status.get("errors", {}).items():
+        click.echo(f"{tk}: {err}", err=True)
+    click.echo(json.dumps({k: status.get(k) for k in ("state", "universe", "steps_done", "steps_total",
+                                                      "started_at", "finished_at")}, indent=2))
+    if status.get("state") != "done":
+        sys.exit(1)
+
+@cli.command("ff-refresh", help="Refresh the local Fama-French daily store (download, or --seed a local file).")
+@click.option("--set", "which", type=click.Choice(["ff3", "ff5", "all"]), default="all", show_default=True)
+@click.option("--seed", "seed_path", default=None, help="Local Ken French CSV / Parquet to load instead of downloading.")
+@click.option("--percent/--decimal", default=True, show_default=True, help="Units of the seed file.")
+def ff_refresh(which, seed_path, percent):
+    from .ff import refresh_ff_factors, seed_ff_factors
+    sets = ["ff3", "ff5"] if which == "all" else [which]
+    if seed_path and len(sets) > 1:
+        raise click.UsageError("--seed needs a single --set (ff3 or ff5).")
+    failed = False
+    for ws in sets:
+        try:
+            meta = seed_ff_factors(seed_path, ws, percent=percent) if seed_path else refresh_ff_factors(ws)
+            click.echo(f"{ws}: {meta['rows']} rows {meta['first']}..{meta['last']} (version {meta['version']})")
+        except Exception as e:
+            failed = True
+            click.echo(f"{ws}: refresh failed: {e}", err=True)
+    if failed:
+        sys.exit(1)
+
+def _synthetic_reference(rng, days: int):
+    """Business-day index plus random-walk SPY and VIX closes, for the benchmarks."""
+    dates = pd.bdate_range("2010-01-01", periods=days)
+    spy = pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, days))), index=dates)
+    vix = pd.Series(20 * np.exp(np.cumsum(rng.normal(0, 0.05, days))), index=dates)
+    return dates, spy, vix
+
+def _synthetic_ohlcv(rng, days: int, n: int):
+    """(days x n) column-major close/high/low/volume random walks."""
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, (days, n)), axis=0))
+    high = close * (1 + rng.uniform(0, 0.02, (days, n)))
+    low = close * (1 - rng.uniform(0, 0.02, (days, n)))
+    volume = rng.integers(100_000, 5_000_000, (days, n)).astype(float)
+    return tuple(np.asfortranarray(a) for a in (close, high, low, volume))
+
+@cli.command("bench-factors", help="Time the panel factor engine against per-ticker compute_alpha_factors.")
+@click.option("--sizes", default="50,500,2000", show_default=True, help="Comma-separated universe sizes.")
+@click.option("--days", type=int, default=2520, show_default=True, help="Trading days per ticker (synthetic).")
+@click.option("--sample", type=int, default=None,
+              help="Time the per-ticker path on this many tickers and extrapolate (default: all).")
+@click.option("--seed", type=int, default=0, show_default=True)
+def bench_factors(sizes, days, sample, seed):
+    from .factors import compute_alpha_factors
+    from .panel_factors import compute_alpha_factors_panel
+    rng = np.random.default_rng(seed)
+    dates, spy, vix = _synthetic_reference(rng, days)
+    for n in [int(x) for x in sizes.split(",") if x.strip()]:
+        close, high, low, volume = _synthetic_ohlcv(rng, days, n)
+
+        t0 = time.perf_counter()
+        panel = compute_alpha_factors_panel(close, high, low, volume, spy=spy.to_numpy(), vix=vix.to_numpy())
+        t_panel = time.perf_counter() - t0
+
+        m = n if sample is None else max(1, min(sample, n))
+        worst, t_loop = 0.0, 0.0
+        for j in range(m):
+            t0 = time.perf_counter()
+            px = pd.DataFrame({"High": high[:, j], "Low": low[:, j], "Close": close[:, j],
+                               "Volume": volume[:, j]}, index=dates)
+            ref = compute_alpha_factors(px, spy=spy, vix=vix, sector=None)
+            t_loop += time.perf_counter() - t0
+            for col, arr in panel.items():
+                b = ref[col].to_numpy(dtype=float)
+                fin = np.isfinite(b)
+                if fin.any():
+                    worst = max(worst, float(np.max(np.abs(arr[fin, j] - b[fin]) / (1 + np.abs(b[fin])))))
+        t_loop *= n / m
+        click.echo(json.dumps({
+            "tickers": n, "days": days, "panel_s": round(t_panel, 3),
+            "per_ticker_s": round(t_loop, 3), "extrapolated": m < n,
+            "speedup": round(t_loop / t_panel, 1) if t_panel > 0 else None,
+            "max_rel_diff": worst,
+        }))
+        del panel
+
+@cli.command("bench-compact", help="Memory of float64 vs compact (FACTOR_COMPACT) factor tables, and walk-forward metrics on both.")
+@click.option("--tickers", type=int, default=500, show_default=True, help="Universe size for the panel memory figure (synthetic).")
+@click.option("--days", type=int, default=2520, show_default=True, help="Trading days (synthetic).")
+@click.option("--ticker", default=None, help="Run the model check on this ticker's prices instead of a synthetic series.")
+@click.option("--start", default="2015-01-01", show_default=True)
+@click.option("--horizon", default="1d", show_default=True)
+@click.option("--max-folds", type=int, default=8, show_default=True)
+@click.option("--tol", type=float, default=1e-3, show_default=True, help="Largest allowed difference per model metric.")
+@click.option("--seed", type=int, default=0, show_default=True)
+def bench_compact(tickers, days, ticker, start, horizon, max_folds, tol, seed):
+    from .factors import compute_alpha_factors, compact_factors
+    from .panel_factors import compute_alpha_factors_panel
+    from .experiment import run_walkforward_xgb
+    rng = np.random.default_rng(seed)
+    dates, spy, vix = _synthetic_reference(rng, days)
+
+    # 1) universe panel: every factor column as a (days x tickers) array
+    close, high, low, volume = _synthetic_ohlcv(rng, days, tickers)
+    mb = {}
+    for compact in (False, True):
+        panel = compute_alpha_factors_panel(close, high, low, volume, spy=spy.to_numpy(), vix=vix.to_numpy(),
+                                            compact=compact)
+        mb[compact] = sum(a.nbytes for a in panel.values()) / 2**20
+        del panel
+    click.echo(json.dumps({"panel_tickers": tickers, "days": days, "float64_mb": round(mb[False], 1),
+                           "compact_mb": round(mb[True], 1), "ratio": round(mb[True] / mb[False], 3)}))
+
+    # 2) one ticker's factor table and the walk-forward model on both dtypes
+    if ticker:
+        from .marketdata import get_ohlcv, get_close
+        px, spy, vix = get_ohlcv(ticker, start), get_close("SPY", start), get_close("^VIX", start)
+        if px is None or px.empty:
+            click.echo(f"No data for {ticker}", err=True)
+            sys.exit(1)
+    else:
+        px = pd.DataFrame({"High": high[:, 0], "Low": low[:, 0], "Close": close[:, 0],
+                           "Volume": volume[:, 0]}, index=dates)
+    full = compute_alpha_factors(px, spy=spy, vix=vix)
+    tables = {"float64": full, "compact": compact_factors(full)}
+    metrics, worst = {}, 0.0
+    for name, df in tables.items():
+        t0 = time.perf_counter()
+        res = run_walkforward_xgb(px, spy=spy, vix=vix, horizon=horizon, df_all=df.copy(), max_folds=max_folds)
+        metrics[name] = {k: v for k, v in res["metrics"].items() if isinstance(v, (int, float))}
+        click.echo(json.dumps({"table": name, "rows": len(df),
+                               "table_mb": round(df.memory_usage(deep=True).sum() / 2**20, 2),
+                               "fit_s": round(time.perf_counter() - t0, 2), "metrics": metrics[name]}))
+    for k, v in metrics["float64"].items():
+        worst = max(worst, abs(v - metrics["compact"].get(k, float("nan"))))
+    ok = bool(worst <= tol)
+    click.echo(json.dumps({"max_metric_diff": worst, "tol": tol, "ok": ok}))
+    if not ok:
+        sys.exit(1)
+
+@cli.command("bench-folds", help="Serial vs fold-parallel walk-forward: wall time and an exact comparison of the results.")
+@click.option("--days", type=int, default=3400, show_default=True, help="Trading days (synthetic; 3400 gives 40 folds).")
+@click.option("--ticker", default=None, help="Use this ticker's prices instead of a synthetic series.")
+@click.option("--start", default="2005-01-01", show_default=True)
+@click.option("--horizon", default="1d", show_default=True)
+@click.option("--max-folds", type=int, default=40, show_default=True)
+@click.option("--workers", type=int, default=None, help="Concurrent folds (default: CPU count).")
+@click.option("--threads", type=int, default=None, help="XGBoost threads per fold (default: CPUs / workers).")
+@click.option("--pool", type=click.Choice(["thread", "process"]), default="thread", show_default=True)
+@click.option("--seed", type=int, default=0, show_default=True)
+def bench_folds(days, ticker, start, horizon, max_folds, workers, threads, pool, seed):
+    from .factors import compute_alpha_factors
+    from .experiment import run_walkforward_xgb
+    if ticker:
+        from .marketdata import get_ohlcv
+        px, spy, vix = get_ohlcv(ticker, start), get_close("SPY", start), get_close("^VIX", start)
+        if px is None or px.empty:
+            click.echo(f"No data for {ticker}", err=True)
+            sys.exit(1)
+    else:
+        rng = np.random.default_rng(seed)
+        dates, spy, vix = _synthetic_reference(rng, days)
+        close, high, low, volume = _synthetic_ohlcv(rng, days, 1)
+        px = pd.DataFrame({"High": high[:, 0], "Low": low[:, 0], "Close": close[:, 0],
+                           "Volume": volume[:, 0]}, index=dates)
+    df_all = compute_alpha_factors(px, spy=spy, vix=vix)
+    workers = workers or os.cpu_count() or 1
+    runs = {}
+    for name, kw in (("serial", {"fold_workers": 1}),
+                     ("parallel", {"fold_workers": workers, "threads_per_fold": threads, "fold_pool": pool})):
+        t0 = time.perf_counter()
+        runs[name] = run_walkforward_xgb(px, spy=spy, vix=vix, horizon=horizon, df_all=df_all.copy(),
+                                         max_folds=max_folds, **kw)
+        runs[name]["seconds"] = time.perf_counter() - t0
+    a, b = runs["serial"], runs["parallel"]
+    identical = bool(a["predictions"].equals(b["predictions"])
+                     and a["feature_importance"] == b["feature_importance"]
+                     and a["metrics"] == b["metrics"])
+    click.echo(json.dumps({
+        "rows": len(df_all), "max_folds": max_folds, "workers": workers, "pool": pool,
+        "serial_s": round(a["seconds"], 2), "parallel_s": round(b["seconds"], 2),
+        "speedup": round(a["seconds"] / b["seconds"], 2) if b["seconds"] > 0 else None,
+        "identical": identical,
+    }))
+    if not identical:
+        sys.exit(1)
+
+@cli.command("bench-ohlcv", help="Per-call cost of the OHLCV normalization layer on the common yfinance layouts.")
+@click.option("--days", type=int, default=2520, show_default=True, help="Rows per frame (synthetic).")
+@click.option("--batch", type=int, default=50, show_default=True, help="Tickers in the multi-ticker download layouts.")
+@click.option("--repeat", type=int, default=200, show_default=True)
+def bench_ohlcv(days, batch, repeat):
+    from . import ohlcv
+    fields = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+    idx = pd.bdate_range("2010-01-01", periods=days, tz="America/New_York")
+    names = ["AAPL"] + [f"T{i:03d}" for i in range(1, batch)]
+
+    def frame(cols):
+        return pd.DataFrame(np.random.default_rng(0).random((days, len(cols))), index=idx, columns=cols)
+
+    layouts = {
+        "plain": frame(fields),
+        "field_ticker": frame(pd.MultiIndex.from_product([fields, ["AAPL"]])),
+        "ticker_field": frame(pd.MultiIndex.from_product([["AAPL"], fields])),
+        "batch_field_ticker": frame(pd.MultiIndex.from_product([fields, names])),
+        "batch_ticker_field": frame(pd.MultiIndex.from_product([names, fields])),
+    }
+
+    def per_call_us(fn, cold: bool) -> float:
+        total = 0.0
+        for _ in range(repeat):
+            if cold:
+                ohlcv._flat_layout.cache_clear()
+                ohlcv._roles.cache_clear()
+            t0 = time.perf_counter()
+            fn()
+            total += time.perf_counter() - t0
+        return round(total / repeat * 1e6, 1)
+
+    for name, df in layouts.items():
+        canon = ohlcv.canonical_ohlcv(df, "AAPL")
+        row = {"layout": name, "columns": df.shape[1]}
+        for label, fn in (("flatten", lambda: ohlcv.flatten_ohlcv(df, "AAPL")),
+                          ("canonical", lambda: ohlcv.canonical_ohlcv(df, "AAPL")),
+                          ("close", lambda: ohlcv.close_series(df, "AAPL")),
+                          ("roles", lambda: ohlcv.price_roles(canon.columns))):
+            row[f"{label}_cold_us"] = per_call_us(fn, cold=True)
+            row[f"{label}_warm_us"] = per_call_us(fn, cold=False)
+        click.echo(json.dumps(row))
+
+def _synthetic_panel(path: str, rng, days: int, n: int, block: int = 256):
+    """A PricePanel directory of `n` synthetic tickers, written `block` tickers at a time; ~1 in 4 lists late."""
+    from .panel import PricePanel
+    dates, spy, vix = _synthetic_reference(rng, days)
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "dates.npy"), dates.as_unit("ns").asi8)
+    with open(os.path.join(path, "tickers.json"), "w") as f:
+        json.dump([f"S{j:05d}" for j in range(n)], f)
+    arrays = {f: np.lib.format.open_memmap(os.path.join(path, f"{f}.npy"), mode="w+", dtype=np.float64,
+                                           shape=(days, n), fortran_order=True)
+              for f in ("Close", "High", "Low", "Volume")}
+    for lo in range(0, n, block):
+        k = min(block, n - lo)
+        close, high, low, volume = _synthetic_ohlcv(rng, days, k)
+        listed = np.where(rng.random(k) < 0.25, rng.integers(0, days, k), 0)
+        close[np.arange(days)[:, None] < listed] = np.nan
+        for f, a in zip(("Close", "High", "Low", "Volume"), (close, high, low, volume)):
+            arrays[f][:, lo:lo + k] = a
+    for a in arrays.values():
+        a.flush()
+    del arrays
+    return PricePanel(path), spy, vix
+
+@cli.command("bench-backfill", help="Peak memory and output check of the out-of-core factor backfill on synthetic universes.")
+@click.option("--sizes", default="50,200", show_default=True, help="Comma-separated universe sizes.")
+@click.option("--days", type=int, default=5040, show_default=True, help="Trading days (synthetic; 5040 = 20 years).")
+@click.option("--memory-mb", type=float, default=64, show_default=True)
+@click.option("--check", type=int, default=8, show_default=True,
+              help="Tickers compared bit for bit against the in-memory engine.")
+@click.option("--seed", type=int, default=0, show_default=True)
+def bench_backfill(sizes, days, memory_mb, check, seed):
+    import shutil, tempfile, tracemalloc
+    from .backfill import backfill_factors, read_backfill
+    from .panel_factors import _aligned, compute_alpha_factors_panel
+    ok = True
+    for n in [int(x) for x in sizes.split(",") if x.strip()]:
+        tmp = tempfile.mkdtemp(prefix="bench-backfill-")
+        try:
+            rng = np.random.default_rng(seed)
+            panel, spy, vix = _synthetic_panel(os.path.join(tmp, "panel"), rng, days, n)
+            tracemalloc.start()
+            stats = backfill_factors(panel, spy=spy, vix=vix, root=os.path.join(tmp, "store"), memory_mb=memory_mb)
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+
+            # a sample of tickers, against one in-memory pass over their whole history
+            cols = sorted(rng.choice(n, size=min(check, n), replace=False).tolist())
+            view = {f: np.asarray(panel.array(f)[:, cols]) for f in ("Close", "High", "Low", "Volume")}
+            full = compute_alpha_factors_panel(view["Close"], view["High"], view["Low"], view["Volume"],
+                                               spy=_aligned(spy, panel.dates), vix=_aligned(vix, panel.dates))
+            mismatched = []
+            for j, c in enumerate(cols):
+                df = read_backfill(panel.tickers[c], root=os.path.join(tmp, "store"))
+                bar = ~np.isnan(view["Close"][:, j])
+                same = df is not None and len(df) == int(bar.sum()) and all(
+                    np.array_equal(a[bar, j], df[k].to_numpy(dtype=float), equal_nan=True) for k, a in full.items())
+                if not same:
+                    mismatched.append(panel.tickers[c])
+            ok &= not mismatched
+            click.echo(json.dumps({"tickers": n, "days": days, "memory_mb": memory_mb,
+                                   "peak_mb": round(peak, 1), "block": stats["block"],
+                                   "partitions": stats["partitions"], "seconds": stats["seconds"],
+                                   "checked": len(cols), "identical": not mismatched, "mismatched": mismatched}))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+# ---------- bench-locks: concurrent cache refreshes and readers ----------
+def _fake_bars(ticker: str, start: str) -> pd.DataFrame:
+    """Deterministic daily OHLCV for a made-up ticker, from `start` to the last closed session."""
+    import zlib
+    from .market_calendar import last_closed_session
+    idx = pd.bdate_range(start, last_closed_session())
+    rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(idx))))
+    return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                         "Volume": rng.integers(100_000, 1_000_000, len(idx)).astype(float)}, index=idx)
+
+def _log_downloads(log: str, tickers) -> None:
+    with open(log, "a") as f:
+        f.write("".join(f"{tk}\n" for tk in tickers))  # one append per call
+
+def _slow_download(log: str, delay: float, ticker: str, start: str, auto_adjust: bool = True) -> pd.DataFrame:
+    _log_downloads(log, [ticker])
+    time.sleep(delay)
+    return _fake_bars(ticker, start)
+
+def _slow_download_many(log: str, delay: float, tickers, start: str, auto_adjust: bool = True) -> pd.DataFrame:
+    _log_downloads(log, tickers)
+    time.sleep(delay)
+    # (ticker, field) columns, as a group_by="ticker" download returns them
+    return pd.concat({tk: _fake_bars(tk, start) for tk in tickers}, axis=1)
+
+def _lock_loader(i: int, tickers, start: str, go_at: float, log: str, delay: float, out) -> None:
+    """Loads every ticker (even i: load_prices one by one, odd i: load_prices_many), starting at go_at."""
+    time.sleep(max(0.0, go_at - time.time()))
+    names = tickers[i % len(tickers):] + tickers[:i % len(tickers)]  # vary the order per process
+    errors = []
+    try:
+        if i % 2:
+            got = load_prices_many(names, start, downloader=partial(_slow_download_many, log, delay))
+        else:
+            got = {tk: load_prices(tk, start, downloader=partial(_slow_download, log, delay)) for tk in names}
+        for tk in names:
+            rows, want = len(got.get(tk, ())), len(_fake_bars(tk, start))
+            if rows != want:
+                errors.append(f"{tk}: {rows} rows, expected {want}")
+    except Exception as e:
+        errors.append(repr(e))
+    out.put(("loader", i, 0, errors))
+
+def _lock_reader(i: int, tickers, start: str, stop, out) -> None:
+    """Re-reads every stored year file and every published ticker until `stop` is set."""
+    import glob
+    from .cache import PRICE_STORE, read_meta, read_prices
+    from .store import safe_name
+    per_year = {tk: _fake_bars(tk, start).groupby(lambda d: d.year).size().to_dict() for tk in tickers}
+    reads, errors = 0, []
+    while not stop.is_set():
+        for tk in tickers:
+            files = os.path.join(PRICE_STORE, f"ticker={safe_name(tk)}", "year=*", "part*")
+            for path in glob.glob(files + ".parquet") + glob.glob(files + ".pkl"):  # not the writers' .tmp files
+                year = int(os.path.basename(os.path.dirname(path))[len("year="):])
+                try:
+                    df = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_pickle(path)
+                    if len(df) != per_year[tk].get(year):
+                        errors.append(f"{path}: {len(df)} rows")
+                except FileNotFoundError:
+                    continue  # replaced between the listing and the read
+                except Exception as e:
+                    errors.append(f"{path}: {e!r}")
+                reads += 1
+            if read_meta(tk) is not None:  # published: the whole history must be readable
+                try:
+                    df = read_prices(tk, start)
+                    if df is None or len(df) != sum(per_year[tk].values()):
+                        errors.append(f"{tk}: {0 if df is None else len(df)} rows after publish")
+                except Exception as e:
+                    errors.append(f"{tk}: {e!r}")
+                reads += 1
+        time.sleep(0.005)
+    out.put(("reader", i, reads, errors[:20]))
+
+@cli.command("bench-locks", help="Concurrent load_prices / load_prices_many processes on the same tickers, with readers: one download per ticker, no failed read.")
+@click.option("--processes", type=int, default=6, show_default=True, help="Loader processes (half use load_prices_many).")
+@click.option("--readers", type=int, default=2, show_default=True, help="Processes re-reading the Parquet files meanwhile.")
+@click.option("--tickers", type=int, default=4, show_default=True)
+@click.option("--delay", type=float, default=1.0, show_default=True, help="Seconds each fake download takes.")
+@click.option("--start", default="2010-01-01", show_default=True)
+def bench_locks(processes, readers, tickers, delay, start):
+    import multiprocessing as mp, queue, shutil, tempfile
+    from collections import Counter
+    names = [f"FAKE{i}" for i in range(tickers)]
+    cwd, tmp = os.getcwd(), tempfile.mkdtemp(prefix="bench_locks_")
+    os.chdir(tmp)  # the cache (data/cache) is relative to the working directory
+    try:
+        os.makedirs(os.path.join("data", "cache"), exist_ok=True)
+        log = os.path.join(tmp, "downloads.log")
+        out, stop = mp.Queue(), mp.Event()
+        t0 = time.perf_counter()
+        go_at = time.time() + 1.0  # every loader starts at once
+        loaders = [mp.Process(target=_lock_loader, args=(i, names, start, go_at, log, delay, out))
+                   for i in range(processes)]
+        reads = [mp.Process(target=_lock_reader, args=(i, names, start, stop, out)) for i in range(readers)]
+        for p in loaders + reads:
+            p.start()
+        timeout = 60 + delay * tickers * processes
+        results = []
+        try:
+            results += [out.get(timeout=timeout) for _ in loaders]
+            stop.set()
+            results += [out.get(timeout=60) for _ in reads]
+        except queue.Empty:
+            results.append(("bench", -1, 0, ["a process did not report back"]))
+        stop.set()
+        for p in loaders + reads:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+        with open(log) if os.path.exists(log) else open(os.devnull) as f:
+            counts = Counter(f.read().split())
+        downloads = {tk: counts.get(tk, 0) for tk in names}
+        errors = {f"{role}{i}": errs for role, i, _, errs in results if errs}
+        ok = all(n == 1 for n in downloads.values()) and not errors
+        click.echo(json.dumps({
+            "processes": processes, "readers": readers, "tickers": tickers,
+            "downloads": downloads, "reads": sum(r for role, _, r, _ in results if role == "reader"),
+            "errors": errors, "seconds": round(time.perf_counter() - t0, 2), "ok": ok,
+        }))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+# ---------- bench-rewrite: readers during re-adjusted full rewrites ----------
+def _adjusted_download(factor: float, ticker: str, start: str, auto_adjust: bool = True) -> pd.DataFrame:
+    """_fake_bars re-adjusted by `factor` over the whole history, as after a split."""
+    bars = _fake_bars(ticker, start)
+    bars[["Open", "High", "Low", "Close"]] *= factor
+    bars["Volume"] /= factor
+    return bars
+
+def _rewrite_writer(ticker: str, start: str, rounds: int, out) -> None:
+    """Re-downloads the full history `rounds` times, alternating unadjusted / split-adjusted."""
+    errors = []
+    try:
+        for r in range(rounds):
+            load_prices(ticker, start, force_refresh=True, downloader=partial(_adjusted_download, 0.5 if r % 2 else 1.0))
+    except Exception as e:
+        errors.append(repr(e))
+    out.put(("writer", 0, rounds, errors))
+
+def _rewrite_reader(i: int, ticker: str, start: str, stop, out) -> None:
+    """Reads the whole history until `stop` is set; every read must be one version, complete."""
+    from .cache import read_prices
+    base = _fake_bars(ticker, start)["Close"]
+    reads, errors = 0, []
+    while not stop.is_set():
+        try:
+            df = read_prices(ticker, start, columns=["Close"])
+        except Exception as e:
+            errors.append(repr(e))
+            continue
+        reads += 1
+        if df is None or len(df) != len(base):
+            errors.append(f"{0 if df is None else len(df)} rows, expected {len(base)}")
+            continue
+        ratio = (df["Close"] / base.reindex(df.index)).to_numpy()
+        if not (np.allclose(ratio, 1.0) or np.allclose(ratio, 0.5)):
+            years = sorted({d.year for d, q in zip(df.index, ratio) if not np.isclose(q, ratio[0])})
+            errors.append(f"mixed versions: years {years[0]}-{years[-1]} differ from {df.index[0].year}")
+    out.put(("reader", i, reads, errors[:20]))
+
+@cli.command("bench-rewrite", help="Readers during repeated re-adjusted (split) full rewrites of a long history: no read may mix versions.")
+@click.option("--rounds", type=int, default=20, show_default=True, help="Full rewrites, alternating unadjusted / split-adjusted.")
+@click.option("--readers", type=int, default=3, show_default=True)
+@click.option("--start", default="1995-01-01", show_default=True)
+def bench_rewrite(rounds, readers, start):
+    import multiprocessing as mp, queue, shutil, tempfile
+    cwd, tmp = os.getcwd(), tempfile.mkdtemp(prefix="bench_rewrite_")
+    os.chdir(tmp)  # the cache (data/cache) is relative to the working directory
+    try:
+        os.makedirs(os.path.join("data", "cache"), exist_ok=True)
+        load_prices("FAKE", start, downloader=partial(_adjusted_download, 1.0))
+        out, stop = mp.Queue(), mp.Event()
+        t0 = time.perf_counter()
+        reads = [mp.Process(target=_rewrite_reader, args=(i, "FAKE", start, stop, out)) for i in range(readers)]
+        writer = mp.Process(target=_rewrite_writer, args=("FAKE", start, rounds, out))
+        for p in reads + [writer]:
+            p.start()
+        results = []
+        try:
+            results.append(out.get(timeout=60 + 5 * rounds))
+            stop.set()
+            results += [out.get(timeout=60) for _ in reads]
+        except queue.Empty:
+            results.append(("bench", -1, 0, ["a process did not report back"]))
+        stop.set()
+        for p in reads + [writer]:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+        errors = {f"{role}{i}": errs for role, i, _, errs in results if errs}
+        ok = not errors and len(results) == readers + 1
+        click.echo(json.dumps({
+            "rounds": rounds, "readers": readers, "reads": sum(r for role, _, r, _ in results if role == "reader"),
+            "errors": errors, "seconds": round(time.perf_counter() - t0, 2), "ok": ok,
+        }))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
+# ---------- check-history: period lookups against a local provider ----------
+@cli.command("check-history", help="get_history periods ('max', '2y', 'ytd', '5d') on a fixture ticker whose history starts before 2015.")
+@click.option("--first", default="2005-01-03", show_default=True, help="First bar of the fixture history.")
+def check_history(first):
+    import shutil, tempfile
+    from . import marketdata
+    from .market_calendar import last_closed_session
+    cwd, tmp = os.getcwd(), tempfile.mkdtemp(prefix="check_history_")
+    os.chdir(tmp)  # the cache (data/cache) is relative to the working directory
+    prev = marketdata.get_provider()
+    try:
+        os.makedirs(os.path.join("data", "cache"), exist_ok=True)
+        os.makedirs("fixtures")
+        bars = _fake_bars("FAKE", first)
+        bars.to_parquet(os.path.join("fixtures", "FAKE.parquet"))
+        marketdata.set_provider(marketdata.LocalFileProvider("fixtures"))
+        marketdata.clear_memo()
+        last = last_closed_session()
+        today = pd.Timestamp.today().normalize()
+        checks = {}
+        for period, want_first, want_rows in (
+            ("2y", bars.index[bars.index >= today - pd.DateOffset(years=2)][0], None),
+            ("max", bars.index[0], len(bars)),
+            ("ytd", bars.index[bars.index >= pd.Timestamp(year=today.year, month=1, day=1)][0], None),
+            ("5d", bars.index[-5], 5),
+        ):
+            h = marketdata.get_history("FAKE", period)
+            got_first = h.index[0] if len(h) else None
+            checks[period] = {
+                "first": None if got_first is None else got_first.strftime("%Y-%m-%d"), "rows": len(h),
+                "ok": got_first == want_first and h.index[-1] == bars.index[-1] <= last
+                      and (want_rows is None or len(h) == want_rows),
+            }
+        ok = all(c["ok"] for c in checks.values())
+        click.echo(json.dumps({"fixture_first": bars.index[0].strftime("%Y-%m-%d"), "periods": checks, "ok": ok}))
+    finally:
+        marketdata.set_provider(prev)
+        marketdata.clear_memo()
+        os.chdir(cwd)
+        shutil.rmtree(tmp, ignore_errors=True)
+    if not ok:
+        sys.exit(1)
+
 if __name__ == "__main__":
     cli()
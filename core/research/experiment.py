@@ -1,8 +1,13 @@
 # core/research/experiment.py
 import numpy as np
 import pandas as pd
+from dataclasses import dataclass
 from itertools import product
-import os, json
+import os, json, math, time, uuid
+import multiprocessing as mp
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable
 from xgboost import XGBClassifier
 
 from .factors import compute_alpha_factors
@@ -10,6 +15,98 @@ from .models import feature_columns, train_xgb_prob
 from .walkforward import walk_forward_splits
 from .backtest import backtest_prob_strategy
 from .stats import _to_series, information_ratio, sharpe_ratio
+from .tpe import TPESampler
+
+# Fold-parallel walk-forward: folds trained at once, on threads (XGBoost releases the
+# GIL while it trains) or processes, and XGBoost threads per fold (0 = CPUs / workers).
+WF_FOLD_WORKERS = int(os.getenv("WF_FOLD_WORKERS", 1))
+WF_FOLD_POOL = os.getenv("WF_FOLD_POOL", "thread")  # thread | process
+WF_FOLD_THREADS = int(os.getenv("WF_FOLD_THREADS", 0))
+
+
+@dataclass(frozen=True)
+class WalkForwardData:
+    """
+    The rows a walk-forward trains on, prepared once: features as one C-contiguous
+    float32 matrix (XGBoost's own dtype, so fits read it without converting), labels,
+    and every (train, test) split as row slices. Folds train on views of X, so
+    neither the setup cost nor the memory grows with the number of folds.
+    """
+    feats: list
+    y_col: str
+    index: pd.Index
+    X: np.ndarray
+    y: np.ndarray
+    splits: list  # [(train slice, test slice), ...]
+
+
+def _prepare_walkforward(df_all: pd.DataFrame, horizon: str, train_window: int, test_window: int) -> WalkForwardData:
+    # pick label column
+    y_col_map = {"1d": "y_up_1d", "5d": "y_up_5d", "20d": "y_up_20d"}
+    if horizon not in y_col_map:
+        raise ValueError(f"Unsupported horizon '{horizon}' (use '1d','5d','20d').")
+    y_col = y_col_map[horizon]
+
+    # features
+    feats = [c for c in feature_columns(df_all) if c in df_all.columns]
+    if not feats:
+        return WalkForwardData(feats, y_col, pd.Index([]), np.empty((0, 0), np.float32), np.empty(0), [])
+
+    # restrict to rows with features + label
+    df = df_all[feats + [y_col]].dropna()
+
+    if df.empty or len(df) < (train_window + test_window):
+        # shrink windows if data is short
+        train_window = max(250, int(len(df) * 0.6)) if len(df) else 250
+        test_window = max(21, int(len(df) * 0.1)) if len(df) else 21
+
+    splits = [(slice(int(tr[0]), int(tr[-1]) + 1), slice(int(te[0]), int(te[-1]) + 1))
+              for tr, te in walk_forward_splits(df, train_window, test_window, min_train=250)]
+    X = np.ascontiguousarray(df[feats].to_numpy(), dtype=np.float32)
+    return WalkForwardData(feats, y_col, df.index, X, df[y_col].to_numpy(), splits)
+
+
+def _fit_fold(X_tr: np.ndarray, y_tr: np.ndarray, X_te: np.ndarray,
+              params: dict | None, n_jobs: int | None):
+    """Train one walk-forward fold; returns (test-block probabilities, feature importances or None)."""
+    # 80/20 internal split for early stopping
+    split = max(1, int(len(X_tr) * 0.8))
+    X_tr_, y_tr_ = X_tr[:split], y_tr[:split]
+    X_val_, y_val_ = X_tr[split:], y_tr[split:]
+    if not len(X_val_):
+        X_val_, y_val_ = X_tr_, y_tr_
+
+    # Train (fast hist tree + early stopping handled inside train_xgb_prob)
+    model, _ = train_xgb_prob(X_tr_, y_tr_, X_val_, y_val_, params=params, n_jobs=n_jobs)
+    fi = getattr(model, "feature_importances_", None)
+    return model.predict_proba(X_te)[:, 1], fi
+
+
+def _fold_budget(n_folds: int, workers: int | None, threads: int | None) -> tuple[int, int | None]:
+    """(concurrent folds, XGBoost threads per fold; None = the params' own n_jobs)."""
+    workers = max(1, min(int(workers or WF_FOLD_WORKERS), n_folds))
+    threads = threads or WF_FOLD_THREADS or None
+    if workers > 1 and threads is None:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+    return workers, threads
+
+
+def _run_folds(data: WalkForwardData, splits: list, params: dict | None, workers: int,
+               threads: int | None, pool: str | None) -> list:
+    """_fit_fold over every (train, test) split of `data`; results in split order."""
+    def args(tr, te):
+        # views of the prepared matrix (a process pool pickles just these rows)
+        return data.X[tr], data.y[tr], data.X[te], params, threads
+
+    if workers <= 1:
+        return [_fit_fold(*args(tr, te)) for tr, te in splits]
+    pool = pool or WF_FOLD_POOL
+    if pool not in ("thread", "process"):
+        raise ValueError(f"Unknown fold pool '{pool}' (use 'thread' or 'process').")
+    Executor = ThreadPoolExecutor if pool == "thread" else ProcessPoolExecutor
+    with Executor(max_workers=workers) as ex:
+        futs = [ex.submit(_fit_fold, *args(tr, te)) for tr, te in splits]
+        return [f.result() for f in futs]
 
 
 def run_walkforward_xgb(
@@ -27,6 +124,12 @@ def run_walkforward_xgb(
     df_all: pd.DataFrame | None = None,
     # NEW: optionally cap number of walk-forward folds (use most recent folds first)
     max_folds: int | None = None,
+    # folds trained concurrently (default WF_FOLD_WORKERS) and XGBoost threads per fold
+    fold_workers: int | None = None,
+    threads_per_fold: int | None = None,
+    fold_pool: str | None = None,
+    # the rows, feature matrix and splits of df_all, when a caller prepared them already
+    prepared: WalkForwardData | None = None,
 ) -> dict:
     """
     Walk-forward XGB on tabular factors. Returns metrics, equity_curve, daily_returns, predictions, feature_importance.
@@ -34,21 +137,20 @@ def run_walkforward_xgb(
       - supports passing `df_all` (precomputed factors) to avoid recomputation
       - passes `params` through to XGB (models.train_xgb_prob uses tree_method='hist' + early stopping)
       - can cap number of folds with `max_folds`
+      - `fold_workers` > 1 trains folds concurrently on a thread (or `fold_pool="process"`)
+        pool, each fold with `threads_per_fold` XGBoost threads; results are merged in
+        fold order and are identical to a serial run
+      - the features go to XGBoost as one float32 matrix, built once (or passed as
+        `prepared`), and every fold trains on row slices of it
     """
     # 1) Factors/targets
     if df_all is None:
         df_all = compute_alpha_factors(px, spy=spy, vix=vix, sector=sector)
-
-    # pick label/return columns
-    y_col_map = {"1d": "y_up_1d", "5d": "y_up_5d", "20d": "y_up_20d"}
-    if horizon not in y_col_map:
-        raise ValueError(f"Unsupported horizon '{horizon}' (use '1d','5d','20d').")
-    y_col = y_col_map[horizon]
     ret_col = f"target_ret_{horizon}"
 
-    # features
-    feats_all = feature_columns(df_all)
-    feats = [c for c in feats_all if c in df_all.columns]
+    # 2) features, label rows and walk-forward splits (prepared once per sweep when given)
+    data = prepared if prepared is not None else _prepare_walkforward(df_all, horizon, train_window, test_window)
+    feats = data.feats
 
     if not feats:
         return {
@@ -59,17 +161,7 @@ def run_walkforward_xgb(
             "feature_importance": [],
         }
 
-    # 2) restrict to rows with features + label
-    needed_cols = feats + [y_col]
-    df = df_all[needed_cols].dropna().copy()
-
-    if df.empty or len(df) < (train_window + test_window):
-        # shrink windows if data is short
-        train_window = max(250, int(len(df) * 0.6)) if len(df) else 250
-        test_window = max(21, int(len(df) * 0.1)) if len(df) else 21
-
-    # Prepare splits; optionally cap to most recent folds
-    splits = list(walk_forward_splits(df, train_window, test_window, min_train=250))
+    splits = data.splits
     if not splits:
         return {
             "metrics": {"error": "Not enough data to run walk-forward split with current windows."},
@@ -81,28 +173,17 @@ def run_walkforward_xgb(
     if isinstance(max_folds, int) and max_folds > 0 and len(splits) > max_folds:
         splits = splits[-max_folds:]  # keep the most recent folds
 
-    prob_all = pd.Series(index=df.index, dtype="float")
+    prob_all = np.full(len(data.index), np.nan)
 
     # collect importances across folds
     imp_accum = pd.Series(0.0, index=pd.Index(feats, dtype="object"))
     imp_folds = 0
 
-    for tr_idx, te_idx in splits:
-        X_tr, y_tr = df.iloc[tr_idx][feats], df.iloc[tr_idx][y_col]
-
-        # 80/20 internal split for early stopping
-        split = max(1, int(len(X_tr) * 0.8))
-        X_tr_, y_tr_ = X_tr.iloc[:split], y_tr.iloc[:split]
-        X_val_, y_val_ = X_tr.iloc[split:], y_tr.iloc[split:]
-        if X_val_.empty:
-            X_val_, y_val_ = X_tr_, y_tr_
-
-        # Train (fast hist tree + early stopping handled inside train_xgb_prob)
-        model, _ = train_xgb_prob(X_tr_, y_tr_, X_val_, y_val_, params=params)
-
+    # folds are independent: train them (possibly concurrently), then merge in fold order
+    workers, threads = _fold_budget(len(splits), fold_workers, threads_per_fold)
+    for (_, te), (prob, fi) in zip(splits, _run_folds(data, splits, params, workers, threads, fold_pool)):
         # importances
         try:
-            fi = getattr(model, "feature_importances_", None)
             if fi is not None and len(fi) == len(feats):
                 imp_accum = imp_accum.add(pd.Series(fi, index=feats), fill_value=0.0)
                 imp_folds += 1
@@ -110,8 +191,8 @@ def run_walkforward_xgb(
             pass
 
         # OOS pred on test block
-        X_te = df.iloc[te_idx][feats]
-        prob_all.loc[X_te.index] = model.predict_proba(X_te)[:, 1]
+        prob_all[te] = prob
+    prob_all = pd.Series(prob_all, index=data.index)
 
     # average importances
     feat_imp_out = []
@@ -174,6 +255,155 @@ def _param_grid_iter(grid: dict[str, list]) -> list[dict]:
     return combos
 
 
+# Parallel sweep: candidates scored at once on a process pool that shares the inputs.
+SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", 1))
+
+# search="tpe" space when none is given: the default grid's parameters as ranges around it
+DEFAULT_PARAM_SPACE = {
+    "n_estimators": [200, 800],
+    "max_depth": [2, 7],
+    "learning_rate": {"low": 0.01, "high": 0.2, "log": True},
+    "subsample": [0.6, 1.0],
+    "colsample_bytree": [0.6, 1.0],
+    "reg_lambda": {"low": 0.1, "high": 10.0, "log": True},
+}
+
+# Sweep inputs by sweep token, in worker processes only (installed by the pool
+# initializer). Sweeps in the calling process pass their inputs as arguments, so
+# concurrent sweeps (e.g. two threaded requests) never see each other's data.
+_SWEEPS: dict = {}
+
+
+def _set_sweep(token: str, shared: dict):
+    _SWEEPS[token] = shared
+
+
+def _score_in_worker(token: str, index: int, params: dict, threads: int | None, overrides: dict) -> tuple:
+    return _score_candidate(index, params, threads, {**_SWEEPS[token], **overrides})
+
+
+def _score_candidate(index: int, params: dict, threads: int | None, shared: dict) -> tuple:
+    """(index, sharpe, ir, best-candidate outputs) of one candidate, from the sweep inputs `shared`."""
+    sh = shared
+    out = run_walkforward_xgb(
+        px=sh["px"], spy=sh["spy"], vix=sh["vix"], sector=sh["sector"],
+        horizon=sh["horizon"], train_window=sh["train_window"], test_window=sh["test_window"],
+        # a shallow copy: the prediction column this run adds must not become a feature of the next
+        params=params, df_all=sh["df_all"].copy(deep=False), max_folds=sh["max_folds"],
+        threads_per_fold=threads, prepared=sh["prepared"],
+    )
+    daily = out.get("daily_returns", pd.Series(dtype="float"))
+    if not isinstance(daily, pd.Series) or daily.empty:
+        return index, float("nan"), float("nan"), None
+
+    spy = sh["spy"]
+    # Align with SPY for IR
+    spy_lr = None
+    if spy is not None:
+        # Make sure spy is a 1D Series and aligned to our dates
+        spy_s = _to_series(spy)         # squeezes single-col DataFrames -> Series
+        spy_s = spy_s.reindex(daily.index).ffill()
+        spy_lr = np.log(spy_s).diff().dropna()
+
+    # Match indices before stats
+    strat = daily.reindex(spy_lr.index) if spy_lr is not None else daily
+
+    sh_ = sharpe_ratio(strat.dropna())
+    ir = information_ratio(strat.dropna(), spy_lr) if spy_lr is not None else float("nan")
+    keep = {k: out.get(k, d) for k, d in (("equity_curve", pd.Series(dtype="float")),
+                                          ("daily_returns", pd.Series(dtype="float")),
+                                          ("predictions", pd.DataFrame()))}
+    return index, float(sh_), float(ir), keep
+
+
+def _sweep_budget(n_candidates: int, workers: int | None, threads: int | None) -> tuple[int, int | None]:
+    """(concurrent candidates, XGBoost threads per candidate): the cores are split between the two."""
+    workers = max(1, min(int(workers or SWEEP_WORKERS), n_candidates))
+    if workers > 1 and threads is None:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+    return workers, threads
+
+
+@contextmanager
+def _sweep_pool(workers: int, shared: dict):
+    """
+    (pool, token) of `workers` processes holding the sweep inputs, created once for a
+    whole search and reused by every round; None when candidates are scored serially.
+    """
+    if workers <= 1:
+        yield None
+        return
+    token = uuid.uuid4().hex
+    # never fork: sweeps run inside threaded request handlers, and a forked child can
+    # inherit locks held by other threads (logging, single-flight, warm-up). The inputs
+    # are pickled once per worker by the initializer, none per task.
+    ctx = mp.get_context("forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_set_sweep, initargs=(token, shared)) as pool:
+        yield pool, token
+
+
+def _sweep_results(tasks: list[tuple[int, dict]], threads: int | None, shared: dict,
+                   pool: tuple | None, overrides: dict):
+    """Yields _score_candidate results for (index, params) tasks as candidates finish."""
+    if pool is None:
+        for i, params in tasks:
+            yield _score_candidate(i, params, threads, {**shared, **overrides})
+        return
+    executor, token = pool
+    futs = [executor.submit(_score_in_worker, token, i, params, threads, overrides) for i, params in tasks]
+    for fut in as_completed(futs):
+        yield fut.result()
+
+
+def _score_round(cand_params: list[dict], indices: list[int], shared: dict, pool: tuple | None,
+                 workers: int, threads: int | None, on_result: Callable[[dict], None] | None,
+                 extra: dict | None = None, overrides: dict | None = None) -> tuple[dict, dict | None]:
+    """
+    Scores the candidates `indices` with the walk-forward in `shared` (with `overrides`,
+    e.g. a rung's max_folds) on `pool` (see _sweep_pool; `workers` processes). Returns
+    ({index: {'params', 'sharpe', 'ir'}}, outputs of the best candidate or None).
+    """
+    scores: dict[int, dict] = {}
+    best = None
+    best_key = (-np.inf, 0)  # (sharpe, -grid index): the first of equal Sharpes wins
+    # a round smaller than the pool gives each candidate more XGBoost threads
+    _, threads = _sweep_budget(len(indices), workers, threads)
+    tasks = [(i, cand_params[i]) for i in indices]
+    for done, (i, sh, ir, out) in enumerate(_sweep_results(tasks, threads, shared, pool, overrides or {}), 1):
+        scores[i] = {"params": cand_params[i], "sharpe": sh, "ir": ir}
+        if on_result is not None:
+            on_result({"index": i, **scores[i], **(extra or {}), "done": done, "total": len(indices)})
+
+        # Track best by Sharpe
+        if out is not None and np.isfinite(sh) and (sh, -i) > best_key:
+            best_key = (sh, -i)
+            best = {"index": i, "params": cand_params[i], **out}
+    return scores, best
+
+
+def _ranked(scores: dict[int, dict]) -> list[int]:
+    """Candidate indices by Sharpe, best first (NaN last, ties in grid order)."""
+    return sorted(scores, key=lambda i: (-(scores[i]["sharpe"] if np.isfinite(scores[i]["sharpe"]) else -1e9), i))
+
+
+def _halving_rungs(n_candidates: int, full_folds: int, min_folds: int, eta: int) -> list[tuple[int, int]]:
+    """
+    (candidates, folds) per rung. Candidates shrink by eta down to min(eta, n_candidates),
+    which the full run keeps to choose from; folds are eta-spaced back from the full run
+    (full / eta^k, at least min_folds), with as many rungs as both allow.
+    """
+    floor = min(eta, n_candidates)
+    if full_folds <= 0 or n_candidates <= floor:
+        return [(n_candidates, full_folds)]
+    halvings = min(math.ceil(math.log(n_candidates / floor, eta) - 1e-9),
+                   math.floor(math.log(full_folds / max(1, min_folds), eta) + 1e-9))
+    halvings = max(halvings, 0)
+    return [(max(floor, math.ceil(n_candidates / eta ** k)),
+             max(min_folds, int(full_folds / eta ** (halvings - k) + 0.5)))
+            for k in range(halvings + 1)]
+
+
 def run_walkforward_xgb_sweep(
     px: pd.DataFrame,
     spy: pd.Series | None,
@@ -186,6 +416,22 @@ def run_walkforward_xgb_sweep(
     *,
     # limit number of folds per candidate to speed up iteration (e.g., 4 most recent)
     max_folds: int | None = None,
+    # reuse a precomputed factor table (e.g. precompute.factor_table) if provided
+    df_all: pd.DataFrame | None = None,
+    # candidates scored concurrently (default SWEEP_WORKERS) and XGBoost threads per candidate
+    workers: int | None = None,
+    threads_per_candidate: int | None = None,
+    # called with {'index', 'params', 'sharpe', 'ir', 'done', 'total'} as each candidate finishes
+    on_result: Callable[[dict], None] | None = None,
+    # "grid" scores every candidate on the full walk-forward; "halving" is successive halving
+    search: str = "grid",
+    halving_factor: int = 3,
+    min_folds: int = 2,
+    # search="tpe": parameter ranges (see tpe.py), and a trial and/or wall-clock budget
+    param_space: dict | None = None,
+    n_trials: int = 30,
+    time_budget: float | None = None,
+    seed: int = 0,
 ) -> dict:
     """
     Returns:
@@ -196,7 +442,31 @@ def run_walkforward_xgb_sweep(
         'daily_returns': pd.Series (best),
         'predictions': pd.DataFrame (best)
       }
+    With workers > 1 the candidates run on one process pool per search (forkserver or
+    spawn workers, safe to start from a threaded server, that receive the inputs once;
+    halving rungs and tpe batches reuse them) and the cores are split between
+    concurrent candidates and XGBoost threads. Candidates finish in any order; the
+    summary (ties in grid order) and the best candidate are the same as a serial run.
+
+    search="halving" is successive halving over the grid: every candidate is scored on
+    the most recent folds, the best 1/`halving_factor` go on with `halving_factor` times
+    the folds, and so on, until the last survivors (at least `halving_factor` of them)
+    are ranked on the full walk-forward. The fold counts are eta-spaced back from the
+    full run (never fewer than `min_folds`). With the default 64-candidate grid over 30
+    folds that is 64 x 1, 22 x 3, 8 x 10 and 3 x 30 folds: 300 fits against 1920. When
+    halving would not train fewer folds than the grid (small grids), the grid runs
+    instead. Summary rows carry the 'rung' and 'folds' they were scored on: the full-run
+    rows first, by Sharpe, then the eliminated ones, later rungs first and by Sharpe
+    within a rung. The result has a 'search' entry with the rungs and the folds trained
+    ('fits') against a full grid ('grid_fits').
+
+    search="tpe" ignores param_grid and draws candidates from `param_space` ranges
+    (default DEFAULT_PARAM_SPACE) with a seeded TPE sampler, `workers` at a time, until
+    `n_trials` have run or `time_budget` seconds have passed. Every candidate runs the
+    full walk-forward; 'search' holds the best-so-far Sharpe after each trial.
     """
+    if search not in ("grid", "halving", "tpe"):
+        raise ValueError(f"Unknown search '{search}' (use 'grid', 'halving' or 'tpe').")
     if param_grid is None:
         param_grid = {
             "n_estimators": [300, 500],
@@ -208,72 +478,96 @@ def run_walkforward_xgb_sweep(
         }
 
     # compute factors ONCE and reuse for all candidates
-    df_all = compute_alpha_factors(px, spy=spy, vix=vix, sector=sector)
+    if df_all is None:
+        df_all = compute_alpha_factors(px, spy=spy, vix=vix, sector=sector)
 
     cand_params = _param_grid_iter(param_grid)
-    results: list[dict] = []
-
-    best = None
-    best_metrics = {"sharpe": -np.inf, "ir": -np.inf}
-
-    for params in cand_params:
-        out = run_walkforward_xgb(
-            px=px, spy=spy, vix=vix, sector=sector,
-            horizon=horizon, train_window=train_window, test_window=test_window,
-            params=params, df_all=df_all, max_folds=max_folds
-        )
-        daily = out.get("daily_returns", pd.Series(dtype="float"))
-        if not isinstance(daily, pd.Series) or daily.empty:
-            results.append({"params": params, "sharpe": float("nan"), "ir": float("nan")})
-            continue
-
-        # Align with SPY for IR
-        spy_lr = None
-        if spy is not None:
-            # Make sure spy is a 1D Series and aligned to our dates
-            spy_s = _to_series(spy)         # squeezes single-col DataFrames -> Series
-            spy_s = spy_s.reindex(daily.index).ffill()
-            spy_lr = np.log(spy_s).diff().dropna()
-
-        # Match indices before stats
-        strat = daily.reindex(spy_lr.index) if spy_lr is not None else daily
-
-        sh = sharpe_ratio(strat.dropna())
-        ir = information_ratio(strat.dropna(), spy_lr) if spy_lr is not None else float("nan")
-
-        results.append({"params": params, "sharpe": float(sh), "ir": float(ir)})
-
-        # Track best by Sharpe
-        if np.isfinite(sh) and sh > best_metrics["sharpe"]:
-            best_metrics = {"sharpe": float(sh), "ir": float(ir)}
-            best = {
-                "params": params,
-                "equity_curve": out.get("equity_curve", pd.Series(dtype="float")),
-                "daily_returns": out.get("daily_returns", pd.Series(dtype="float")),
-                "predictions": out.get("predictions", pd.DataFrame()),
-            }
-            
-    results_sorted = sorted(
-        results,
-        key=lambda r: (-(r["sharpe"] if np.isfinite(r["sharpe"]) else -1e9))
-    )
+    # the feature matrix and splits are prepared once for every fold of every candidate
+    prepared = _prepare_walkforward(df_all, horizon, train_window, test_window)
+    shared = dict(px=px, spy=spy, vix=vix, sector=sector, horizon=horizon, train_window=train_window,
+                  test_window=test_window, df_all=df_all, max_folds=max_folds, prepared=prepared)
+
+    search_info = None
+    if search == "halving":
+        full = len(prepared.splits)
+        if isinstance(max_folds, int) and max_folds > 0:
+            full = min(full, max_folds)
+        rungs = _halving_rungs(len(cand_params), full, min_folds, max(2, int(halving_factor)))
+        grid_fits = full * len(cand_params)
+        if sum(n * f for n, f in rungs) >= grid_fits:
+            # nothing to save (e.g. a handful of candidates): a plain grid
+            search = "grid"
+            search_info = {"mode": "grid", "requested": "halving", "fits": grid_fits, "grid_fits": grid_fits}
+    # one pool for the whole search: tpe batches and halving rungs reuse its workers
+    n_workers, _ = _sweep_budget(max(1, n_trials if search == "tpe" else len(cand_params)), workers, None)
+    with _sweep_pool(n_workers, shared) as pool:
+        if search == "tpe":
+            sampler = TPESampler(param_space or DEFAULT_PARAM_SPACE, seed=seed)
+            cand_params, scores, best, trajectory, top = [], {}, None, [], float("nan")
+            t0 = time.perf_counter()
+            while len(cand_params) < n_trials and (time_budget is None or time.perf_counter() - t0 < time_budget):
+                base = len(cand_params)
+                cand_params.extend(sampler.ask(min(n_workers, n_trials - base)))
+                batch, b = _score_round(cand_params, list(range(base, len(cand_params))), shared, pool,
+                                        n_workers, threads_per_candidate, on_result)
+                if b is not None and (best is None or (batch[b["index"]]["sharpe"], -b["index"])
+                                      > (scores[best["index"]]["sharpe"], -best["index"])):
+                    best = b
+                scores.update(batch)
+                # told in trial order, whatever order the batch finished in
+                for i in range(base, len(cand_params)):
+                    sh = scores[i]["sharpe"]
+                    sampler.tell(cand_params[i], sh)
+                    if np.isfinite(sh) and not sh <= top:
+                        top = sh
+                    trajectory.append({"trial": i + 1, "best_sharpe": top, "seconds": round(time.perf_counter() - t0, 2)})
+            results_sorted = [scores[i] for i in _ranked(scores)]
+            search_info = {"mode": "tpe", "trials": len(cand_params), "seconds": round(time.perf_counter() - t0, 2),
+                           "trajectory": trajectory}
+        elif search == "grid":
+            scores, best = _score_round(cand_params, list(range(len(cand_params))), shared, pool,
+                                        n_workers, threads_per_candidate, on_result)
+            results_sorted = [scores[i] for i in _ranked(scores)]
+        else:
+            alive, eliminated, fits = list(range(len(cand_params))), [], 0
+            for k, (_, folds) in enumerate(rungs):
+                last = k == len(rungs) - 1
+                # the last rung is the full walk-forward (max_folds as given)
+                scores, best = _score_round(cand_params, alive, shared, pool, n_workers, threads_per_candidate,
+                                            on_result, {"rung": k, "folds": folds},
+                                            None if last else {"max_folds": folds})
+                fits += folds * len(alive)
+                ranked = _ranked(scores)
+                if last:
+                    final = [{**scores[i], "rung": k, "folds": folds} for i in ranked]
+                    break
+                keep = rungs[k + 1][0]
+                alive = sorted(ranked[:keep])
+                eliminated.append([{**scores[i], "rung": k, "folds": folds} for i in ranked[keep:]])
+            # full-fold results by Sharpe, then the eliminated ones: later rungs first, by Sharpe
+            results_sorted = final + [r for rung in reversed(eliminated) for r in rung]
+            search_info = {"mode": "halving", "rungs": [{"candidates": n, "folds": f} for n, f in rungs],
+                           "fits": fits, "grid_fits": grid_fits}
 
     if best is None:
-        return {
+        out = {
             "best_params": {},
             "summary": results_sorted,
             "equity_curve": pd.Series(dtype="float"),
             "daily_returns": pd.Series(dtype="float"),
             "predictions": pd.DataFrame(),
         }
-
-    return {
-        "best_params": best["params"],
-        "summary": results_sorted,
-        "equity_curve": best["equity_curve"],
-        "daily_returns": best["daily_returns"],
-        "predictions": best["predictions"],
-    }
+    else:
+        out = {
+            "best_params": best["params"],
+            "summary": results_sorted,
+            "equity_curve": best["equity_curve"],
+            "daily_returns": best["daily_returns"],
+            "predictions": best["predictions"],
+        }
+    if search_info is not None:
+        out["search"] = search_info
+    return out
 
 def persist_final_xgb_model(
     df_all: pd.DataFrame,
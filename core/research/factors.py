@@ -1,7 +1,13 @@
 # core/research/factors.py
+import os
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Any
+from typing import Any, Callable, Dict, List
+
+from .ohlcv import price_roles
+from .pca import PCAStats, choose_solver, fit_covariance, rolling_explained_variance
+from .registry import FactorRegistry
+from .rolling import RollingMoments, RollingPair
 
 # ---------------------------
 # Small utilities
@@ -9,66 +15,181 @@ from typing import Dict, List, Any
 def _pct_change(s, n=1):
     return s.pct_change(n)
 
-def _zscore(s, win: int):
-    return (s - s.rolling(win).mean()) / (s.rolling(win).std(ddof=0) + 1e-12)
-
-def _rolling_corr(a: pd.Series, b: pd.Series, win: int):
-    return a.rolling(win).corr(b)
-
-# --- replace helpers at the top ---
-def _norm(s: str) -> str:
-    # normalize for matching: lowercase, underscores for spaces
-    return s.lower().replace(" ", "_")
+def _zscore(s, win: int, moments: RollingMoments | None = None):
+    # pass `moments` to reuse one set of prefix sums across windows of the same series
+    m = moments if moments is not None else RollingMoments(s)
+    return pd.Series(m.zscore(win), index=s.index)
 
-def _find_like(df: pd.DataFrame, must_have: list[str], nice_to_have: list[str] = None) -> str | None:
-    """
-    Fuzzy column finder:
-      - must_have: substrings that MUST appear in normalized column name
-      - nice_to_have: optional substrings to prefer if multiple matches
-    """
-    if df is None or df.empty:
-        return None
+def _rolling_corr(a: pd.Series, b: pd.Series, win: int, pair: RollingPair | None = None):
+    p = pair if pair is not None else RollingPair(a, b)
+    return pd.Series(p.corr(win), index=a.index)
 
-    cols = list(df.columns)
-    norms = {_norm(c): c for c in cols}
+def _canonical(df: pd.DataFrame) -> pd.DataFrame:
+    """Sorted price frame with canonical lowercase close/high/low/volume columns."""
+    # column roles are resolved once per column layout (see ohlcv.price_roles)
+    df = df.rename(columns=price_roles(df.columns))
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
 
-    # First pass: all must-have present
-    matches = []
-    for n, orig in norms.items():
-        if all(k in n for k in must_have):
-            matches.append((n, orig))
+    # Ensure numeric types
+    for c in ["close", "high", "low", "volume"]:
+        if c in df.columns and not pd.api.types.is_numeric_dtype(df[c]):
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    return df
 
-    if not matches:
+# ---------------------------
+# Factor registry
+# ---------------------------
+# Every derived column is a node with its inputs, look-back/lead and dependencies
+# (see registry.py); intermediate nodes (rolling prefixes, cross-asset returns) are
+# shared by the columns that read them, so a subset only pays for its own closure.
+FACTORS = FactorRegistry(inputs=("close", "high", "low", "volume", "spy", "vix", "sector"))
+BASE_COLUMNS = ["ret_1d", "ret_5d", "ret_20d", "log_ret_1d", "rng", "vwap_proxy"]
+
+def _like(close: pd.Series, values) -> pd.Series:
+    return pd.Series(values, index=close.index)
+
+# ---------------- Base columns ----------------
+for _n in (1, 5, 20):
+    FACTORS.add(f"ret_{_n}d", lambda c, n=_n: c.pct_change(n), deps=["close"], lookback=_n)
+FACTORS.add("log_ret_1d", lambda c: np.log(c).diff(1), deps=["close"], lookback=1)
+
+@FACTORS.node("rng", deps=["close", "high", "low"], lookback=1)
+def _rng(close, high, low):
+    if high is None or low is None:
+        return _like(close, np.nan)
+    return (high - low) / (close.shift(1) + 1e-12)
+
+@FACTORS.node("vwap_proxy", deps=["close", "high", "low"])
+def _vwap_proxy(close, high, low):
+    if high is None or low is None:
+        return close
+    return (high + low + close) / 3.0
+
+# ---------------- Momentum ----------------
+for _k in (3, 5, 10, 20, 60, 63):
+    FACTORS.add(f"mom_{_k}", lambda c, k=_k: (c / c.shift(k)) - 1, deps=["close"], lookback=_k)
+
+# ------------- Mean reversion -------------
+# Rolling statistics come from one set of prefix sums per series (see rolling.py)
+FACTORS.add("close_moments", RollingMoments, deps=["close"], output=False)
+for _w in (5, 10, 20, 50, 60):
+    FACTORS.add(f"mr_z_{_w}", lambda c, m, w=_w: _zscore(c, w, m),
+                deps=["close", "close_moments"], lookback=_w - 1)
+    FACTORS.add(f"px_ma_{_w}_dev", lambda c, m, w=_w: (c - m.mean(w)) / (m.mean(w) + 1e-12),
+                deps=["close", "close_moments"], lookback=_w - 1)
+
+# -------- Bollinger bandwidth (20) --------
+@FACTORS.node("boll_bw_20", deps=["close", "close_moments"], lookback=19)
+def _boll_bw_20(close, px_m):
+    m = px_m.mean(20)
+    s = px_m.std(20)
+    return _like(close, ((m + 2*s) - (m - 2*s)) / (m + 1e-12))
+
+# --------------- Volatility ----------------
+FACTORS.add("log_ret_moments", RollingMoments, deps=["log_ret_1d"], output=False)
+for _w in (5, 10, 20, 60):
+    FACTORS.add(f"vol_{_w}", lambda lr, m, w=_w: _like(lr, m.std(w)),
+                deps=["log_ret_1d", "log_ret_moments"], lookback=_w - 1)
+FACTORS.add("rng_5", lambda r: _like(r, RollingMoments(r).mean(5)), deps=["rng"], lookback=4)
+
+# Parkinson volatility (if high/low present)
+@FACTORS.node("parkinson_20", deps=["close", "high", "low"], lookback=19)
+def _parkinson_20(close, high, low):
+    if high is None or low is None:
+        return _like(close, np.nan)
+    hl = (np.log(high) - np.log(low)) ** 2
+    return np.sqrt((1.0 / (4 * np.log(2))) * _like(close, RollingMoments(hl).mean(20)))
+
+# ----------------- Volume ------------------
+@FACTORS.node("volume_f", deps=["close", "volume"], output=False)
+def _volume_f(close, volume):
+    if volume is None:
+        return pd.Series(index=close.index, dtype="float")
+    return volume.reindex(close.index).astype("float")
+
+FACTORS.add("volume_moments", RollingMoments, deps=["volume_f"], output=False)
+FACTORS.add("vol_chg_1d", lambda v: _pct_change(v, 1), deps=["volume_f"], lookback=1)
+FACTORS.add("vol_z_20", lambda v, m: _zscore(v, 20, m), deps=["volume_f", "volume_moments"], lookback=19)
+FACTORS.add("vol_spike_20", lambda v, m: (v / (m.mean(20) + 1e-12)) - 1,
+            deps=["volume_f", "volume_moments"], lookback=19)
+FACTORS.add("abn_vol_60", lambda v, m: (v / (m.mean(60) + 1e-12)) - 1,
+            deps=["volume_f", "volume_moments"], lookback=59)
+
+# ------------- Cross-asset corr ------------
+def _cross_lr(close, other):
+    if other is None:
         return None
+    return np.log(other.reindex(close.index).ffill()).diff()
+
+def _cross_pair(lr, other_lr):
+    return None if other_lr is None else RollingPair(lr, other_lr)
+
+def _pair_corr(w: int):
+    return lambda lr, other_lr, pair: None if pair is None else _rolling_corr(lr, other_lr, w, pair)
+
+for _asset in ("spy", "vix", "sector"):
+    FACTORS.add(f"{_asset}_lr", _cross_lr, deps=["close", _asset], lookback=1, output=False)
+    FACTORS.add(f"{_asset}_pair", _cross_pair, deps=["log_ret_1d", f"{_asset}_lr"], output=False)
+    for _w in (20, 60):
+        FACTORS.add(f"corr_{_asset}_{_w}", _pair_corr(_w),
+                    deps=["log_ret_1d", f"{_asset}_lr", f"{_asset}_pair"], lookback=_w - 1)
+    if _asset == "spy":
+        @FACTORS.node("beta_spy_60", deps=["log_ret_1d", "spy_lr", "spy_pair"], lookback=59)
+        def _beta_spy_60(lr, spy_lr, pair):
+            if pair is None:
+                return None
+            return _like(lr, pair.cov(60) / (RollingMoments(spy_lr).var(60) + 1e-12))
+
+# -------- Higher-moment risk (20) ---------
+FACTORS.add("ret_skew_20", lambda lr: lr.rolling(20).skew(), deps=["log_ret_1d"], lookback=19)
+FACTORS.add("ret_kurt_20", lambda lr: lr.rolling(20).kurt(), deps=["log_ret_1d"], lookback=19)
+
+# --------- Forward-looking targets --------
+for _h in (1, 3, 5, 10, 20):
+    FACTORS.add(f"target_ret_{_h}d", lambda c, h=_h: np.log(c.shift(-h) / c), deps=["close"], lead=_h)
+for _h in (1, 5, 20):
+    FACTORS.add(f"y_up_{_h}d", lambda t: (t > 0).astype(int), deps=[f"target_ret_{_h}d"])
+
+def _evaluate(df: pd.DataFrame, columns, spy=None, vix=None, sector=None) -> pd.DataFrame:
+    inputs = {c: df[c] if c in df.columns else None for c in ("close", "high", "low", "volume")}
+    inputs.update(spy=spy, vix=vix, sector=sector)
+    out = FACTORS.evaluate(inputs, columns)
+    # derived columns replace same-named ones (the frame is already a copy)
+    df = df.drop(columns=[c for c in out if c in df.columns])
+    return pd.concat([df, pd.DataFrame(out, index=df.index)], axis=1)
 
-    # If we have a preference, try to pick one that includes all nice_to_have
-    if nice_to_have:
-        preferred = [orig for n, orig in matches if all(k in n for k in nice_to_have)]
-        if preferred:
-            return preferred[0]
-
-    # Fallback: first match (stable)
-    return matches[0][1]
-
-def _price_col(df: pd.DataFrame) -> str:
-    # Prefer adjusted close if available by fuzzy match, then close.
-    col = _find_like(df, must_have=["adj", "close"]) \
-        or _find_like(df, must_have=["adjusted", "close"]) \
-        or _find_like(df, must_have=["adjclose"]) \
-        or _find_like(df, must_have=["close"])
-    if col is None:
-        raise KeyError("No Close/Adj Close column in price DataFrame.")
-    return col
-
-def _high_col(df: pd.DataFrame) -> str | None:
-    return _find_like(df, must_have=["high"])
-
-def _low_col(df: pd.DataFrame) -> str | None:
-    return _find_like(df, must_have=["low"])
-
-def _volume_col(df: pd.DataFrame) -> str | None:
-    # yfinance sometimes uses 'Volume', others 'vol'
-    return _find_like(df, must_have=["volume"]) or _find_like(df, must_have=["vol"])
+# ---------------------------
+# Compact dtypes (opt-in)
+# ---------------------------
+# FACTOR_COMPACT=1 keeps factor tables as float32 with int8 labels and integer volume:
+# about half the memory of the float64 tables, and XGBoost (which works in float32)
+# reads the columns without a conversion copy.
+FACTOR_COMPACT = os.getenv("FACTOR_COMPACT", "0") == "1"
+
+def _narrow_volume(v: pd.Series) -> pd.Series:
+    x = v.to_numpy()
+    if np.isfinite(x).all() and (x == np.round(x)).all():
+        return pd.to_numeric(v, downcast="unsigned" if (x >= 0).all() else "integer")
+    return v.astype(np.float32)
+
+def compact_factors(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copy of a factor table with float columns as float32, y_up_* labels as int8 and
+    volume as the narrowest integer type that holds it (float32 if it has gaps).
+    """
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if c == "volume" and pd.api.types.is_numeric_dtype(s):
+            out[c] = _narrow_volume(s)
+        elif isinstance(c, str) and c.startswith("y_up_"):
+            out[c] = s.astype(np.int8)
+        elif pd.api.types.is_float_dtype(s):
+            out[c] = s.astype(np.float32)
+        else:
+            out[c] = s
+    return pd.DataFrame(out, index=df.index)
 
 # --- replace compute_base_cols ---
 def compute_base_cols(df: pd.DataFrame) -> pd.DataFrame:
@@ -81,41 +202,7 @@ def compute_base_cols(df: pd.DataFrame) -> pd.DataFrame:
     """
     if df is None or df.empty:
         return pd.DataFrame(index=pd.Index([], dtype="datetime64[ns]"))
-
-    df = df.sort_index().copy()
-
-    pcol = _price_col(df)
-    hcol = _high_col(df)
-    lcol = _low_col(df)
-    vcol = _volume_col(df)
-
-    # Canonicalize names we will use downstream
-    rename_map = {pcol: "close"}
-    if hcol: rename_map[hcol] = "high"
-    if lcol: rename_map[lcol] = "low"
-    if vcol: rename_map[vcol] = "volume"
-    df = df.rename(columns=rename_map)
-
-    # Ensure numeric types
-    for c in ["close", "high", "low", "volume"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-
-    df["ret_1d"]     = df["close"].pct_change(1)
-    df["ret_5d"]     = df["close"].pct_change(5)
-    df["ret_20d"]    = df["close"].pct_change(20)
-    df["log_ret_1d"] = np.log(df["close"]).diff(1)
-
-    if "high" in df.columns and "low" in df.columns:
-        df["rng"] = (df["high"] - df["low"]) / (df["close"].shift(1) + 1e-12)
-        df["vwap_proxy"] = (df.get("high", df["close"]) +
-                            df.get("low", df["close"]) +
-                            df["close"]) / 3.0
-    else:
-        df["rng"] = np.nan
-        df["vwap_proxy"] = df["close"]
-
-    return df
+    return _evaluate(_canonical(df), BASE_COLUMNS)
 
 # ---------------------------
 # Alpha factors
@@ -124,7 +211,9 @@ def compute_alpha_factors(
     px: pd.DataFrame,
     spy: pd.Series | None = None,
     vix: pd.Series | None = None,
-    sector: pd.Series | None = None
+    sector: pd.Series | None = None,
+    columns: List[str] | None = None,
+    compact: bool = False
 ) -> pd.DataFrame:
     """
     Returns a DataFrame with engineered factors + forward targets.
@@ -136,98 +225,54 @@ def compute_alpha_factors(
       - Cross-asset: corr_spy_20/60, corr_vix_20/60, corr_sector_20/60, beta_spy_60
       - Higher moments: ret_skew_20, ret_kurt_20
       - Targets: target_ret_{1,3,5,10,20}d + y_up_{1,5,20}
+    `columns` restricts the derived columns to those named (plus the price columns):
+    only the nodes they depend on are evaluated. Default: all of them.
+    `compact` returns the table in compact dtypes (see compact_factors).
     """
-    df = compute_base_cols(px)
-
-    # Price column is now canonical "close"
-    pcol = "close"
-
-    # ---------------- Momentum ----------------
-    df["mom_3"]   = (df[pcol] / df[pcol].shift(3)) - 1
-    df["mom_5"]   = (df[pcol] / df[pcol].shift(5)) - 1
-    df["mom_10"]  = (df[pcol] / df[pcol].shift(10)) - 1
-    df["mom_20"]  = (df[pcol] / df[pcol].shift(20)) - 1
-    df["mom_60"]  = (df[pcol] / df[pcol].shift(60)) - 1
-    df["mom_63"]  = (df[pcol] / df[pcol].shift(63)) - 1
-
-    # ------------- Mean reversion -------------
-    for w in (5, 10, 20, 50, 60):
-        ma = df[pcol].rolling(w).mean()
-        df[f"mr_z_{w}"] = _zscore(df[pcol], w)
-        df[f"px_ma_{w}_dev"] = (df[pcol] - ma) / (ma + 1e-12)
-
-    # -------- Bollinger bandwidth (20) --------
-    m = df[pcol].rolling(20).mean()
-    s = df[pcol].rolling(20).std(ddof=0)
-    df["boll_bw_20"] = ((m + 2*s) - (m - 2*s)) / (m + 1e-12)
-
-    # --------------- Volatility ----------------
-    df["vol_5"]   = df["log_ret_1d"].rolling(5).std(ddof=0)
-    df["vol_10"]  = df["log_ret_1d"].rolling(10).std(ddof=0)
-    df["vol_20"]  = df["log_ret_1d"].rolling(20).std(ddof=0)
-    df["vol_60"]  = df["log_ret_1d"].rolling(60).std(ddof=0)
-    df["rng_5"]   = df["rng"].rolling(5).mean()
-
-    # Parkinson volatility (if high/low present)
-    if "high" in df.columns and "low" in df.columns:
-        hl = (np.log(df["high"]) - np.log(df["low"])) ** 2
-        df["parkinson_20"] = np.sqrt((1.0 / (4 * np.log(2))) * hl.rolling(20).mean())
-    else:
-        df["parkinson_20"] = np.nan
+    if px is None or px.empty:
+        return compute_base_cols(px)
+    df = _evaluate(_canonical(px), columns, spy=spy, vix=vix, sector=sector)
+    return compact_factors(df) if compact else df
 
-    # ----------------- Volume ------------------
-    if "volume" in df.columns:
-        vol = pd.to_numeric(df["volume"], errors="coerce").reindex(df.index)
-    else:
-        vol = pd.Series(index=df.index, dtype="float")
-
-    df["vol_chg_1d"] = _pct_change(vol.astype("float"), 1)
-    df["vol_z_20"]   = _zscore(vol.astype("float"), 20)
-
-    vol_mean_20 = vol.rolling(20).mean()
-    df["vol_spike_20"] = (vol / (vol_mean_20 + 1e-12)) - 1
-
-    vol_mean_60 = vol.rolling(60).mean()
-    df["abn_vol_60"] = (vol / (vol_mean_60 + 1e-12)) - 1
-
-    # ------------- Cross-asset corr ------------
-    if spy is not None:
-        spy = spy.reindex(df.index).ffill()
-        spy_lr = np.log(spy).diff()
-        df["corr_spy_20"] = _rolling_corr(df["log_ret_1d"], spy_lr, 20)
-        df["corr_spy_60"] = _rolling_corr(df["log_ret_1d"], spy_lr, 60)
-        df["beta_spy_60"] = (
-            df["log_ret_1d"].rolling(60).cov(spy_lr) /
-            (spy_lr.rolling(60).var(ddof=0) + 1e-12)
-        )
-
-    if vix is not None:
-        vix = vix.reindex(df.index).ffill()
-        vix_lr = np.log(vix).diff()
-        df["corr_vix_20"] = _rolling_corr(df["log_ret_1d"], vix_lr, 20)
-        df["corr_vix_60"] = _rolling_corr(df["log_ret_1d"], vix_lr, 60)
-
-    if sector is not None:
-        sector = sector.reindex(df.index).ffill()
-        sector_lr = np.log(sector).diff()
-        df["corr_sector_20"] = _rolling_corr(df["log_ret_1d"], sector_lr, 20)
-        df["corr_sector_60"] = _rolling_corr(df["log_ret_1d"], sector_lr, 60)
-
-    # -------- Higher-moment risk (20) ---------
-    df["ret_skew_20"] = df["log_ret_1d"].rolling(20).skew()
-    df["ret_kurt_20"] = df["log_ret_1d"].rolling(20).kurt()
-
-    # --------- Forward-looking targets --------
-    df["target_ret_1d"]   = np.log(df[pcol].shift(-1)   / df[pcol])
-    df["target_ret_3d"]   = np.log(df[pcol].shift(-3)   / df[pcol])
-    df["target_ret_5d"]   = np.log(df[pcol].shift(-5)   / df[pcol])
-    df["target_ret_10d"]  = np.log(df[pcol].shift(-10)  / df[pcol])
-    df["target_ret_20d"]  = np.log(df[pcol].shift(-20)  / df[pcol])
-
-    df["y_up_1d"]  = (df["target_ret_1d"]  > 0).astype(int)
-    df["y_up_5d"]  = (df["target_ret_5d"]  > 0).astype(int)
-    df["y_up_20d"] = (df["target_ret_20d"] > 0).astype(int)
-    return df
+# Longest look-back of any factor (mom_63) and longest forward target (target_ret_20d)
+FACTOR_LOOKBACK = FACTORS.lookback()
+TARGET_HORIZON = FACTORS.lead()
+
+def update_alpha_factors(
+    prev: pd.DataFrame,
+    px: pd.DataFrame,
+    spy: pd.Series | None = None,
+    vix: pd.Series | None = None,
+    sector: pd.Series | None = None
+) -> pd.DataFrame:
+    """
+    Extends a compute_alpha_factors table `prev` with the bars of `px` after its last row.
+    `px` must hold those new bars plus the FACTOR_LOOKBACK + TARGET_HORIZON bars before
+    them (full history works too; only the tail is used). Only the new rows and the last
+    TARGET_HORIZON rows of `prev` (whose forward targets now see new prices) are
+    recomputed, so the cost is O(new bars); the result matches compute_alpha_factors on
+    the full history up to floating-point noise from the rolling windows.
+    """
+    if prev is None or prev.empty:
+        return compute_alpha_factors(px, spy=spy, vix=vix, sector=sector)
+    px = px.sort_index()
+    if not (px.index > prev.index[-1]).any():
+        return prev.copy()
+
+    redo = min(TARGET_HORIZON, len(prev))
+    first_redo = prev.index[-redo]
+    pos = px.index.get_indexer([first_redo])[0]
+    if pos < 0:
+        raise ValueError("px does not overlap the last rows of the factor table.")
+    # never look further back than the table itself started
+    lo = max(pos - FACTOR_LOOKBACK, px.index.searchsorted(prev.index[0]))
+    if pos - lo < FACTOR_LOOKBACK and len(prev) > redo:
+        raise ValueError(f"px needs {FACTOR_LOOKBACK} bars of history before {first_redo.date()}.")
+
+    tail = compute_alpha_factors(px.iloc[lo:], spy=spy, vix=vix, sector=sector).loc[first_redo:]
+    if list(tail.columns) != list(prev.columns):
+        raise ValueError("px/spy/vix/sector do not have the shape the factor table was built from.")
+    return pd.concat([prev.iloc[:len(prev) - redo], tail])
 
 # ---------------------------
 # PCA diagnostics (JSON-friendly)
@@ -236,35 +281,48 @@ def compute_pca_diagnostics(
     df: pd.DataFrame,
     feature_cols: List[str],
     n_components: int = 8,
-    topk_loadings: int = 8
+    topk_loadings: int = 8,
+    solver: str | None = None,
+    rolling_window: int | None = None,
+    rolling_step: int = 5,
+    stats: Callable[[np.ndarray], PCAStats] | None = None,
 ) -> Dict[str, Any]:
     """
     Standardizes features, runs PCA, and returns:
       - explained_variance_ratio
       - per-component top loadings (feature, signed loading, abs loading for rank)
+      - with rolling_window: rolling_explained_variance, the ratios over every
+        rolling_step-th trailing window of that many rows
     Skips rows with NaNs across selected features.
+    solver (default PCA_SOLVER): "covariance" (eigh of the correlation matrix, from
+    mergeable statistics), "randomized" (sklearn randomized SVD, for wide universes),
+    "full" (sklearn exact SVD) or "auto". `stats` maps the clean matrix to its PCAStats
+    (e.g. a PrefixStats that reuses earlier rows); the default computes them from scratch.
     """
-    from sklearn.preprocessing import StandardScaler
-    from sklearn.decomposition import PCA
-
     if not feature_cols:
         return {"error": "No features provided for PCA."}
 
-    X = df[feature_cols].copy()
-    X = X.dropna(how="any")
+    X = df[feature_cols].dropna(how="any")
     if X.empty:
         return {"error": "No rows available for PCA after dropping NaNs."}
+    index = X.index
+    X = X.to_numpy(dtype=float)
 
-    scaler = StandardScaler(with_mean=True, with_std=True)
-    Xs = scaler.fit_transform(X.values)
+    k = min(n_components, X.shape[1])
+    solver = choose_solver(solver, X.shape[1])
+    if solver == "covariance":
+        ratio, loadings = fit_covariance((stats or PCAStats.from_array)(X), k)
+    else:
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.decomposition import PCA
 
-    k = min(n_components, Xs.shape[1])
-    pca = PCA(n_components=k, svd_solver="auto", random_state=42)
-    pca.fit(Xs)
+        Xs = StandardScaler(with_mean=True, with_std=True).fit_transform(X)
+        pca = PCA(n_components=k, svd_solver=solver, random_state=42)
+        pca.fit(Xs)
+        ratio, loadings = pca.explained_variance_ratio_, pca.components_  # shape: (k, n_features)
 
-    explained = [float(v) for v in pca.explained_variance_ratio_.tolist()]
+    explained = [float(v) for v in ratio.tolist()]
     comps = []
-    loadings = pca.components_  # shape: (k, n_features)
 
     for i in range(k):
         row = loadings[i]
@@ -278,10 +336,20 @@ def compute_pca_diagnostics(
             })
         comps.append({"component": i + 1, "top_loadings": top})
 
-    return {
-        "n_samples": int(Xs.shape[0]),
-        "n_features": int(Xs.shape[1]),
+    out = {
+        "n_samples": int(X.shape[0]),
+        "n_features": int(X.shape[1]),
         "explained_variance_ratio": explained,
         "components": comps,
         "features_used": feature_cols,
+        "solver": solver,
     }
+    if rolling_window:
+        ends, rolling = rolling_explained_variance(X, int(rolling_window), k, step=rolling_step)
+        out["rolling_explained_variance"] = {
+            "window": int(rolling_window),
+            "step": int(rolling_step),
+            "dates": [d.strftime("%Y-%m-%d") for d in index[ends]],
+            "ratios": [[float(v) for v in r] for r in rolling.tolist()],
+        }
+    return out
@@ -1,12 +1,34 @@
 # core/research/ff.py
+"""
+Fama-French daily factors served from a local store.
+
+The FF3/FF5 daily tables change at most monthly, so they are normalized once,
+kept as data/cache/ff/<set>.parquet (+ .meta.json with a content-hash version)
+and held in memory after the first read. Requests never download: a missing or
+older-than-FF_REFRESH_DAYS table schedules a background refresh and the request
+uses what is stored. refresh_ff_factors() refreshes explicitly; seed_ff_factors()
+loads a local file (the Ken French CSV or a saved frame) for offline use.
+"""
+import os, json, hashlib, threading, time
 import numpy as np
 import pandas as pd
 from typing import Dict, Literal
-from pandas_datareader import data as pdr
 import statsmodels.api as sm
 
+from .cache import CACHE_DIR
+from .store import atomic_write
+
 FFSet = Literal["ff3", "ff5"]
 
+FF_DIR = os.path.join(CACHE_DIR, "ff")
+FF_REFRESH_DAYS = float(os.getenv("FF_REFRESH_DAYS", 7))
+# after a failed background refresh (e.g. offline), wait this long before retrying
+FF_RETRY_SECONDS = 900.0
+_FF_DATASETS = {
+    "ff3": "F-F_Research_Data_Factors_Daily",
+    "ff5": "F-F_Research_Data_5_Factors_2x3_Daily",
+}
+
 
 def _robust_to_datetime(idx_like) -> pd.DatetimeIndex:
     """
@@ -39,32 +61,207 @@ def _robust_to_datetime(idx_like) -> pd.DatetimeIndex:
         return dt.tz_localize(None)
 
 
+# ---------------------------
+# Local store
+# ---------------------------
+_ff_lock = threading.Lock()
+_ff_mem: Dict[str, pd.DataFrame] = {}
+_ff_refreshing: Dict[str, threading.Thread] = {}
+_ff_failed_at: Dict[str, float] = {}
+
+
+def _ff_paths(which: str):
+    base = os.path.join(FF_DIR, which)
+    return base + ".parquet", base + ".meta.json"
+
+
+def _check_set(which: str) -> None:
+    if which not in _FF_DATASETS:
+        raise ValueError(f"Unsupported factor set '{which}' (use 'ff3' or 'ff5').")
+
+
+def _normalize_ff(df: pd.DataFrame, percent: bool = True) -> pd.DataFrame:
+    """Clean DatetimeIndex, float columns, DECIMAL returns (FF publishes percent)."""
+    out = df.copy()
+    out.columns = [str(c).strip() for c in out.columns]
+    out.index = _robust_to_datetime(out.index)
+    out = out.loc[out.index.notna()].apply(pd.to_numeric, errors="coerce").astype(float)
+    if percent:
+        out = out / 100.0
+    out = out.sort_index()
+    return out[~out.index.duplicated(keep="last")]
+
+
+def read_ff_meta(which: FFSet = "ff5") -> dict | None:
+    """{"version", "source", "updated_at", "first", "last", "rows"} of the stored table."""
+    try:
+        with open(_ff_paths(which)[1]) as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _save_ff(which: str, df: pd.DataFrame, source: str) -> dict:
+    os.makedirs(FF_DIR, exist_ok=True)
+    data_path, meta_path = _ff_paths(which)
+    meta = {
+        "version": hashlib.sha1(pd.util.hash_pandas_object(df, index=True).values.tobytes()).hexdigest()[:16],
+        "source": source,
+        "updated_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "first": df.index.min().strftime("%Y-%m-%d"),
+        "last": df.index.max().strftime("%Y-%m-%d"),
+        "rows": int(len(df)),
+        "columns": list(df.columns),
+    }
+    prev = read_ff_meta(which)
+    if not (prev and prev.get("version") == meta["version"] and os.path.exists(data_path)):
+        atomic_write(data_path, df.to_parquet)
+
+    def _dump(tmp: str) -> None:
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=2)
+    atomic_write(meta_path, _dump)
+    with _ff_lock:
+        _ff_mem[which] = df
+    return meta
+
+
+def _download_ff(which: str) -> pd.DataFrame:
+    from pandas_datareader import data as pdr  # optional dependency, only needed to refresh
+    ds = pdr.DataReader(_FF_DATASETS[which], "famafrench")[0]
+    return _normalize_ff(ds, percent=True)
+
+
+def refresh_ff_factors(which: FFSet = "ff5") -> dict:
+    """Download the table now and replace the stored copy; returns its meta. Raises on failure."""
+    _check_set(which)
+    return _save_ff(which, _download_ff(which), source=f"famafrench:{_FF_DATASETS[which]}")
+
+
+def _read_seed_file(path: str) -> pd.DataFrame:
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    try:
+        df = pd.read_csv(path, index_col=0)
+        if len(df) and _robust_to_datetime(df.index.astype(str)).notna().all():
+            return df
+    except Exception:
+        pass
+    # Raw Ken French CSV: description lines, a header row, yyyymmdd rows, a copyright footer
+    with open(path) as f:
+        lines = [ln.rstrip("\n") for ln in f]
+    rows = [ln.split(",") for ln in lines if ln.split(",")[0].strip().isdigit() and len(ln.split(",")[0].strip()) == 8]
+    header = next(ln.split(",") for ln in lines if "Mkt-RF" in ln)
+    out = pd.DataFrame([r[1:] for r in rows], index=[r[0].strip() for r in rows],
+                       columns=[c.strip() for c in header[1:len(rows[0])]])
+    return out
+
+
+def seed_ff_factors(path: str, which: FFSet = "ff5", percent: bool = True) -> dict:
+    """
+    Store a local FF daily table (the Ken French CSV, or a CSV/Parquet with a date
+    index); `percent=False` if the file already holds decimal returns.
+    """
+    _check_set(which)
+    df = _normalize_ff(_read_seed_file(path), percent=percent)
+    if df.empty:
+        raise ValueError(f"No factor rows found in {path}")
+    return _save_ff(which, df, source=f"seed:{os.path.basename(path)}")
+
+
+def _refresh_in_background(which: str) -> None:
+    def _run():
+        try:
+            refresh_ff_factors(which)
+        except Exception as e:
+            with _ff_lock:
+                _ff_failed_at[which] = time.monotonic()
+            print(f"[FF] Background refresh of {which} failed: {e}")
+        finally:
+            with _ff_lock:
+                _ff_refreshing.pop(which, None)
+
+    with _ff_lock:
+        failed = _ff_failed_at.get(which)
+        if which in _ff_refreshing or (failed is not None and time.monotonic() - failed < FF_RETRY_SECONDS):
+            return
+        t = _ff_refreshing[which] = threading.Thread(target=_run, name=f"ff-refresh-{which}", daemon=True)
+    t.start()
+
+
+def _is_due(meta: dict | None) -> bool:
+    if not meta:
+        return True
+    if FF_REFRESH_DAYS <= 0:
+        return False
+    age = pd.Timestamp.now(tz="UTC") - pd.Timestamp(meta["updated_at"])
+    return age > pd.Timedelta(days=FF_REFRESH_DAYS)
+
+
 def get_ff_factors_daily(which: FFSet = "ff5") -> pd.DataFrame:
     """
-    Download daily Fama-French factors as DECIMAL returns (not %) with a clean DatetimeIndex.
+    Daily Fama-French factors as DECIMAL returns (not %) with a clean DatetimeIndex,
+    from memory or the local store; never waits on a download. Empty frame if nothing
+    has been stored yet (a background refresh is scheduled). Do not mutate the result.
     ff5 columns: ['Mkt-RF','SMB','HML','RMW','CMA','RF']
     ff3 columns: ['Mkt-RF','SMB','HML','RF']
     """
-    try:
-        if which == "ff5":
-            ds = pdr.DataReader("F-F_Research_Data_5_Factors_2x3_Daily", "famafrench")[0]
-        else:
-            ds = pdr.DataReader("F-F_Research_Data_Factors_Daily", "famafrench")[0]
-
-        df = ds.copy()
-        df.index = _robust_to_datetime(df.index)
-        df = df.astype(float) / 100.0  # percent -> decimal
-        return df
-    except Exception as e:
-        print(f"[FF] Error downloading Fama-French factors: {e}")
-        return pd.DataFrame()
+    _check_set(which)
+    with _ff_lock:
+        df = _ff_mem.get(which)
+    if df is None:
+        data_path, _ = _ff_paths(which)
+        if os.path.exists(data_path):
+            try:
+                df = pd.read_parquet(data_path)
+            except Exception as e:
+                print(f"[FF] Unreadable factor store {data_path}: {e}")
+        if df is not None:
+            with _ff_lock:
+                df = _ff_mem.setdefault(which, df)
+    if _is_due(read_ff_meta(which)):
+        _refresh_in_background(which)
+    return df if df is not None else pd.DataFrame()
+
 
+def _ff_regression(strategy_ret: pd.Series, which: str) -> dict:
+    """Excess strategy returns ~ const + FF factors (from the local store)."""
+    ff = get_ff_factors_daily(which)
+    if ff.empty:
+        return {"betas": {}, "tstats": {}, "error": f"{which} factors not available yet (refresh scheduled)."}
+    s = strategy_ret.copy()
+    s.index = pd.to_datetime(s.index).tz_localize(None)
+    df = ff.join(s.rename("strategy"), how="inner").dropna()
+    facs = [c for c in ff.columns if c != "RF"]
+    if len(df) <= len(facs) + 1:
+        return {"betas": {}, "tstats": {}}
+    y = df["strategy"].astype(float) - (df["RF"] if "RF" in df.columns else 0.0)
+    model = sm.OLS(y, sm.add_constant(df[facs].astype(float))).fit()
+    names = {"const": "alpha"}
+    return {
+        "betas": {names.get(k, k): float(v) for k, v in model.params.items()},
+        "tstats": {names.get(k, k): float(v) for k, v in model.tvalues.items()},
+        "r2": float(model.rsquared),
+        "n_obs": int(model.nobs),
+        "factor_set": which,
+        "factor_version": (read_ff_meta(which) or {}).get("version"),
+    }
 
-def fama_french_exposure(strategy_ret: pd.Series, bench_ret: pd.Series | None = None):
+
+def fama_french_exposure(strategy_ret: pd.Series, bench_ret: pd.Series | None = None, which: FFSet | None = None):
     """
-    Minimal alpha/beta regression: strategy ~ const + benchmark
+    With `which` ('ff3'/'ff5'): regression of excess strategy returns on the stored
+    Fama-French factors. Otherwise the minimal alpha/beta regression: strategy ~ const + benchmark.
     Returns JSON-ready dict: {"betas": {"alpha": ..., "beta": ...}, "tstats": {...}}
     """
+    if which is not None:
+        _check_set(which)
+        try:
+            return _ff_regression(strategy_ret, which)
+        except Exception as e:
+            print(f"[FF] Error in regression: {e}")
+            return {"betas": {}, "tstats": {}}
+
     if bench_ret is None or bench_ret.empty:
         return {"betas": {}, "tstats": {}}
 
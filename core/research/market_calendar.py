@@ -0,0 +1,62 @@
+# core/research/market_calendar.py
+"""
+NYSE session calendar used to decide whether cached daily bars are current.
+Early closes are treated as full sessions (we just check a little later than needed).
+"""
+from __future__ import annotations
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, Holiday, GoodFriday, USLaborDay, USMartinLutherKingJr,
+    USMemorialDay, USPresidentsDay, USThanksgivingDay, nearest_workday, sunday_to_monday,
+)
+from pandas.tseries.offsets import CustomBusinessDay
+
+EXCHANGE_TZ = "America/New_York"
+SESSION_CLOSE = pd.Timedelta(hours=16)
+# Daily bars are published a little after the bell
+SETTLE_DELAY = pd.Timedelta(minutes=30)
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    rules = [
+        # a Saturday New Year's Day is not observed on the Friday before
+        Holiday("NewYearsDay", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("IndependenceDay", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+SESSION = CustomBusinessDay(calendar=NYSEHolidayCalendar())
+
+
+def _exchange_now(now: pd.Timestamp | None = None) -> pd.Timestamp:
+    now = pd.Timestamp.now(tz=EXCHANGE_TZ) if now is None else pd.Timestamp(now)
+    if now.tzinfo is None:
+        now = now.tz_localize(EXCHANGE_TZ)
+    return now.tz_convert(EXCHANGE_TZ)
+
+
+def is_session(day) -> bool:
+    day = pd.Timestamp(day).normalize()
+    if day.tzinfo is not None:
+        day = day.tz_localize(None)
+    return bool(SESSION.is_on_offset(day))
+
+
+def last_closed_session(now: pd.Timestamp | None = None) -> pd.Timestamp:
+    """
+    Date (tz-naive midnight) of the most recent session whose daily bar should be
+    available at `now` (exchange time; naive timestamps are taken as exchange time).
+    """
+    now = _exchange_now(now)
+    today = now.tz_localize(None).normalize()
+    if is_session(today) and now.tz_localize(None) >= today + SESSION_CLOSE + SETTLE_DELAY:
+        return today
+    return today - SESSION
@@ -0,0 +1,238 @@
+# core/research/marketdata.py
+"""
+Shared market-data service.
+
+Research endpoints, the portfolio engine and main.get_price_history read prices
+through here instead of calling yf.download themselves. Data is served from the
+local cache (cache.load_prices); the active provider is only asked for sessions
+the cache does not already hold, so warm requests do no network I/O.
+
+Provider selection (env):
+  MARKETDATA_PROVIDER  = yfinance (default) | local
+  MARKETDATA_FIXTURES  = directory of <TICKER>.parquet / <TICKER>.csv for `local`
+
+Close series (SPY, ^VIX, benchmarks are read by nearly every endpoint) go through a
+single-flight layer: concurrent requests for the same (symbol, window) share one
+load, and the parsed Series is memoised for MARKETDATA_MEMO_SECONDS (default 60).
+"""
+from __future__ import annotations
+import os
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from .cache import load_prices, load_prices_many, refresh_many, _base_path
+from .ohlcv import close_series, flatten_ohlcv
+from .singleflight import SingleFlight
+
+DEFAULT_START = "2015-01-01"
+# load start for period="max": before any listed history, i.e. no start bound
+MAX_START = "1900-01-01"
+
+
+# ---------------------------
+# Providers
+# ---------------------------
+class PriceProvider:
+    """Source of daily OHLCV; returns a yfinance-shaped frame (empty when nothing is available)."""
+    name = "base"
+
+    def download(self, ticker: str, start: str, auto_adjust: bool = True) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def download_many(self, tickers: List[str], start: str, auto_adjust: bool = True) -> pd.DataFrame:
+        """Grouped download with (ticker, field) columns; default loops over download()."""
+        frames = {}
+        for tk in tickers:
+            df = flatten_ohlcv(self.download(tk, start, auto_adjust), tk)
+            if df is not None and not df.empty:
+                frames[tk] = df
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1)
+
+
+class YFinanceProvider(PriceProvider):
+    name = "yfinance"
+
+    def download(self, ticker: str, start: str, auto_adjust: bool = True) -> pd.DataFrame:
+        import yfinance as yf
+        return yf.download(ticker, start=start, auto_adjust=auto_adjust, progress=False)
+
+    def download_many(self, tickers: List[str], start: str, auto_adjust: bool = True) -> pd.DataFrame:
+        import yfinance as yf
+        return yf.download(tickers, start=start, auto_adjust=auto_adjust, progress=False,
+                           group_by="ticker", threads=True)
+
+
+class LocalFileProvider(PriceProvider):
+    """
+    Offline provider backed by fixture files: <root>/<TICKER>.parquet or <TICKER>.csv
+    (file names use the same sanitising as the cache, e.g. ^VIX -> VIX.parquet).
+    CSVs need the date in the first column.
+    """
+    name = "local"
+
+    def __init__(self, root: str | None = None):
+        self.root = root or os.getenv("MARKETDATA_FIXTURES", os.path.join("data", "fixtures"))
+
+    def _path(self, ticker: str) -> str | None:
+        stem = os.path.basename(_base_path(ticker))
+        for ext in (".parquet", ".csv"):
+            p = os.path.join(self.root, stem + ext)
+            if os.path.exists(p):
+                return p
+        return None
+
+    def download(self, ticker: str, start: str, auto_adjust: bool = True) -> pd.DataFrame:
+        path = self._path(ticker)
+        if path is None:
+            return pd.DataFrame()
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path, index_col=0, parse_dates=True)
+        df = flatten_ohlcv(df, ticker)
+        return df.loc[df.index >= pd.Timestamp(start)]
+
+
+_PROVIDERS: Dict[str, Callable[[], PriceProvider]] = {
+    "yfinance": YFinanceProvider,
+    "local": LocalFileProvider,
+}
+_provider: PriceProvider | None = None
+
+
+def register_provider(name: str, factory: Callable[[], PriceProvider]) -> None:
+    _PROVIDERS[name] = factory
+
+
+def set_provider(provider: PriceProvider | str) -> PriceProvider:
+    global _provider
+    _provider = _PROVIDERS[provider]() if isinstance(provider, str) else provider
+    return _provider
+
+
+def get_provider() -> PriceProvider:
+    if _provider is None:
+        return set_provider(os.getenv("MARKETDATA_PROVIDER", "yfinance"))
+    return _provider
+
+
+# ---------------------------
+# Service
+# ---------------------------
+def get_ohlcv(
+    ticker: str,
+    start: str = DEFAULT_START,
+    auto_adjust: bool = True,
+    *,
+    end: str | None = None,
+    columns: List[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Flat daily OHLCV (Open/High/Low/Close/Volume) from `start` (to `end`), served from
+    the cache; `columns` limits the fields read from disk.
+    Returns an empty frame when the provider has no data, like yf.download.
+    """
+    try:
+        return load_prices(ticker, start, auto_adjust=auto_adjust, end=end, columns=columns,
+                           downloader=get_provider().download)
+    except ValueError:
+        return pd.DataFrame()
+
+
+def get_ohlcv_many(
+    tickers: List[str],
+    start: str = DEFAULT_START,
+    auto_adjust: bool = True,
+    *,
+    end: str | None = None,
+    columns: List[str] | None = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Bulk get_ohlcv: missing/stale tickers are fetched with one grouped provider call
+    per chunk. Tickers without data are omitted from the result.
+    """
+    return load_prices_many(tickers, start, auto_adjust=auto_adjust, end=end, columns=columns,
+                            downloader=get_provider().download_many)
+
+
+def refresh_prices(tickers: List[str], start: str = DEFAULT_START, auto_adjust: bool = True) -> List[str]:
+    """Refresh stale tickers (grouped provider calls) without reading bars; returns those with data."""
+    return refresh_many(tickers, start, auto_adjust=auto_adjust, downloader=get_provider().download_many)
+
+
+# ---------------------------
+# Single-flight + memo for Close series
+# ---------------------------
+MEMO_SECONDS = float(os.getenv("MARKETDATA_MEMO_SECONDS", 60))
+_closes = SingleFlight(ttl=MEMO_SECONDS, max_entries=256)
+
+
+def flight_stats() -> Dict[str, int]:
+    """Counters for the Close-series layer; `saved` = loads avoided (memo hits + coalesced waits)."""
+    return _closes.stats()
+
+
+def clear_memo() -> None:
+    _closes.clear()
+
+
+def _load_close(ticker: str, start: str, end: str | None) -> pd.Series:
+    px = get_ohlcv(ticker, start, end=end, columns=["Close", "Adj Close"])
+    if px is None or px.empty:
+        raise RuntimeError(f"No data for {ticker}")
+    if "Close" not in px.columns and "Adj Close" not in px.columns:
+        raise KeyError("No Close/Adj Close column found.")
+    return close_series(px, name=ticker)
+
+
+def get_close(ticker: str, start: str = DEFAULT_START, end: str | None = None) -> pd.Series:
+    """
+    Close (or Adj Close) series named after the ticker; raises RuntimeError if unavailable.
+    Identical concurrent calls share one load; each caller gets its own copy.
+    """
+    s = _closes.do(("close", ticker, str(start), None if end is None else str(end)),
+                       lambda: _load_close(ticker, start, end))
+    return s.copy()
+
+
+def _period_start(period: str, today: pd.Timestamp) -> pd.Timestamp | None:
+    p = (period or "").strip().lower()
+    if p == "max":
+        return None
+    if p == "ytd":
+        return pd.Timestamp(year=today.year, month=1, day=1)
+    for unit, offset in (("mo", "months"), ("y", "years"), ("wk", "weeks")):
+        if p.endswith(unit) and p[:-len(unit)].isdigit():
+            return today - pd.DateOffset(**{offset: int(p[:-len(unit)])})
+    raise ValueError(f"Unsupported period '{period}'")
+
+
+def get_history(ticker: str, period: str = "2y") -> pd.DataFrame:
+    """
+    yfinance-style `period` lookup ('5d', '6mo', '2y', 'ytd', 'max') returning a
+    single 'Close' column. The cache is always loaded from DEFAULT_START (or earlier)
+    so short lookups do not leave a truncated cache behind for the research endpoints;
+    'max' has no start bound and returns the provider's full history.
+    """
+    today = pd.Timestamp.today().normalize()
+    p = (period or "").strip().lower()
+    days = p.endswith("d") and p[:-1].isdigit()
+    start = None if days else _period_start(p, today)
+    if p == "max":
+        load_from = MAX_START
+    elif start is None:
+        load_from = DEFAULT_START
+    else:
+        load_from = min(start, pd.Timestamp(DEFAULT_START)).strftime("%Y-%m-%d")
+    try:
+        s = get_close(ticker, load_from)
+    except (RuntimeError, KeyError):
+        return pd.DataFrame()
+    if days:
+        s = s.tail(int(p[:-1]))
+    elif start is not None:
+        s = s.loc[s.index >= start]
+    return pd.DataFrame({"Close": s.rename("Close")})
@@ -32,23 +32,29 @@ def feature_columns(df: pd.DataFrame) -> List[str]:
         feats.append(c)
     return feats
 
+XGB_DEFAULT_PARAMS: Dict[str, Any] = dict(
+    n_estimators=400,
+    max_depth=4,
+    learning_rate=0.05,
+    subsample=0.9,
+    colsample_bytree=0.9,
+    reg_lambda=1.0,
+    objective="binary:logistic",
+    eval_metric="auc",
+    n_jobs=-1,
+)
+
 def train_xgb_prob(
     X_train: pd.DataFrame, y_train: pd.Series,
     X_valid: pd.DataFrame, y_valid: pd.Series,
-    params: Dict[str, Any] | None = None
+    params: Dict[str, Any] | None = None,
+    n_jobs: int | None = None,
 ) -> tuple[XGBClassifier, float]:
-    if params is None:
-        params = dict(
-            n_estimators=400,
-            max_depth=4,
-            learning_rate=0.05,
-            subsample=0.9,
-            colsample_bytree=0.9,
-            reg_lambda=1.0,
-            objective="binary:logistic",
-            eval_metric="auc",
-            n_jobs=-1,
-        )
+    # Frames go to XGBoost as they are: float32 columns (compact factor tables) are read
+    # in place, float64 ones are converted to XGBoost's float32 internally; never upcast here.
+    params = dict(XGB_DEFAULT_PARAMS if params is None else params)
+    if n_jobs is not None:
+        params["n_jobs"] = n_jobs  # thread budget of this fit (fold-parallel walk-forward)
     clf = XGBClassifier(**params)
     clf.fit(X_train, y_train, eval_set=[(X_valid, y_valid)], verbose=False)
     prob = clf.predict_proba(X_valid)[:, 1]
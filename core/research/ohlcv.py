@@ -0,0 +1,198 @@
+# core/research/ohlcv.py
+"""
+The one normalization layer for OHLCV frames.
+
+  flatten_ohlcv(df, ticker)    Title-case OHLCV fields (provider downloads, the cache)
+  canonical_ohlcv(df, ticker)  lowercase open/high/low/close/volume float frame
+  close_series(df, ticker)     1-D Close series
+  price_roles(columns)         {column: close/high/low/volume} for the factor code
+
+The column mapping depends only on the column layout, so it is resolved once per
+layout and cached, keyed by the column labels. The layouts yfinance produces are
+resolved at import. Frames are then sliced once by position and relabelled,
+without the copy / xs / rename / reselect chain.
+"""
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, Hashable, List, Tuple, Union
+
+import pandas as pd
+
+OHLCV_FIELDS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+_ALIASES = {
+    "open": "Open", "high": "High", "low": "Low", "close": "Close",
+    "adj close": "Adj Close", "adjclose": "Adj Close", "adjusted close": "Adj Close",
+    "volume": "Volume",
+}
+
+
+def _field(label) -> str | None:
+    return _ALIASES.get(str(label).strip().lower().replace("_", " "))
+
+
+# ---------------------------
+# Layout resolution (cached per column layout)
+# ---------------------------
+# (column positions, Title-case field names, indexer for .iloc: a slice when the positions are evenly spaced)
+Layout = Tuple[Tuple[int, ...], Tuple[str, ...], Union[slice, List[int]]]
+
+
+def _indexer(pos: Tuple[int, ...]) -> Union[slice, List[int]]:
+    # evenly spaced positions (one ticker of a download, a plain frame) slice without a copy
+    step = pos[1] - pos[0] if len(pos) > 1 else 1
+    if step > 0 and all(b - a == step for a, b in zip(pos, pos[1:])):
+        return slice(pos[0], pos[-1] + 1, step)
+    return list(pos)
+
+
+@lru_cache(maxsize=1024)
+def _flat_layout(columns: Tuple[Hashable, ...], ticker: str | None) -> Layout | None:
+    """Positions and field names of the OHLCV columns of one ticker, or None if there are none."""
+    tuples = any(isinstance(c, tuple) for c in columns)
+    prefix = f"{ticker}_" if ticker else None
+    # multi-ticker layouts: keep only the ticker's columns when it appears at all
+    scoped = ticker is not None and tuples and any(isinstance(c, tuple) and ticker in c for c in columns)
+    found: Dict[str, int] = {}
+    for i, c in enumerate(columns):
+        if isinstance(c, tuple):
+            if scoped and ticker not in c:
+                continue
+            parts = [p for p in c if not (scoped and p == ticker) and p not in (None, "", "None")]
+        else:
+            parts = [c[len(prefix):] if prefix and isinstance(c, str) and c.startswith(prefix) else c]
+        for p in parts:
+            f = _field(p)
+            if f is not None:
+                found.setdefault(f, i)  # first occurrence wins
+                break
+    if not found:
+        return None
+    names = tuple(f for f in OHLCV_FIELDS if f in found)
+    pos = tuple(found[f] for f in names)
+    return pos, names, _indexer(pos)
+
+
+def _layout(df: pd.DataFrame, ticker: str | None) -> Layout | None:
+    return _flat_layout(tuple(df.columns), ticker)
+
+
+def _naive_dates(index: pd.Index) -> pd.DatetimeIndex:
+    if isinstance(index, pd.DatetimeIndex):
+        return index if index.tz is None else index.tz_localize(None)
+    idx = pd.to_datetime(index)
+    return idx.tz_localize(None) if idx.tz is not None else idx
+
+
+def flatten_ohlcv(df: pd.DataFrame, ticker: str | None = None) -> pd.DataFrame:
+    """
+    Flatten a yfinance-style frame (plain or MultiIndex columns, single or
+    multi-ticker) to Title-case OHLCV columns on a tz-naive DatetimeIndex.
+    """
+    if df is None or df.empty:
+        return df
+    layout = _layout(df, ticker)
+    if layout is None:
+        # nothing recognisable: keep every column, Title-cased
+        out = df.rename(columns=lambda c: str(c).strip().title())
+    else:
+        _, names, take = layout
+        out = df.iloc[:, take]
+        out.columns = list(names)
+    out.index = _naive_dates(out.index)
+    return out
+
+
+def canonical_ohlcv(df: pd.DataFrame, ticker: str | None = None) -> pd.DataFrame:
+    """
+    Lowercase open/high/low/close/volume (whichever exist) as float64 on a sorted,
+    tz-naive DatetimeIndex. close is the adjusted close when the frame has one.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([]))
+    layout = _layout(df, ticker)
+    if layout is None:
+        return pd.DataFrame(index=_naive_dates(df.index))
+    pos, names, _ = layout
+    by_field = dict(zip(names, pos))
+    if "Adj Close" in by_field:
+        by_field["Close"] = by_field.pop("Adj Close")
+    fields = [f for f in ("Open", "High", "Low", "Close", "Volume") if f in by_field]
+    block = df.iloc[:, [by_field[f] for f in fields]]
+    # one float64 block; columns that are not numeric go through to_numeric first
+    if not all(pd.api.types.is_numeric_dtype(t) for t in block.dtypes):
+        block = block.apply(pd.to_numeric, errors="coerce")
+    out = pd.DataFrame(block.to_numpy(dtype=float), index=_naive_dates(df.index),
+                       columns=[f.lower() for f in fields], copy=False)
+    return out if out.index.is_monotonic_increasing else out.sort_index()
+
+
+def close_series(df: pd.DataFrame, ticker: str | None = None, name: str = "Close") -> pd.Series:
+    """Close (else Adj Close) as a numeric, NaN-free Series on a tz-naive DatetimeIndex."""
+    if df is None or df.empty:
+        return pd.Series(dtype="float64", name=name)
+    layout = _layout(df, ticker)
+    if layout is None:
+        return pd.Series(dtype="float64", name=name)
+    pos, names, _ = layout
+    fields = dict(zip(names, pos))
+    col = fields.get("Close", fields.get("Adj Close"))
+    if col is None:
+        return pd.Series(dtype="float64", name=name)
+    s = pd.to_numeric(df.iloc[:, col], errors="coerce").dropna()
+    s.index = _naive_dates(s.index)
+    s.name = name
+    return s
+
+
+# ---------------------------
+# Factor-code column roles (fuzzy names such as 'AAPL Adj Close' or 'close_aapl')
+# ---------------------------
+def _norm(s) -> str:
+    # normalize for matching: lowercase, underscores for spaces
+    return str(s).lower().replace(" ", "_")
+
+
+def _find_like(norms: Dict[str, Hashable], must_have: list[str]) -> Hashable | None:
+    """First column (stable) whose normalized name contains every `must_have` substring."""
+    for n, orig in norms.items():
+        if all(k in n for k in must_have):
+            return orig
+    return None
+
+
+@lru_cache(maxsize=1024)
+def _roles(columns: Tuple[Hashable, ...]) -> Tuple[Tuple[Hashable, str], ...]:
+    norms = {_norm(c): c for c in columns}
+    # Prefer adjusted close if available by fuzzy match, then close.
+    pcol = _find_like(norms, ["adj", "close"]) \
+        or _find_like(norms, ["adjusted", "close"]) \
+        or _find_like(norms, ["adjclose"]) \
+        or _find_like(norms, ["close"])
+    if pcol is None:
+        raise KeyError("No Close/Adj Close column in price DataFrame.")
+    roles = {pcol: "close"}
+    hcol = _find_like(norms, ["high"])
+    lcol = _find_like(norms, ["low"])
+    # yfinance sometimes uses 'Volume', others 'vol'
+    vcol = _find_like(norms, ["volume"]) or _find_like(norms, ["vol"])
+    if hcol: roles[hcol] = "high"
+    if lcol: roles[lcol] = "low"
+    if vcol: roles[vcol] = "volume"
+    return tuple(roles.items())
+
+
+def price_roles(columns) -> Dict[Hashable, str]:
+    """
+    {column: 'close' | 'high' | 'low' | 'volume'} for a price frame's columns, matched
+    fuzzily ('Close', 'Adj Close', 'aapl_close', 'AAPL Adj Close', ...; adjusted close
+    preferred). Raises KeyError without a close column.
+    """
+    return dict(_roles(tuple(columns)))
+
+
+# the layouts yfinance returns, resolved up front
+for _cols in (["Open", "High", "Low", "Close", "Volume"], ["Open", "High", "Low", "Close", "Adj Close", "Volume"],
+              ["Close", "High", "Low", "Open", "Volume"], ["Adj Close", "Close", "High", "Low", "Open", "Volume"]):
+    _flat_layout(tuple(_cols), None)
+    _roles(tuple(_cols))
@@ -0,0 +1,169 @@
+# core/research/panel.py
+"""
+Wide date x ticker price panels backed by memory-mapped .npy files.
+
+    data/cache/panels/<key>/
+        dates.npy          int64 ns, shared trading-day axis (union of the tickers' sessions)
+        tickers.json       column order; ticker -> column index
+        <Field>.npy        float64 (n_dates, n_tickers), Fortran order, NaN where no bar
+
+Fortran order keeps each ticker's series contiguous, so a ticker column (and any
+date range of it) is a zero-copy view, as is a date range of the whole panel or
+of a contiguous run of tickers. Arbitrary ticker subsets are gathered with one copy.
+
+The key fingerprints tickers, window, fields and each ticker's cache content hash,
+so a panel is built once per price update and re-opened for free afterwards.
+"""
+from __future__ import annotations
+import os, json, hashlib, shutil, uuid
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .cache import CACHE_DIR, read_meta, read_prices
+from .marketdata import DEFAULT_START, refresh_prices
+from .ohlcv import OHLCV_FIELDS
+
+PANEL_DIR = os.path.join(CACHE_DIR, "panels")
+PANEL_FIELDS = ["High", "Low", "Close", "Volume"]
+# Most recently used panels kept on disk
+PANEL_KEEP = int(os.getenv("PANEL_KEEP", 8))
+
+
+class PricePanel:
+    """Read-only view over a panel directory; arrays are opened lazily with mmap_mode='r'."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.dates = pd.DatetimeIndex(np.load(os.path.join(path, "dates.npy")).view("datetime64[ns]"))
+        with open(os.path.join(path, "tickers.json")) as f:
+            self.tickers: List[str] = json.load(f)
+        self.col: Dict[str, int] = {t: j for j, t in enumerate(self.tickers)}
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @property
+    def fields(self) -> List[str]:
+        """Stored fields in canonical OHLCV order."""
+        have = {f[:-4] for f in os.listdir(self.path) if f.endswith(".npy") and f != "dates.npy"}
+        return [f for f in OHLCV_FIELDS if f in have]
+
+    def array(self, field: str) -> np.ndarray:
+        """Full (n_dates, n_tickers) memmap for one field."""
+        if field not in self._arrays:
+            self._arrays[field] = np.load(os.path.join(self.path, f"{field}.npy"), mmap_mode="r")
+        return self._arrays[field]
+
+    def _rows(self, start=None, end=None) -> slice:
+        lo = 0 if start is None else int(self.dates.searchsorted(pd.Timestamp(start), side="left"))
+        hi = len(self.dates) if end is None else int(self.dates.searchsorted(pd.Timestamp(end), side="right"))
+        return slice(lo, hi)
+
+    def _cols(self, tickers: Sequence[str] | None):
+        if tickers is None:
+            return slice(None)
+        idx = [self.col[t] for t in tickers]
+        if idx and idx == list(range(idx[0], idx[0] + len(idx))):
+            return slice(idx[0], idx[0] + len(idx))  # contiguous run: stays a view
+        return idx
+
+    def view(self, field: str, tickers: Sequence[str] | None = None, start=None, end=None) -> np.ndarray:
+        """(dates, tickers) block; zero-copy unless `tickers` is a non-contiguous subset."""
+        return self.array(field)[self._rows(start, end), self._cols(tickers)]
+
+    def frame(self, field: str, tickers: Sequence[str] | None = None, start=None, end=None) -> pd.DataFrame:
+        rows = self._rows(start, end)
+        cols = list(tickers) if tickers is not None else self.tickers
+        return pd.DataFrame(self.view(field, tickers, start, end), index=self.dates[rows], columns=cols, copy=False)
+
+    def log_returns(self, tickers: Sequence[str] | None = None, field: str = "Close") -> np.ndarray:
+        """
+        Daily log returns per ticker, each taken over that ticker's own previous bar
+        (as np.log(px).diff() on its own rows); NaN where the ticker has no bar.
+        """
+        lp = np.log(np.asarray(self.view(field, tickers), dtype=float))
+        prev = pd.DataFrame(lp).ffill().shift(1).to_numpy()
+        return lp - prev
+
+    def ohlcv(self, ticker: str, start=None, end=None) -> pd.DataFrame:
+        """One ticker's bars as a flat OHLCV frame (only the dates it traded), for compute_alpha_factors."""
+        rows = self._rows(start, end)
+        j = self.col[ticker]
+        cols = {f: self.array(f)[rows, j] for f in self.fields}
+        df = pd.DataFrame(cols, index=self.dates[rows])
+        ref = "Close" if "Close" in df.columns else df.columns[0]
+        return df.loc[df[ref].notna()]
+
+
+def _panel_key(tickers: List[str], start, end, fields: List[str]) -> str:
+    parts = [str(start), str(end), ",".join(fields)]
+    for tk in tickers:
+        meta = read_meta(tk) or {}
+        parts.append(f"{tk}:{meta.get('content_hash', '')}")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:20]
+
+
+def _prune(keep: int = PANEL_KEEP) -> None:
+    if not os.path.isdir(PANEL_DIR):
+        return
+    dirs = [os.path.join(PANEL_DIR, d) for d in os.listdir(PANEL_DIR) if not d.endswith(".tmp")]
+    dirs.sort(key=os.path.getmtime, reverse=True)
+    for d in dirs[keep:]:
+        shutil.rmtree(d, ignore_errors=True)
+
+
+def _write_panel(path: str, frames: Dict[str, pd.DataFrame], tickers: List[str], fields: List[str]) -> None:
+    axis = pd.DatetimeIndex([])
+    for df in frames.values():
+        axis = axis.union(df.index)
+    axis = pd.DatetimeIndex(axis).as_unit("ns")
+
+    tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    os.makedirs(tmp)
+    try:
+        np.save(os.path.join(tmp, "dates.npy"), axis.asi8)
+        with open(os.path.join(tmp, "tickers.json"), "w") as f:
+            json.dump(tickers, f)
+        pos = {tk: axis.get_indexer(frames[tk].index) for tk in tickers}
+        for field in fields:
+            arr = np.lib.format.open_memmap(os.path.join(tmp, f"{field}.npy"), mode="w+", dtype=np.float64,
+                                            shape=(len(axis), len(tickers)), fortran_order=True)
+            arr[:] = np.nan
+            for j, tk in enumerate(tickers):
+                if field in frames[tk].columns:
+                    arr[pos[tk], j] = pd.to_numeric(frames[tk][field], errors="coerce").to_numpy(dtype=float)
+            arr.flush()
+            del arr
+        try:
+            os.rename(tmp, path)
+        except OSError:  # another process published the same panel first
+            pass
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def build_panel(
+    tickers: List[str],
+    start: str = DEFAULT_START,
+    end: str | None = None,
+    fields: List[str] | None = None,
+) -> PricePanel:
+    """
+    Panel for `tickers` over [start, end]. Stale tickers are refreshed first; tickers
+    without data are left out (check panel.tickers). Re-opens an existing panel when
+    none of the tickers' cached prices changed.
+    """
+    fields = list(fields or PANEL_FIELDS)
+    have = refresh_prices(list(tickers), start)
+    key = _panel_key(have, start, end, fields)
+    path = os.path.join(PANEL_DIR, key)
+    if not os.path.isdir(path):
+        os.makedirs(PANEL_DIR, exist_ok=True)
+        frames = {}
+        for tk in have:
+            df = read_prices(tk, start, end, fields)
+            frames[tk] = df if df is not None else pd.DataFrame(columns=fields, index=pd.DatetimeIndex([]))
+        _write_panel(path, frames, have, fields)
+        _prune()
+    os.utime(path)
+    return PricePanel(path)
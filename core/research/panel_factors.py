@@ -0,0 +1,272 @@
+# core/research/panel_factors.py
+"""
+compute_alpha_factors for a whole universe at once.
+
+Takes (dates x tickers) arrays of close/high/low/volume, e.g. PricePanel views,
+and computes every factor family from factors.py with column-wise NumPy operations:
+each rolling statistic is one pass over a block of tickers instead of one pandas
+pipeline (~40 rolling calls) per ticker. Means, stds, covs and corrs come from
+shared prefix sums (rolling.py), built once per series for all windows. Tickers
+are processed PANEL_BLOCK columns at a time to bound the temporaries.
+
+Each ticker is treated as its own bar sequence, as in a per-ticker frame. Dates on
+which it has no close (not listed yet, halted) are skipped rather than counted as
+bars, so shifts and windows span the same bars compute_alpha_factors would see.
+Results match compute_alpha_factors column for column, up to floating-point noise,
+and are NaN on those no-bar dates.
+"""
+from __future__ import annotations
+from typing import Dict, List, Sequence
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from .rolling import ROLL_CHUNK, RollingMoments, RollingPair
+
+PANEL_BLOCK = int(os.getenv("PANEL_BLOCK", 256))
+MR_WINDOWS = (5, 10, 20, 50, 60)
+TARGET_HORIZONS = (1, 3, 5, 10, 20)
+LABEL_HORIZONS = (1, 5, 20)
+
+
+# ---------------------------
+# Column-wise window kernels (axis 0 = dates), with the per-ticker semantics
+# (NaN anywhere in a window -> NaN). Mean/std/cov/corr use RollingMoments /
+# RollingPair; skew and kurt run through pandas' wide-frame rolling, chunk by chunk.
+# ---------------------------
+def _roll_skew_kurt(a: np.ndarray, w: int):
+    # restarted every ROLL_CHUNK rows (after w - 1 rows of warm-up), as the prefix sums
+    # are: a row's value then depends only on its own chunk and the one before, so a
+    # slice starting on a chunk boundary reproduces it exactly (see backfill.py)
+    skew = np.full(a.shape, np.nan, order="F")
+    kurt = np.full(a.shape, np.nan, order="F")
+    for lo in range(0, len(a), ROLL_CHUNK):
+        s, hi = max(0, lo - w + 1), lo + ROLL_CHUNK
+        r = pd.DataFrame(a[s:hi], copy=False).rolling(w)
+        skew[lo:hi] = r.skew().to_numpy()[lo - s:]
+        kurt[lo:hi] = r.kurt().to_numpy()[lo - s:]
+    return skew, kurt
+
+
+def _shift(a: np.ndarray, n: int) -> np.ndarray:
+    """pandas .shift(n) along dates (n < 0 leads)."""
+    out = np.full(a.shape, np.nan, order="F")
+    if n > 0:
+        out[n:] = a[:-n]
+    elif n < 0:
+        out[:n] = a[-n:]
+    else:
+        out[:] = a
+    return out
+
+
+def _pct_change(a: np.ndarray, n: int) -> np.ndarray:
+    return a / _shift(a, n) - 1
+
+
+# ---------------------------
+# Own-bar alignment
+# ---------------------------
+def _compact_order(close: np.ndarray) -> np.ndarray | None:
+    """Row order moving each ticker's bars to the top (stable), or None when no ticker has gaps."""
+    missing = np.isnan(close)
+    if not missing.any():
+        return None
+    return np.argsort(missing, axis=0, kind="stable")
+
+
+def _as_panel(x, shape) -> np.ndarray | None:
+    if x is None:
+        return None
+    x = np.asarray(x, dtype=float)
+    if x.ndim == 1:
+        x = x[:, None]
+    return np.asfortranarray(np.broadcast_to(x, shape), dtype=float)
+
+
+# ---------------------------
+# Factor engine
+# ---------------------------
+def compute_alpha_factors_panel(
+    close: np.ndarray,
+    high: np.ndarray | None = None,
+    low: np.ndarray | None = None,
+    volume: np.ndarray | None = None,
+    spy: np.ndarray | None = None,
+    vix: np.ndarray | None = None,
+    sector: np.ndarray | None = None,
+    compact: bool = False,
+) -> Dict[str, np.ndarray]:
+    """
+    {column: (n_dates, n_tickers) float array} for every derived column of
+    compute_alpha_factors (base returns, factors, targets, labels), in its order.
+    spy/vix/sector are close series already aligned to the date axis (forward-filled),
+    either 1-D (shared) or 2-D (per ticker). y_up_* are 0/1 floats, NaN where no bar.
+    `compact` returns float32 arrays; blocks are still computed in float64.
+    """
+    close = np.asfortranarray(close, dtype=float)
+    shape = close.shape
+    inputs = {"close": close, "high": _as_panel(high, shape), "low": _as_panel(low, shape),
+              "volume": _as_panel(volume, shape), "spy": _as_panel(spy, shape),
+              "vix": _as_panel(vix, shape), "sector": _as_panel(sector, shape)}
+
+    out: Dict[str, np.ndarray] = {}
+    for lo in range(0, shape[1], max(PANEL_BLOCK, 1)):
+        cols = slice(lo, lo + max(PANEL_BLOCK, 1))
+        part = _factor_block({k: (None if v is None else v[:, cols]) for k, v in inputs.items()})
+        for name, arr in part.items():
+            if name not in out:
+                out[name] = np.empty(shape, dtype=np.float32 if compact else float, order="F")
+            out[name][:, cols] = arr
+    return out
+
+
+def _factor_block(inputs: Dict[str, np.ndarray | None]) -> Dict[str, np.ndarray]:
+    """_factor_columns for one block of tickers, on each ticker's own bars."""
+    close = inputs["close"]
+    order = _compact_order(close)
+    if order is not None:
+        # the other inputs' no-bar values would land in the padding below each ticker's
+        # bars; blank them so a ticker's last chunk holds its own bars only
+        no_bar = np.isnan(close)
+        inputs = {k: (None if v is None else
+                      np.asfortranarray(np.take_along_axis(np.where(no_bar, np.nan, v), order, axis=0)))
+                  for k, v in inputs.items()}
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        out = _factor_columns(**inputs)
+
+    if order is not None:
+        for name, arr in out.items():
+            back = np.empty(close.shape, order="F")
+            np.put_along_axis(back, order, arr, axis=0)
+            back[no_bar] = np.nan
+            out[name] = back
+    return out
+
+
+def _factor_columns(close, high, low, volume, spy, vix, sector) -> Dict[str, np.ndarray]:
+    out: Dict[str, np.ndarray] = {}
+
+    # ---------------- Base columns ----------------
+    out["ret_1d"] = _pct_change(close, 1)
+    out["ret_5d"] = _pct_change(close, 5)
+    out["ret_20d"] = _pct_change(close, 20)
+    lr = np.asfortranarray(np.log(close) - _shift(np.log(close), 1))
+    out["log_ret_1d"] = lr
+    if high is not None and low is not None:
+        rng = (high - low) / (_shift(close, 1) + 1e-12)
+        out["rng"] = rng
+        out["vwap_proxy"] = (high + low + close) / 3.0
+    else:
+        rng = np.full(close.shape, np.nan, order="F")
+        out["rng"] = rng
+        out["vwap_proxy"] = close.copy(order="F")
+
+    # ---------------- Momentum ----------------
+    for k in (3, 5, 10, 20, 60, 63):
+        out[f"mom_{k}"] = (close / _shift(close, k)) - 1
+
+    px_m = RollingMoments(close)
+    lr_m = RollingMoments(lr)
+
+    # ------------- Mean reversion -------------
+    for w in MR_WINDOWS:
+        ma = px_m.mean(w)
+        out[f"mr_z_{w}"] = px_m.zscore(w)
+        out[f"px_ma_{w}_dev"] = (close - ma) / (ma + 1e-12)
+
+    # -------- Bollinger bandwidth (20) --------
+    m = px_m.mean(20)
+    s = px_m.std(20)
+    out["boll_bw_20"] = ((m + 2 * s) - (m - 2 * s)) / (m + 1e-12)
+
+    # --------------- Volatility ----------------
+    for w in (5, 10, 20, 60):
+        out[f"vol_{w}"] = lr_m.std(w)
+    out["rng_5"] = RollingMoments(rng).mean(5)
+    if high is not None and low is not None:
+        hl = np.asfortranarray((np.log(high) - np.log(low)) ** 2)
+        out["parkinson_20"] = np.sqrt((1.0 / (4 * np.log(2))) * RollingMoments(hl).mean(20))
+    else:
+        out["parkinson_20"] = np.full(close.shape, np.nan, order="F")
+
+    # ----------------- Volume ------------------
+    vol = volume if volume is not None else np.full(close.shape, np.nan, order="F")
+    vol_m = RollingMoments(vol)
+    out["vol_chg_1d"] = _pct_change(vol, 1)
+    out["vol_z_20"] = vol_m.zscore(20)
+    out["vol_spike_20"] = (vol / (vol_m.mean(20) + 1e-12)) - 1
+    out["abn_vol_60"] = (vol / (vol_m.mean(60) + 1e-12)) - 1
+
+    # ------------- Cross-asset corr ------------
+    def _lr(x):
+        return np.asfortranarray(np.log(x) - _shift(np.log(x), 1))
+
+    if spy is not None:
+        spy_lr = _lr(spy)
+        pair = RollingPair(lr, spy_lr)
+        out["corr_spy_20"] = pair.corr(20)
+        out["corr_spy_60"] = pair.corr(60)
+        out["beta_spy_60"] = pair.cov(60) / (RollingMoments(spy_lr).var(60) + 1e-12)
+    if vix is not None:
+        vix_lr = _lr(vix)
+        pair = RollingPair(lr, vix_lr)
+        out["corr_vix_20"] = pair.corr(20)
+        out["corr_vix_60"] = pair.corr(60)
+    if sector is not None:
+        sector_lr = _lr(sector)
+        pair = RollingPair(lr, sector_lr)
+        out["corr_sector_20"] = pair.corr(20)
+        out["corr_sector_60"] = pair.corr(60)
+
+    # -------- Higher-moment risk (20) ---------
+    out["ret_skew_20"], out["ret_kurt_20"] = _roll_skew_kurt(lr, 20)
+
+    # --------- Forward-looking targets --------
+    for h in TARGET_HORIZONS:
+        out[f"target_ret_{h}d"] = np.log(_shift(close, -h) / close)
+    bar = ~np.isnan(close)
+    for h in LABEL_HORIZONS:
+        y = (out[f"target_ret_{h}d"] > 0).astype(float)
+        y[~bar] = np.nan
+        out[f"y_up_{h}d"] = y
+    return out
+
+
+# ---------------------------
+# PricePanel front end
+# ---------------------------
+def _aligned(s: pd.Series | None, dates: pd.DatetimeIndex) -> np.ndarray | None:
+    if s is None:
+        return None
+    return pd.to_numeric(s, errors="coerce").reindex(dates).ffill().to_numpy(dtype=float)
+
+
+def panel_alpha_factors(
+    panel,
+    tickers: Sequence[str] | None = None,
+    spy: pd.Series | None = None,
+    vix: pd.Series | None = None,
+    columns: List[str] | None = None,
+    compact: bool = False,
+) -> Dict[str, pd.DataFrame]:
+    """
+    compute_alpha_factors_panel over a PricePanel (all tickers by default), as
+    {column: date x ticker DataFrame}; `columns` keeps only the named outputs and
+    `compact` gives float32 frames.
+    """
+    fields = set(panel.fields)
+
+    def _get(field):
+        return panel.view(field, tickers) if field in fields else None
+
+    names = list(tickers) if tickers is not None else panel.tickers
+    out = compute_alpha_factors_panel(
+        _get("Close"), high=_get("High"), low=_get("Low"), volume=_get("Volume"),
+        spy=_aligned(spy, panel.dates), vix=_aligned(vix, panel.dates), compact=compact,
+    )
+    keep = out if columns is None else {c: out[c] for c in columns if c in out}
+    return {c: pd.DataFrame(a, index=panel.dates, columns=names, copy=False) for c, a in keep.items()}
@@ -0,0 +1,179 @@
+# core/research/pca.py
+"""
+PCA of standardized factor columns without refitting from scratch.
+
+PCA of z-scored columns is the eigen-decomposition of their correlation matrix, and
+that only needs the sufficient statistics of the sample: row count, column means and
+centered cross-products (PCAStats). The statistics of a longer sample are those of
+the old rows merged with the new ones (Chan et al.'s pairwise update), so a factor
+table that only gained bars costs O(new rows x features^2) plus a features^2 eigh,
+and the result matches a full refit to rounding.
+
+  PCAStats.from_array(X) / .update(X_new)    mergeable statistics of a clean matrix
+  PrefixStats                                 per-key statistics of the settled rows of a table
+  fit_covariance(stats, k)                    explained variance ratio + components
+  rolling_explained_variance(X, window, k)    the same ratios over trailing windows
+
+Wide universes (more features than PCA_COV_MAX_FEATURES) go through sklearn's
+randomized SVD instead; see factors.compute_pca_diagnostics.
+"""
+from __future__ import annotations
+import hashlib, os, threading
+from collections import OrderedDict
+from typing import Hashable, Tuple
+
+import numpy as np
+
+PCA_SOLVER = os.getenv("PCA_SOLVER", "auto")  # auto | covariance | randomized | full
+PCA_COV_MAX_FEATURES = int(os.getenv("PCA_COV_MAX_FEATURES", 500))
+
+
+def choose_solver(solver: str | None, n_features: int) -> str:
+    solver = solver or PCA_SOLVER
+    if solver == "auto":
+        return "covariance" if n_features <= PCA_COV_MAX_FEATURES else "randomized"
+    if solver not in ("covariance", "randomized", "full"):
+        raise ValueError(f"Unknown PCA solver '{solver}'.")
+    return solver
+
+
+def _scale(var: np.ndarray, mean: np.ndarray, n: int) -> np.ndarray:
+    """Column std, with constant columns scaled by 1 as StandardScaler does (they z-score to 0)."""
+    eps = np.finfo(float).eps
+    var = np.maximum(var, 0.0)
+    constant = var <= n * eps * var + (n * mean * eps) ** 2
+    return np.where(constant, 1.0, np.sqrt(var))
+
+
+def flip_signs(components: np.ndarray) -> np.ndarray:
+    """sklearn's convention: the largest-magnitude loading of each component is positive."""
+    rows = np.arange(len(components))
+    signs = np.sign(components[rows, np.argmax(np.abs(components), axis=1)])
+    return components * np.where(signs == 0, 1.0, signs)[:, None]
+
+
+class PCAStats:
+    """Row count, column means and centered cross-products (m2 = (X - mean).T @ (X - mean))."""
+
+    def __init__(self, n: int, mean: np.ndarray, m2: np.ndarray):
+        self.n, self.mean, self.m2 = n, mean, m2
+
+    @classmethod
+    def from_array(cls, X: np.ndarray) -> "PCAStats":
+        X = np.asarray(X, dtype=float)
+        if not len(X):
+            return cls(0, np.zeros(X.shape[1]), np.zeros((X.shape[1], X.shape[1])))
+        mean = X.mean(axis=0)
+        d = X - mean
+        return cls(len(X), mean, d.T @ d)
+
+    def update(self, X: np.ndarray) -> "PCAStats":
+        """Statistics of the old rows followed by `X` (self is left unchanged)."""
+        other = PCAStats.from_array(X)
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            return other
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        mean = self.mean + delta * (other.n / n)
+        m2 = self.m2 + other.m2 + np.outer(delta, delta) * (self.n * other.n / n)
+        return PCAStats(n, mean, m2)
+
+    def correlation(self) -> np.ndarray:
+        """Covariance of the z-scored columns (constant columns contribute zeros)."""
+        cov = self.m2 / max(self.n, 1)
+        s = _scale(np.diag(cov), self.mean, self.n)
+        return cov / np.outer(s, s)
+
+
+def fit_covariance(stats: PCAStats, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(explained_variance_ratio (k,), components (k, features)) from the correlation eigh."""
+    corr = stats.correlation()
+    vals, vecs = np.linalg.eigh(corr)
+    order = np.argsort(vals)[::-1][:k]
+    vals = np.maximum(vals[order], 0.0)
+    total = np.trace(corr)
+    ratio = vals / total if total > 0 else np.zeros_like(vals)
+    return ratio, flip_signs(vecs[:, order].T)
+
+
+def rolling_explained_variance(X: np.ndarray, window: int, k: int, step: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (window end rows, (windows x k) explained variance ratios) of PCA on the z-scored
+    columns of every `step`-th trailing `window` of X. Each window is z-scored on its own
+    rows. The window sums slide by adding the rows that enter and subtracting the rows
+    that leave; they are re-summed exactly every `window` rows. All window spectra then
+    come from one batched eigvalsh.
+    """
+    X = np.asarray(X, dtype=float)
+    n, p = X.shape
+    step = max(1, int(step))
+    if window < 2 or n < window or p == 0:
+        return np.zeros(0, dtype=int), np.zeros((0, min(k, p)))
+    # globally z-scored first, so the sliding sums stay O(window) in magnitude
+    mu = X.mean(axis=0)
+    Z = (X - mu) / _scale(X.var(axis=0), mu, n)
+    ends = np.arange(window - 1, n, step)
+    s = np.empty((len(ends), p))
+    g = np.empty((len(ends), p, p))
+    last_exact = None
+    for j, e in enumerate(ends):
+        lo = e - window + 1
+        if last_exact is None or e - last_exact >= window:
+            w = Z[lo:e + 1]
+            cur_s, cur_g, last_exact = w.sum(axis=0), w.T @ w, e
+        else:
+            prev = ends[j - 1]
+            add, drop = Z[prev + 1:e + 1], Z[prev - window + 1:lo]
+            cur_s = cur_s + add.sum(axis=0) - drop.sum(axis=0)
+            cur_g = cur_g + add.T @ add - drop.T @ drop
+        s[j], g[j] = cur_s, cur_g
+    mean = s / window
+    cov = g / window - mean[:, :, None] * mean[:, None, :]
+    sd = np.sqrt(np.maximum(np.diagonal(cov, axis1=1, axis2=2), 0.0))
+    sd = np.where(sd < 1e-8, np.inf, sd)  # constant within the window: z-scores to 0
+    corr = cov / (sd[:, :, None] * sd[:, None, :])
+    vals = np.linalg.eigvalsh(corr)[:, ::-1][:, :k]
+    total = np.trace(corr, axis1=1, axis2=2)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(total > 0, np.maximum(vals, 0.0) / total, 0.0)
+    return ends, ratio
+
+
+class PrefixStats:
+    """
+    PCAStats of the settled rows of a growing matrix, per key (e.g. ticker + features).
+    The last `tail` rows of a matrix are not settled: an extended factor table recomputes
+    them. stats(key, X) reuses the stored prefix when X still starts with exactly those
+    rows (checked by digest), and merges only the rows after it.
+    """
+
+    def __init__(self, tail: int, max_entries: int = 64):
+        self.tail, self.max_entries = tail, max_entries
+        self._lock = threading.Lock()
+        self._prefix: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (rows, digest, PCAStats)
+        self.merged = 0  # calls served by extending a stored prefix
+
+    @staticmethod
+    def _digest(X: np.ndarray) -> str:
+        return hashlib.sha1(np.ascontiguousarray(X).tobytes()).hexdigest()
+
+    def stats(self, key: Hashable, X: np.ndarray) -> PCAStats:
+        X = np.asarray(X, dtype=float)
+        with self._lock:
+            hit = self._prefix.get(key)
+        rows, base = 0, None
+        if hit is not None and hit[0] <= len(X) and hit[2].mean.shape[0] == X.shape[1] \
+                and self._digest(X[:hit[0]]) == hit[1]:
+            rows, base = hit[0], hit[2]
+            self.merged += 1
+        settled = max(rows, len(X) - self.tail)
+        prefix = base.update(X[rows:settled]) if base is not None else PCAStats.from_array(X[:settled])
+        digest = hit[1] if base is not None and settled == rows else self._digest(X[:settled])
+        with self._lock:
+            self._prefix[key] = (settled, digest, prefix)
+            self._prefix.move_to_end(key)
+            while len(self._prefix) > self.max_entries:
+                self._prefix.popitem(last=False)
+        return prefix.update(X[settled:])
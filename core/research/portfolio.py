@@ -1,94 +1,16 @@
 # core/research/portfolio.py
 import numpy as np
 import pandas as pd
-import yfinance as yf
 from typing import List, Dict, Optional, Literal
 
-from .factors import compute_alpha_factors
+from .factors import FACTORS, compute_alpha_factors
 from .experiment import run_walkforward_xgb
+from .marketdata import get_ohlcv_many, get_close
+from .panel import build_panel
+from .panel_factors import panel_alpha_factors
 
 Rebalance = Literal["daily", "weekly", "monthly"]
 
-# ---- local helpers (duplicated on purpose to avoid circular imports) ----
-def _flatten_ohlcv(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
-    if df is None or df.empty:
-        return df
-    out = df.copy()
-    if isinstance(out.columns, pd.MultiIndex):
-        extracted = None
-        for lvl in range(out.columns.nlevels):
-            vals = out.columns.get_level_values(lvl)
-            if ticker in vals:
-                try:
-                    extracted = out.xs(ticker, axis=1, level=lvl, drop_level=True)
-                    break
-                except Exception:
-                    pass
-        out = extracted if extracted is not None else out
-        if isinstance(out.columns, pd.MultiIndex):
-            try:
-                level0 = out.columns.get_level_values(0)
-                if set(level0).intersection({"Open","High","Low","Close","Adj Close","Volume"}):
-                    out.columns = level0
-                else:
-                    out.columns = ["|".join(map(str, tpl)) for tpl in out.columns]
-            except Exception:
-                out.columns = ["|".join(map(str, tpl)) for tpl in out.columns]
-    out = out.rename(columns=lambda c: str(c).strip().title())
-    keep = [c for c in ["Open","High","Low","Close","Adj Close","Volume"] if c in out.columns]
-    if keep:
-        out = out[keep]
-    out.index = pd.to_datetime(out.index).tz_localize(None)
-    return out
-
-def _get_close_series(ticker: str, start: str) -> pd.Series:
-    df = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if df is None or df.empty:
-        raise RuntimeError(f"No data for {ticker}")
-    if isinstance(df.columns, pd.MultiIndex):
-        try:
-            s = df.xs("Close", axis=1, level=0, drop_level=False)
-            if isinstance(s, pd.DataFrame):
-                s = s.iloc[:, 0]
-        except Exception:
-            s = None
-        if s is None:
-            try:
-                s = df.xs("Adj Close", axis=1, level=0, drop_level=False)
-                if isinstance(s, pd.DataFrame):
-                    s = s.iloc[:, 0]
-            except Exception:
-                flat = df.copy()
-                flat.columns = ["|".join(map(str, c)) for c in flat.columns]
-                candidates = [c for c in flat.columns if c.lower().startswith("close")]
-                if not candidates:
-                    candidates = [c for c in flat.columns if "adj close" in c.lower()]
-                if not candidates:
-                    raise KeyError("No Close/Adj Close column found (multiindex).")
-                s = flat[candidates[0]]
-    else:
-        col = "Close" if "Close" in df.columns else ("Adj Close" if "Adj Close" in df.columns else None)
-        if col is None:
-            raise KeyError("No Close/Adj Close column found.")
-        s = df[col]
-    s = pd.to_numeric(s, errors="coerce").dropna()
-    s.index = pd.to_datetime(s.index).tz_localize(None)
-    s.name = ticker
-    return s
-
-def _price_col(df: pd.DataFrame) -> str:
-    if "Adj Close" in df.columns:
-        return "Adj Close"
-    if "Close" in df.columns:
-        return "Close"
-    if "Adj close" in df.columns:
-        return "Adj close"
-    if "close" in df.columns:
-        return "close"
-    raise KeyError("No Close/Adj Close column in price DataFrame.")
-
-# ------------------------------------------------------------------------
-
 def _rebalance_dates(ix: pd.DatetimeIndex, rebalance: Rebalance) -> pd.DatetimeIndex:
     if rebalance == "daily":
         return ix
@@ -146,39 +68,33 @@ def _weights_mean_variance(returns: pd.DataFrame, lookback: int = 252, ridge: fl
     w = w / w.sum()
     return pd.Series(w, index=sub.columns, dtype="float")
 
-def _signal_series_for_ticker(ticker: str, start: str, signal_col: str) -> pd.DataFrame:
+def _signal_for_ticker(
+    ticker: str,
+    px: pd.DataFrame,
+    signal_col: str,
+    spy: pd.Series | None = None,
+    vix: pd.Series | None = None,
+) -> pd.Series:
     """
-    Returns a DataFrame with at least [signal_col, 'log_ret'] indexed by date.
-    If signal_col starts with 'prob_up', we train walk-forward XGB to get predictions.
-    Otherwise we compute alpha factors and pull the requested factor column.
+    The requested signal for one ticker's OHLCV, indexed by date.
+    If signal_col starts with 'prob_up', we train walk-forward XGB to get predictions
+    (spy/vix feed the cross-asset factors). Otherwise we compute alpha factors and
+    pull the requested factor column.
     """
-    # download OHLCV
-    px_raw = yf.download(ticker, start=start, auto_adjust=True, progress=False)
-    if px_raw is None or px_raw.empty:
-        raise RuntimeError(f"No data for {ticker}")
-    px = _flatten_ohlcv(px_raw, ticker)
-    pcol = _price_col(px)
-
     if signal_col.startswith("prob_up"):
         # derive horizon from name, e.g., prob_up_1d / prob_up_5d ...
         horizon = signal_col.replace("prob_up_", "")
-        # also get SPY/VIX for cross-asset factors used in model
-        spy = _get_close_series("SPY", start)
-        vix = _get_close_series("^VIX", start)
         res = run_walkforward_xgb(px, spy=spy, vix=vix, sector=None, horizon=horizon)
         sig = res.get("predictions", pd.DataFrame()).copy()
         if isinstance(sig, pd.DataFrame) and not sig.empty:
             sig = sig.rename(columns={sig.columns[0]: signal_col})
-    else:
-        df = compute_alpha_factors(px)
-        if signal_col not in df.columns:
-            raise KeyError(f"Signal '{signal_col}' not in factors for {ticker}.")
-        sig = df[[signal_col]]
-
-    # log returns
-    log_ret = np.log(px[pcol]).diff().rename("log_ret")
-    out = sig.join(log_ret, how="left")
-    return out
+            return sig[signal_col]
+        return pd.Series(dtype="float", name=signal_col)
+    # a factor signal only needs its own dependency closure
+    df = compute_alpha_factors(px, columns=[signal_col] if signal_col in FACTORS.outputs() else None)
+    if signal_col not in df.columns:
+        raise KeyError(f"Signal '{signal_col}' not in factors for {ticker}.")
+    return df[signal_col]
 
 def _weights_signal_weighted(sig: pd.Series) -> pd.Series:
     """Long-only weights ~ normalized positive signal; fall back to equal if all <=0."""
@@ -227,24 +143,38 @@ def backtest_portfolio(
     if not tickers:
         raise ValueError("tickers must be a non-empty list.")
 
-    # --- gather per-ticker signal + log_ret ---
-    frames = {}
-    for t in tickers:
-        df = _signal_series_for_ticker(t, start=start, signal_col=signal)
-        frames[t] = df
+    # --- date x ticker price panel (memory-mapped; refreshes stale tickers in grouped downloads) ---
+    needs_xasset = signal.startswith("prob_up")
+    get_ohlcv_many([benchmark] + (["SPY", "^VIX"] if needs_xasset else []), start, columns=["Close"])
+    panel = build_panel(list(tickers), start)
+    missing = [t for t in tickers if t not in panel.col]
+    if missing:
+        raise RuntimeError(f"No data for {missing[0]}")
+    spy = get_close("SPY", start) if needs_xasset else None
+    vix = get_close("^VIX", start) if needs_xasset else None
+
+    if needs_xasset:
+        # --- per-ticker model signals scattered straight into the panel's date axis ---
+        sig = np.full((len(panel.dates), len(tickers)), np.nan)
+        present = np.zeros(len(panel.dates), dtype=bool)  # dates on which any ticker has a signal row
+        for j, t in enumerate(tickers):
+            s = _signal_for_ticker(t, panel.ohlcv(t), signal, spy, vix)
+            pos = panel.dates.get_indexer(s.index)
+            ok = pos >= 0
+            sig[pos[ok], j] = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float)[ok]
+            present[pos[ok]] = True
+    else:
+        # --- factor signals for the whole universe in one vectorized pass ---
+        fac = panel_alpha_factors(panel, tickers, columns=[signal])
+        if signal not in fac:
+            raise KeyError(f"Signal '{signal}' not in factors for {tickers[0]}.")
+        sig = fac[signal].to_numpy()
+        present = ~np.isnan(panel.view("Close", tickers)).all(axis=1)  # dates on which any ticker has a bar
 
     # aligned panel
-    all_ix = None
-    for df in frames.values():
-        all_ix = df.index if all_ix is None else all_ix.union(df.index)
-    all_ix = pd.DatetimeIndex(sorted(all_ix))
-
-    sig_mat = pd.DataFrame(index=all_ix, columns=tickers, dtype="float")
-    ret_mat = pd.DataFrame(index=all_ix, columns=tickers, dtype="float")
-    for t in tickers:
-        s = frames[t].reindex(all_ix)
-        sig_mat[t] = s[signal]
-        ret_mat[t] = s["log_ret"]
+    all_ix = panel.dates[present]
+    sig_mat = pd.DataFrame(sig[present], index=all_ix, columns=tickers)
+    ret_mat = pd.DataFrame(panel.log_returns(tickers)[present], index=all_ix, columns=tickers)
 
     # ---------------- rebalance schedule ----------------
     rb_dates = _rebalance_dates(all_ix, rebalance)
@@ -308,43 +238,18 @@ def backtest_portfolio(
     equity = daily_pnl.cumsum().apply(np.exp)
 
     # ---- optional benchmark (for IR/β cards in /api/report) ----
+    # One cached series serves both the benchmark equity and the per-day bench returns.
     try:
-        bench_df = yf.download(
-            benchmark,
-            start=str(all_ix.min().date()),
-            interval="1d",
-            auto_adjust=True,
-            progress=False
-        )
-
-        if isinstance(bench_df, pd.DataFrame):
-            bp = bench_df["Adj Close"] if "Adj Close" in bench_df.columns else bench_df["Close"]
-            bp = pd.Series(bp).tz_localize(None)
-            bp = bp.reindex(all_ix).ffill()
-            bench_logret = np.log(bp / bp.shift(1))
-            bench_equity  = bench_logret.cumsum().apply(np.exp)
-        else:
-            bench_logret = pd.Series(0.0, index=all_ix, dtype=float)
-            bench_equity = pd.Series(1.0, index=all_ix, dtype=float)
-    except Exception:
-        bench_logret = pd.Series(0.0, index=all_ix, dtype=float)
-        bench_equity = pd.Series(1.0, index=all_ix, dtype=float)
-
-    bench_logret = bench_logret.replace([np.inf, -np.inf], np.nan).fillna(0.0)
-    bench_equity = bench_equity.replace([np.inf, -np.inf], np.nan).fillna(method="ffill").fillna(1.0)
-
-    # /api/report expects "daily" as records with ret & bench_ret
-    try:
-        bench_px = yf.download(benchmark, start=start, interval="1d",
-                            auto_adjust=True, progress=False)["Adj Close"]
-        bench_px = pd.Series(bench_px).tz_localize(None)
-        bench_px = bench_px.reindex(all_ix).ffill()
+        bench_px = get_close(benchmark, start).reindex(all_ix).ffill()
         bench_ret = np.log(bench_px / bench_px.shift(1)).fillna(0.0)   # log returns to match strategy
         bench_equity = bench_ret.cumsum().apply(np.exp)
     except Exception:
         bench_ret = pd.Series(0.0, index=all_ix, dtype=float)
         bench_equity = pd.Series(1.0, index=all_ix, dtype=float)
 
+    bench_ret = bench_ret.replace([np.inf, -np.inf], np.nan).fillna(0.0)
+    bench_equity = bench_equity.replace([np.inf, -np.inf], np.nan).ffill().fillna(1.0)
+
     # /api/report expects "daily" as records with ret & bench_ret
     daily_df = pd.DataFrame({"ret": daily_pnl, "bench_ret": bench_ret}).fillna(0.0)
 
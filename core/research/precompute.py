@@ -0,0 +1,319 @@
+# core/research/precompute.py
+"""
+Fingerprinted caches for the per-ticker artefacts most endpoints start from:
+
+  factor_table(ticker, start)              compute_alpha_factors(px, spy, vix)
+  factor_columns(ticker, start, cols)      the same, restricted to `cols`
+  walkforward_result(ticker, start, h)     default run_walkforward_xgb for horizon h
+  pca_diagnostics(ticker, start, ...)      compute_pca_diagnostics of the factor table
+
+Keys combine the request with the content hash of every input price series
+(cache sidecars) and a hash of the code that produced the artefact (the factor
+code for factor tables, the whole modelling stack for results), so a hit is always what a
+fresh computation would return and editing the code invalidates old entries.
+Both sit behind an in-process LRU and are persisted - factor tables as Parquet in
+data/cache/factors/, results pickled in data/cache/models/ - so they survive
+restarts and can be produced ahead of time (see warmup.py). Concurrent identical
+requests compute once.
+"""
+from __future__ import annotations
+import os, glob, json, hashlib, pickle
+from functools import lru_cache, partial
+from typing import Dict
+
+import pandas as pd
+
+from .cache import CACHE_DIR, read_meta, read_prices, _content_hash
+from .store import atomic_write, safe_name, _ARROW_OK
+from .marketdata import get_ohlcv, get_close, refresh_prices
+from .singleflight import SingleFlight
+from .factors import (FACTORS, FACTOR_COMPACT, FACTOR_LOOKBACK, TARGET_HORIZON, compact_factors,
+                      compute_alpha_factors, compute_pca_diagnostics, update_alpha_factors)
+from .experiment import run_walkforward_xgb
+from .models import feature_columns
+from .pca import PCA_SOLVER, PrefixStats
+
+MODEL_CACHE_DIR = os.path.join(CACHE_DIR, "models")
+MODEL_CACHE_KEEP = int(os.getenv("MODEL_CACHE_KEEP", 200))
+FACTOR_STORE_DIR = os.path.join(CACHE_DIR, "factors")
+FACTOR_STORE_KEEP = int(os.getenv("FACTOR_STORE_KEEP", 500))
+REFERENCE = ("SPY", "^VIX")  # cross-asset inputs of the factor table
+
+_factors = SingleFlight(ttl=None, max_entries=int(os.getenv("FACTOR_MEMO_MAX", 64)))
+_results = SingleFlight(ttl=None, max_entries=int(os.getenv("MODEL_MEMO_MAX", 64)))
+_pca = SingleFlight(ttl=None, max_entries=int(os.getenv("PCA_MEMO_MAX", 64)))
+# rows an extended factor table may rewrite (update_alpha_factors redoes the target horizon)
+_pca_prefix = PrefixStats(tail=TARGET_HORIZON + FACTOR_LOOKBACK, max_entries=int(os.getenv("PCA_MEMO_MAX", 64)))
+
+_FACTOR_FILES = ("factors.py", "registry.py", "rolling.py")
+_CODE_FILES = ("factors.py", "registry.py", "rolling.py", "models.py", "experiment.py", "walkforward.py", "backtest.py")
+
+
+def _hash_files(names) -> str:
+    h = hashlib.sha1()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in names:
+        try:
+            with open(os.path.join(here, name), "rb") as f:
+                h.update(f.read())
+        except OSError:
+            h.update(name.encode())
+    return h.hexdigest()[:12]
+
+
+@lru_cache(maxsize=None)
+def factor_version() -> str:
+    """Hash of the factor code (factors.py and the registry/rolling kernels it runs on);
+    compact-dtype tables (FACTOR_COMPACT) are versioned apart from float64 ones."""
+    return _hash_files(_FACTOR_FILES) + ("-c" if FACTOR_COMPACT else "")
+
+
+@lru_cache(maxsize=None)
+def code_version() -> str:
+    """Hash of the modules that shape model results (and of the factor dtype mode)."""
+    return _hash_files(_CODE_FILES) + ("-c" if FACTOR_COMPACT else "")
+
+
+def _fingerprint(kind: str, ticker: str, start: str, version: str, *extra) -> str:
+    """Refresh the inputs (no-op when current), then hash request + input contents + code version."""
+    names = [ticker, *REFERENCE]
+    refresh_prices(names, start)
+    parts = [kind, ticker.upper(), str(start), *map(str, extra), version]
+    parts += [(read_meta(tk) or {}).get("content_hash", "") for tk in names]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:24]
+
+
+def _inputs(ticker: str, start: str, reference=None):
+    """Prices of `ticker` plus SPY/^VIX closes from `start`; `reference` = preloaded (spy, vix) to slice instead."""
+    px = get_ohlcv(ticker, start)
+    if px is None or px.empty:
+        raise RuntimeError(f"No data for {ticker}")
+    if reference is not None:
+        return (px, *(s.loc[pd.Timestamp(start):] for s in reference))
+    return px, get_close("SPY", start), get_close("^VIX", start)
+
+
+def _prune(pattern: str, keep: int, sidecar: str | None = None) -> None:
+    files = sorted(glob.glob(pattern), key=os.path.getmtime, reverse=True)
+    for f in files[keep:]:
+        for path in (f, os.path.splitext(f)[0] + sidecar if sidecar else None):
+            try:
+                if path:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+# ---------------------------
+# Factor tables
+# ---------------------------
+_FACTOR_EXT = "parquet" if _ARROW_OK else "pkl"
+
+
+def _factor_path(ticker: str, key: str) -> str:
+    return os.path.join(FACTOR_STORE_DIR, f"{safe_name(ticker.upper())}_{key}.{_FACTOR_EXT}")
+
+
+def _read_factors(path: str) -> pd.DataFrame | None:
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path) if _ARROW_OK else pd.read_pickle(path)
+    except Exception:
+        return None  # unreadable: recompute
+    os.utime(path)  # keeps recently used tables out of the prune
+    return df
+
+
+def _input_state(names, start: str, last) -> Dict[str, dict]:
+    """
+    What a factor table ending at `last` was built from: per input, the partition hashes
+    of the years before `last`'s year and a hash of that year's bars up to `last`.
+    """
+    last = pd.Timestamp(last)
+    first_year = pd.Timestamp(start).year
+    state = {}
+    for name in names:
+        parts = (read_meta(name) or {}).get("partitions", {})
+        years = {y: p["hash"] for y, p in parts.items() if first_year <= int(y) < last.year}
+        cur = read_prices(name, max(pd.Timestamp(start), pd.Timestamp(last.year, 1, 1)), last)
+        state[name] = {"years": years, "tail": _content_hash(cur) if cur is not None else ""}
+    return state
+
+
+def _save_factors(key: str, ticker: str, start: str, df: pd.DataFrame) -> None:
+    path = _factor_path(ticker, key)
+    os.makedirs(FACTOR_STORE_DIR, exist_ok=True)
+    atomic_write(path, df.to_parquet if _ARROW_OK else df.to_pickle)
+    if not df.empty:
+        last = df.index[-1].strftime("%Y-%m-%d")
+        info = {"ticker": ticker.upper(), "start": str(start), "version": factor_version(), "last": last,
+                "inputs": _input_state([ticker, *REFERENCE], start, last)}
+
+        def _dump(tmp: str) -> None:
+            with open(tmp, "w") as f:
+                json.dump(info, f)
+        atomic_write(os.path.splitext(path)[0] + ".json", _dump)
+    _prune(os.path.join(FACTOR_STORE_DIR, f"*.{_FACTOR_EXT}"), FACTOR_STORE_KEEP, sidecar=".json")
+
+
+def _extend_stored(ticker: str, start: str, reference=None) -> pd.DataFrame | None:
+    """
+    The newest stored table for (ticker, start, factor code) whose inputs are unchanged up
+    to its last row, extended with the bars appended since (update_alpha_factors), or None.
+    """
+    last_bar = (read_meta(ticker) or {}).get("last_bar")
+    if last_bar is None:
+        return None
+    best = None
+    for side in glob.glob(os.path.join(FACTOR_STORE_DIR, f"{safe_name(ticker.upper())}_*.json")):
+        try:
+            with open(side) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if info.get("start") != str(start) or info.get("version") != factor_version():
+            continue
+        if info["last"] < last_bar and (best is None or info["last"] > best[1]["last"]):
+            best = (side, info)
+    if best is None:
+        return None
+    side, info = best
+    if _input_state([ticker, *REFERENCE], start, info["last"]) != info["inputs"]:
+        return None  # history was revised (e.g. re-adjusted): recompute in full
+    prev = _read_factors(os.path.splitext(side)[0] + f".{_FACTOR_EXT}")
+    if prev is None or prev.empty:
+        return None
+    # a few spare bars so the cross-asset series forward-fill exactly as in a full run
+    ctx = prev.index[max(0, len(prev) - TARGET_HORIZON - FACTOR_LOOKBACK - 5)]
+    px, spy, vix = _inputs(ticker, ctx.strftime("%Y-%m-%d"), reference)
+    return update_alpha_factors(prev, px, spy=spy, vix=vix, sector=None)
+
+
+def _compute_factors(key: str, ticker: str, start: str, reference=None) -> pd.DataFrame:
+    df = _read_factors(_factor_path(ticker, key))
+    if df is not None:
+        return df
+    df = _extend_stored(ticker, start, reference)
+    if df is None:
+        px, spy, vix = _inputs(ticker, start, reference)
+        df = compute_alpha_factors(px, spy=spy, vix=vix, sector=None)
+    if FACTOR_COMPACT:
+        df = compact_factors(df)
+    _save_factors(key, ticker, start, df)
+    return df
+
+
+def factor_table(ticker: str, start: str, spy: pd.Series | None = None,
+                 vix: pd.Series | None = None) -> pd.DataFrame:
+    """
+    compute_alpha_factors(px, spy, vix) for `ticker` from `start`, from the LRU, then
+    the on-disk store, then by extending the last stored table when only new bars were
+    appended, then computed in full. Callers get their own copy.
+    Batch callers can pass the SPY/^VIX closes (as get_close(.., start) returns them)
+    once for many tickers instead of having each computation load them.
+    """
+    reference = (spy, vix) if spy is not None and vix is not None else None
+    key = _fingerprint("factors", ticker, start, factor_version())
+    return _factors.do(key, lambda: _compute_factors(key, ticker, start, reference)).copy()
+
+
+def _compute_columns(ticker: str, start: str, columns) -> pd.DataFrame:
+    needs = FACTORS.requires(columns)
+    px = get_ohlcv(ticker, start)
+    if px is None or px.empty:
+        raise RuntimeError(f"No data for {ticker}")
+    spy = get_close("SPY", start) if "spy" in needs else None
+    vix = get_close("^VIX", start) if "vix" in needs else None
+    return compute_alpha_factors(px, spy=spy, vix=vix, sector=None, columns=columns, compact=FACTOR_COMPACT)
+
+
+def factor_columns(ticker: str, start: str, columns) -> pd.DataFrame:
+    """
+    factor_table(ticker, start) restricted to the price columns and the derived
+    `columns`. It is sliced from the full table when that is already in the LRU or
+    the store. Otherwise only the registry nodes those columns depend on are evaluated
+    (and only the cross-asset series they read are loaded), and the subset is
+    memoised but not stored. Unknown names raise KeyError.
+    """
+    columns = list(dict.fromkeys(columns))
+    FACTORS.closure(columns)  # KeyError before any I/O
+    key = _fingerprint("factors", ticker, start, factor_version())
+    full = _factors.peek(key)
+    if full is None and os.path.exists(_factor_path(ticker, key)):
+        full = factor_table(ticker, start)
+    if full is not None:
+        derived = set(FACTORS.outputs())
+        return full[[c for c in full.columns if c not in derived or c in columns]].copy()
+    sub = (key, tuple(sorted(columns)))
+    return _factors.do(sub, lambda: _compute_columns(ticker, start, columns)).copy()
+
+
+# ---------------------------
+# Walk-forward results (default model)
+# ---------------------------
+def _result_path(key: str) -> str:
+    return os.path.join(MODEL_CACHE_DIR, f"wf_{key}.pkl")
+
+
+def _compute_walkforward(key: str, ticker: str, start: str, horizon: str) -> dict:
+    path = _result_path(key)
+    if os.path.exists(path):
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # unreadable: recompute below
+    px, spy, vix = _inputs(ticker, start)
+    res = run_walkforward_xgb(px, spy=spy, vix=vix, sector=None, horizon=horizon,
+                              df_all=factor_table(ticker, start))
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+
+    def _dump(tmp: str) -> None:
+        with open(tmp, "wb") as f:
+            pickle.dump(res, f, protocol=pickle.HIGHEST_PROTOCOL)
+    atomic_write(path, _dump)
+    _prune(os.path.join(MODEL_CACHE_DIR, "wf_*.pkl"), MODEL_CACHE_KEEP)
+    return res
+
+
+def walkforward_result(ticker: str, start: str, horizon: str = "1d") -> dict:
+    """
+    run_walkforward_xgb(px, spy, vix, horizon=horizon) with default params, cached.
+    Returns a new dict per call (the Series/frames inside are shared: do not mutate them).
+    """
+    key = _fingerprint("walkforward", ticker, start, code_version(), horizon)
+    return dict(_results.do(key, lambda: _compute_walkforward(key, ticker, start, horizon)))
+
+
+# ---------------------------
+# PCA diagnostics
+# ---------------------------
+def _compute_pca(ticker: str, start: str, n_components: int, topk_loadings: int,
+                 rolling_window: int | None, rolling_step: int, solver: str) -> dict:
+    df = factor_table(ticker, start)
+    feats = feature_columns(df)
+    prefix = partial(_pca_prefix.stats, (ticker.upper(), str(start), tuple(feats)))
+    return compute_pca_diagnostics(df, feats, n_components=n_components, topk_loadings=topk_loadings,
+                                   solver=solver, rolling_window=rolling_window,
+                                   rolling_step=rolling_step, stats=prefix)
+
+
+def pca_diagnostics(ticker: str, start: str, n_components: int = 8, topk_loadings: int = 8,
+                    rolling_window: int | None = None, rolling_step: int = 5,
+                    solver: str | None = None) -> dict:
+    """
+    compute_pca_diagnostics over feature_columns(factor_table(ticker, start)), memoised
+    under the factor table's fingerprint. A new fingerprint that only added bars still
+    avoids a full refit: the covariance solver merges the new rows into the statistics
+    kept for the previous table's settled rows. Returns a new dict per call.
+    """
+    rolling_window = int(rolling_window) if rolling_window else None
+    key = _fingerprint("factors", ticker, start, factor_version())
+    params = (n_components, topk_loadings, rolling_window, rolling_step, solver or PCA_SOLVER)
+    return dict(_pca.do(("pca", key, params), lambda: _compute_pca(ticker, start, *params)))
+
+
+def cache_stats() -> Dict[str, dict]:
+    return {"factors": _factors.stats(), "walkforward": _results.stats(),
+            "pca": dict(_pca.stats(), merged=_pca_prefix.merged)}
@@ -0,0 +1,106 @@
+# core/research/registry.py
+"""
+Dependency-aware registry of factor nodes.
+
+Each node names the nodes it reads (deps), how many bars of history (lookback) and
+of future (lead) it needs on top of them, and a function of the deps' values.
+Output nodes are factor-table columns. Intermediate nodes hold work shared between
+outputs; for example, one RollingMoments of close feeds every mr_z_w,
+px_ma_w_dev and boll_bw_20. Evaluating a subset runs only the closure of the
+requested outputs, and each node runs once.
+
+Nodes must be registered after their deps, so registration order is a valid
+evaluation order. It is also the column order of the factor table.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Set, Tuple
+
+
+@dataclass(frozen=True)
+class Node:
+    name: str
+    fn: Callable[..., Any]
+    deps: Tuple[str, ...] = ()
+    lookback: int = 0  # bars of history beyond what the deps need
+    lead: int = 0      # bars of future beyond what the deps need
+    output: bool = True
+
+
+class FactorRegistry:
+    def __init__(self, inputs: Sequence[str]):
+        self.inputs = tuple(inputs)  # values the caller supplies (may be None)
+        self._nodes: Dict[str, Node] = {}
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Sequence[str] = (),
+            lookback: int = 0, lead: int = 0, output: bool = True) -> None:
+        if name in self._nodes or name in self.inputs:
+            raise ValueError(f"Factor node '{name}' is already defined.")
+        unknown = [d for d in deps if d not in self._nodes and d not in self.inputs]
+        if unknown:
+            raise ValueError(f"Factor node '{name}' depends on undefined {unknown}.")
+        self._nodes[name] = Node(name, fn, tuple(deps), lookback, lead, output)
+
+    def node(self, name: str, deps: Sequence[str] = (), lookback: int = 0, lead: int = 0,
+             output: bool = True):
+        """Decorator form of add()."""
+        def register(fn):
+            self.add(name, fn, deps, lookback, lead, output)
+            return fn
+        return register
+
+    # ---------------------------
+    # Graph queries
+    # ---------------------------
+    def outputs(self) -> List[str]:
+        return [n for n, node in self._nodes.items() if node.output]
+
+    def closure(self, names: Iterable[str] | None = None) -> List[str]:
+        """Every node needed for `names` (default: all outputs), in evaluation order."""
+        wanted = self.outputs() if names is None else list(names)
+        need: Set[str] = set()
+        stack = list(wanted)
+        while stack:
+            name = stack.pop()
+            if name in need or name in self.inputs:
+                continue
+            if name not in self._nodes:
+                raise KeyError(f"Unknown factor '{name}'.")
+            need.add(name)
+            stack.extend(self._nodes[name].deps)
+        return [n for n in self._nodes if n in need]
+
+    def requires(self, names: Iterable[str] | None = None) -> Set[str]:
+        """Inputs read by the closure of `names`."""
+        return {d for n in self.closure(names) for d in self._nodes[n].deps if d in self.inputs}
+
+    def _span(self, names, attr: str) -> int:
+        span: Dict[str, int] = {}
+        for n in self.closure(names):
+            node = self._nodes[n]
+            span[n] = getattr(node, attr) + max((span.get(d, 0) for d in node.deps), default=0)
+        return max(span.values(), default=0)
+
+    def lookback(self, names: Iterable[str] | None = None) -> int:
+        """Bars of history the longest dependency chain of `names` needs."""
+        return self._span(names, "lookback")
+
+    def lead(self, names: Iterable[str] | None = None) -> int:
+        """Bars of future the longest dependency chain of `names` reads."""
+        return self._span(names, "lead")
+
+    # ---------------------------
+    # Evaluation
+    # ---------------------------
+    def evaluate(self, inputs: Dict[str, Any], names: Iterable[str] | None = None) -> Dict[str, Any]:
+        """
+        {output: value} for `names` (default: all outputs), in registration order.
+        A node returning None is absent (e.g. corr_spy_20 without a SPY series);
+        its dependents receive None.
+        """
+        wanted = set(self.outputs() if names is None else names)
+        values: Dict[str, Any] = {k: inputs.get(k) for k in self.inputs}
+        for n in self.closure(wanted):
+            node = self._nodes[n]
+            values[n] = node.fn(*(values[d] for d in node.deps))
+        return {n: values[n] for n in self._nodes if n in wanted and values.get(n) is not None}
@@ -0,0 +1,234 @@
+# core/research/rolling.py
+"""
+Trailing-window statistics from shared prefix sums.
+
+RollingMoments(x) builds the prefix sums of x and x**2 once; mean / std / var /
+zscore for any window are then O(n) differences of those prefixes, with no rescan
+per window. RollingPair(x, y) adds the cross-product prefix for cov / corr.
+x may be 1-D or (dates x columns); windows run down axis 0.
+
+Semantics follow pandas' rolling(w) with min_periods=w: the first w-1 rows, and any
+window containing a NaN, are NaN. Constant windows give exactly mean = value and
+variance 0.
+
+Long histories are handled stably. The prefix sums restart every ROLL_CHUNK rows,
+and each chunk is centered on its own mean. Every sum therefore runs over at most
+ROLL_CHUNK small deviations, however long the history or high the price level. A
+window that straddles two chunks is re-centered exactly: sums about reference a
+are shifted to reference b through the shift identities for sum(d) and sum(d**2).
+"""
+from __future__ import annotations
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROLL_CHUNK = 256
+
+
+def _as_2d(x) -> Tuple[np.ndarray, bool]:
+    """Float array with dates on axis 0 (2-D, column-major), and whether the input was 1-D."""
+    a = np.asarray(x.to_numpy() if isinstance(x, (pd.Series, pd.DataFrame)) else x, dtype=float)
+    # column-major keeps every prefix scan down axis 0 contiguous
+    return (a[:, None], True) if a.ndim == 1 else (np.asfortranarray(a), False)
+
+
+def _counts(flags: np.ndarray) -> np.ndarray:
+    """Prefix counts of a 0/1 array with a leading zero row (exact integers)."""
+    c = np.zeros((len(flags) + 1,) + flags.shape[1:], dtype=np.int64, order="F")
+    np.cumsum(flags, axis=0, out=c[1:])
+    return c
+
+
+def _chunk_cumsum(v: np.ndarray, chunk: int) -> np.ndarray:
+    """Prefix sums restarted every `chunk` rows, with a leading zero row: p[t + 1] covers row t."""
+    out = np.zeros((len(v) + 1,) + v.shape[1:], order="F")
+    for lo in range(0, len(v), chunk):
+        np.cumsum(v[lo:lo + chunk], axis=0, out=out[lo + 1:lo + 1 + chunk])
+    return out
+
+
+class _Chunks:
+    """Chunk layout shared by the series of one RollingMoments / RollingPair."""
+
+    def __init__(self, n: int, chunk: int):
+        self.n, self.chunk = n, chunk
+        self.cid = np.arange(n) // chunk
+        self.starts = np.arange(0, n, chunk)
+        self.ends = np.minimum(self.starts + chunk, n) - 1
+        self._cross: Dict[int, tuple] = {}
+
+    def cross(self, w: int):
+        """For windows (j-w, j], j = w-1 .. n-1: rows that straddle a chunk boundary,
+        the chunk of their first row, and how many of their rows fall in it."""
+        if w not in self._cross:
+            j = np.arange(w - 1, self.n)
+            i = j - w
+            ci = np.where(i < 0, 0, self.cid[np.maximum(i, 0)])
+            rows = np.nonzero(ci != self.cid[j])[0]
+            ca = ci[rows]
+            self._cross[w] = (rows, ca, self.ends[ca] - i[rows])
+        return self._cross[w]
+
+
+class _Sums:
+    """Chunk-centered prefix sums of d = x - ref[chunk] and d**2 for one (n, k) series."""
+
+    def __init__(self, a: np.ndarray, nan: np.ndarray, chunks: _Chunks):
+        self.chunks = chunks
+        if chunks.n:
+            cnt = np.add.reduceat(~nan, chunks.starts, axis=0)
+            # summed in order (cumsum), not pairwise as reduceat does: trailing padding then
+            # cannot change a chunk's reference, so a slice reproduces a full run exactly
+            tot = _chunk_cumsum(np.where(nan, 0.0, a), chunks.chunk)[chunks.ends + 1]
+            self.ref = tot / np.maximum(cnt, 1)
+        else:
+            self.ref = np.zeros((0,) + a.shape[1:])
+        self.ref_rows = self.ref[chunks.cid]
+        self.d = np.where(nan, 0.0, a - self.ref_rows)
+        self.P1 = _chunk_cumsum(self.d, chunks.chunk)
+        self.P2 = _chunk_cumsum(self.d * self.d, chunks.chunk)
+
+    def window(self, w: int):
+        """(S1, S2, ref): window sums of deviations from `ref`, the reference of each window's last chunk."""
+        c, n = self.chunks, self.chunks.n
+        # windows (j-w, j]: prefix after row j minus prefix after row j-w (zero row when j-w < 0)
+        s1 = self.P1[w:] - self.P1[:n - w + 1]
+        s2 = self.P2[w:] - self.P2[:n - w + 1]
+        ref = self.ref_rows[w - 1:]
+        rows, ca, n_a = c.cross(w)
+        if len(rows):
+            # part in the earlier chunk, about its own reference ...
+            end = c.ends[ca] + 1
+            a1 = self.P1[end] - self.P1[rows]
+            a2 = self.P2[end] - self.P2[rows]
+            # ... moved onto the later chunk's reference, then joined with the rest
+            delta = self.ref[ca] - ref[rows]
+            n_a = n_a[:, None]
+            s1[rows] = a1 + n_a * delta + self.P1[rows + w]
+            s2[rows] = a2 + 2 * delta * a1 + n_a * delta * delta + self.P2[rows + w]
+        return s1, s2, ref
+
+
+class RollingMoments:
+    """mean / var / std / zscore over any trailing windows of one series, from one set of prefixes."""
+
+    def __init__(self, x, chunk: int = ROLL_CHUNK):
+        a, self._flat = _as_2d(x)
+        self.x, self.n, self.chunk = a, len(a), chunk
+        self.nan = np.isnan(a)
+        self._nan_count = _counts(self.nan)
+        # rows that differ from their predecessor; a window without one is constant
+        self._change_count = _counts(a[1:] != a[:-1])
+        self._sums: Dict[int, _Sums] = {}
+        self._memo: Dict[tuple, np.ndarray] = {}
+
+    def _chunks_for(self, w: int) -> int:
+        # windows never span more than two chunks
+        return max(self.chunk, w)
+
+    def sums(self, w: int) -> _Sums:
+        size = self._chunks_for(w)
+        if size not in self._sums:
+            self._sums[size] = _Sums(self.x, self.nan, _Chunks(self.n, size))
+        return self._sums[size]
+
+    def _cached(self, key: tuple, build):
+        if key not in self._memo:
+            self._memo[key] = build()
+        return self._memo[key]
+
+    # --- (n - w + 1, k) blocks for rows w-1 .. n-1 ---
+    def _valid(self, w: int) -> np.ndarray:
+        c = self._nan_count
+        return self._cached(("valid", w), lambda: c[w:] == c[:len(c) - w])
+
+    def _constant(self, w: int) -> np.ndarray:
+        c = self._change_count  # c[t] = changes among rows 1..t
+        return self._cached(("const", w), lambda: c[w - 1:] == c[:len(c) - w + 1])
+
+    def _window(self, w: int):
+        return self._cached(("sums", w), lambda: self.sums(w).window(w))
+
+    def _mean(self, w: int) -> np.ndarray:
+        s1, _, ref = self._window(w)
+        return np.where(self._constant(w), self.x[w - 1:], ref + s1 / w)
+
+    def _var(self, w: int, ddof: int) -> np.ndarray:
+        s1, s2, _ = self._window(w)
+        v = np.maximum(s2 - s1 * s1 / w, 0.0) / (w - ddof)
+        return np.where(self._constant(w), 0.0, v)
+
+    def _full(self, block, w: int) -> np.ndarray:
+        """Pad to n rows (NaN before the first full window / where a window has a NaN)."""
+        out = np.full(self.x.shape, np.nan, order="F")
+        if self.n >= w:
+            out[w - 1:] = np.where(self._valid(w), block(), np.nan)
+        return out[:, 0] if self._flat else out
+
+    # --- public ---
+    def mean(self, w: int) -> np.ndarray:
+        return self._full(lambda: self._mean(w), w)
+
+    def var(self, w: int, ddof: int = 0) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._full(lambda: self._var(w, ddof), w)
+
+    def std(self, w: int, ddof: int = 0) -> np.ndarray:
+        return np.sqrt(self.var(w, ddof=ddof))
+
+    def zscore(self, w: int, eps: float = 1e-12, ddof: int = 0) -> np.ndarray:
+        """(x - mean) / (std + eps) over the trailing window, as factors.py defines it."""
+        x = self.x[:, 0] if self._flat else self.x
+        return (x - self.mean(w)) / (self.std(w, ddof=ddof) + eps)
+
+
+class RollingPair:
+    """cov / corr of two aligned series over any trailing windows (NaN where either is NaN)."""
+
+    def __init__(self, x, y, chunk: int = ROLL_CHUNK):
+        a, flat_a = _as_2d(x)
+        b, flat_b = _as_2d(y)
+        a, b = np.broadcast_arrays(a, b)
+        # pairwise: both sides missing wherever either is, as pandas' rolling cov/corr
+        a, b = a + 0 * b, b + 0 * a
+        self.x = RollingMoments(a, chunk)
+        self.y = RollingMoments(b, chunk)
+        self.x._flat = self.y._flat = flat_a and flat_b
+        self._xy: Dict[int, np.ndarray] = {}
+
+    def _cross_sum(self, w: int) -> np.ndarray:
+        """Window sums of (x - ref_x)(y - ref_y) about each window's last-chunk references."""
+        sx, sy = self.x.sums(w), self.y.sums(w)
+        c, n = sx.chunks, sx.chunks.n
+        if c.chunk not in self._xy:
+            self._xy[c.chunk] = _chunk_cumsum(sx.d * sy.d, c.chunk)
+        pxy = self._xy[c.chunk]
+        s = pxy[w:] - pxy[:n - w + 1]
+        rows, ca, n_a = c.cross(w)
+        if len(rows):
+            end = c.ends[ca] + 1
+            ax = sx.P1[end] - sx.P1[rows]
+            ay = sy.P1[end] - sy.P1[rows]
+            axy = pxy[end] - pxy[rows]
+            dx = sx.ref[ca] - sx.ref_rows[w - 1:][rows]
+            dy = sy.ref[ca] - sy.ref_rows[w - 1:][rows]
+            s[rows] = axy + dy * ax + dx * ay + n_a[:, None] * dx * dy + pxy[rows + w]
+        return s
+
+    def _cov(self, w: int, ddof: int) -> np.ndarray:
+        sx, _, _ = self.x._window(w)
+        sy, _, _ = self.y._window(w)
+        c = (self._cross_sum(w) - sx * sy / w) / (w - ddof)
+        return np.where(self.x._constant(w) | self.y._constant(w), 0.0, c)
+
+    def cov(self, w: int, ddof: int = 1) -> np.ndarray:
+        return self.x._full(lambda: self._cov(w, ddof), w)
+
+    def corr(self, w: int) -> np.ndarray:
+        """Pearson correlation; NaN where either side is constant over the window (as pandas)."""
+        def block():
+            with np.errstate(divide="ignore", invalid="ignore"):
+                r = self._cov(w, 0) / np.sqrt(self.x._var(w, 0) * self.y._var(w, 0))
+            return np.where(self.x._constant(w) | self.y._constant(w), np.nan, r)
+        return self.x._full(block, w)
@@ -0,0 +1,88 @@
+# core/research/singleflight.py
+"""
+Request coalescing with a small memo: concurrent calls for the same key share one
+load, and the result is kept for `ttl` seconds (None = until evicted, for keys that
+already fingerprint their inputs). Errors reach every waiter but are never memoised.
+"""
+from __future__ import annotations
+import threading, time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    def __init__(self, ttl: float | None = 60.0, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._memo: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (monotonic time, value)
+        self._stats = {"requests": 0, "loads": 0, "memo_hits": 0, "coalesced": 0, "errors": 0}
+
+    def _fresh(self, ts: float, now: float) -> bool:
+        return self.ttl is None or now - ts < self.ttl
+
+    def peek(self, key: Hashable):
+        """Memoised value for `key` or None; never loads and does not count as a request."""
+        with self._lock:
+            hit = self._memo.get(key)
+            return hit[1] if hit is not None and self._fresh(hit[0], time.monotonic()) else None
+
+    def do(self, key: Hashable, load: Callable[[], object]):
+        """Memoised value for `key`, else wait for an in-flight load of it, else load it here."""
+        with self._lock:
+            self._stats["requests"] += 1
+            hit = self._memo.get(key)
+            if hit is not None and self._fresh(hit[0], time.monotonic()):
+                self._memo.move_to_end(key)
+                self._stats["memo_hits"] += 1
+                return hit[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self._stats["loads"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = load()
+            with self._lock:
+                self._memo[key] = (time.monotonic(), flight.result)
+                self._memo.move_to_end(key)
+                while len(self._memo) > self.max_entries:
+                    self._memo.popitem(last=False)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Counters; `saved` = loads avoided (memo hits + coalesced waits)."""
+        with self._lock:
+            out = dict(self._stats, memo_size=len(self._memo), in_flight=len(self._inflight))
+        out["saved"] = out["memo_hits"] + out["coalesced"]
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memo.clear()
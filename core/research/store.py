@@ -0,0 +1,227 @@
+# core/research/store.py
+"""
+Partitioned columnar store for per-ticker daily frames.
+
+Layout (hive-style, readable by any Parquet/Arrow tool):
+    <root>/ticker=<SAFE>/year=<YYYY>/part.parquet
+
+Readers only open the year partitions that overlap [start, end] and push the
+date filter and column projection down into pyarrow, so asking for three months
+of SPY Close does not decode twenty years of OHLCV. Writers replace whole year
+partitions atomically; appending new bars rewrites only the current year.
+
+A caller that keeps a manifest of its partitions (the price cache's sidecar)
+writes every generation under a fresh file name (part-<id>.parquet), reads through
+the manifest (`files=`) and prunes the superseded files once the new manifest is
+in place, so a multi-year rewrite is published all at once.
+
+Without pyarrow the same layout is kept with pickled partitions (no pushdown).
+"""
+from __future__ import annotations
+import os, uuid, time, shutil
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    _ARROW_OK = True
+except Exception:
+    _ARROW_OK = False
+
+DATE_COL = "Date"
+_EXT = ".parquet" if _ARROW_OK else ".pkl"
+_PART = "part" + _EXT
+
+
+def safe_name(key: str) -> str:
+    return "".join(ch for ch in key if ch.isalnum() or ch in ("-", "_")).strip()
+
+
+# ---------------------------
+# Atomic file replacement
+# ---------------------------
+def _replace(tmp: str, path: str) -> None:
+    # Windows refuses to replace a file another process has open; retry briefly
+    for attempt in range(20):
+        try:
+            os.replace(tmp, path)
+            return
+        except PermissionError:
+            if attempt == 19:
+                raise
+            time.sleep(0.05)
+
+
+def atomic_write(path: str, write) -> None:
+    """write(tmp_path) next to `path`, then rename over it: readers never see a partial file."""
+    tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    try:
+        write(tmp)
+        _replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+# ---------------------------
+# Partitions
+# ---------------------------
+def key_dir(root: str, key: str) -> str:
+    return os.path.join(root, f"ticker={safe_name(key)}")
+
+
+def _part_path(root: str, key: str, year: int, name: str | None = None) -> str:
+    return os.path.join(key_dir(root, key), f"year={int(year)}", name or _PART)
+
+
+def new_part_name() -> str:
+    """A fresh partition file name for one write generation (part-<id>.parquet)."""
+    return f"part-{uuid.uuid4().hex[:12]}{_EXT}"
+
+
+def list_years(root: str, key: str) -> List[int]:
+    d = key_dir(root, key)
+    if not os.path.isdir(d):
+        return []
+    years = []
+    for name in os.listdir(d):
+        if name.startswith("year=") and name[5:].isdigit() and os.path.exists(os.path.join(d, name, _PART)):
+            years.append(int(name[5:]))
+    return sorted(years)
+
+
+def has_data(root: str, key: str, files: Dict[int, str | None] | None = None) -> bool:
+    """Any partition stored for `key`; with `files` (year -> file name), all of those exist."""
+    if files is None:
+        return bool(list_years(root, key))
+    return bool(files) and all(os.path.exists(_part_path(root, key, y, n)) for y, n in files.items())
+
+
+def split_years(df: pd.DataFrame) -> Dict[int, pd.DataFrame]:
+    """Rows of a DatetimeIndex-ed frame grouped by calendar year."""
+    years = df.index.year
+    return {int(y): df.loc[years == y] for y in pd.unique(years)}
+
+
+def write_partition(root: str, key: str, year: int, df: pd.DataFrame, name: str | None = None) -> None:
+    path = _part_path(root, key, year, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    out = df.rename_axis(DATE_COL)
+    if _ARROW_OK:
+        atomic_write(path, out.to_parquet)
+    else:
+        atomic_write(path, out.to_pickle)
+
+
+def write_years(root: str, key: str, df: pd.DataFrame) -> int:
+    """
+    Write a date-sorted frame as one partition per year it spans, converting it to
+    Arrow once and writing year slices of that table. Returns the partitions written.
+    """
+    if df.empty:
+        return 0
+    years = df.index.year.to_numpy()
+    bounds = list(np.flatnonzero(np.r_[True, years[1:] != years[:-1]])) + [len(df)]
+    if not _ARROW_OK:
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            write_partition(root, key, int(years[a]), df.iloc[a:b])
+        return len(bounds) - 1
+    table = pa.Table.from_pandas(df.rename_axis(DATE_COL))
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        path = _part_path(root, key, int(years[a]))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part = table.slice(a, b - a)
+        atomic_write(path, lambda tmp: pq.write_table(part, tmp))
+    return len(bounds) - 1
+
+
+def drop_partitions(root: str, key: str, years: Iterable[int] | None = None) -> None:
+    """Remove the given year partitions (all of them, and the key directory, when years is None)."""
+    if years is None:
+        shutil.rmtree(key_dir(root, key), ignore_errors=True)
+        return
+    for y in years:
+        shutil.rmtree(os.path.dirname(_part_path(root, key, y)), ignore_errors=True)
+
+
+def prune_partitions(root: str, key: str, keep: Dict[int, str | None]) -> None:
+    """
+    Remove the partition files not in `keep` (year -> file name, None = part.parquet)
+    and the years not in it. A file another process still has open (Windows) is
+    left for a later prune.
+    """
+    d = key_dir(root, key)
+    if not os.path.isdir(d):
+        return
+    for entry in os.listdir(d):
+        if not (entry.startswith("year=") and entry[5:].isdigit()):
+            continue
+        year_dir = os.path.join(d, entry)
+        if int(entry[5:]) not in keep:
+            shutil.rmtree(year_dir, ignore_errors=True)
+            continue
+        want = keep[int(entry[5:])] or _PART
+        for name in os.listdir(year_dir):
+            if name != want and name.startswith("part") and name.endswith(_EXT):
+                try:
+                    os.remove(os.path.join(year_dir, name))
+                except OSError:
+                    pass
+
+
+def read_partitions(
+    root: str,
+    key: str,
+    start=None,
+    end=None,
+    columns: List[str] | None = None,
+    files: Dict[int, str | None] | None = None,
+) -> pd.DataFrame | None:
+    """
+    Rows with start <= date <= end (either bound optional), restricted to `columns`
+    when given (unknown names are ignored). None when nothing is stored for `key`.
+    `files` (year -> file name, from a manifest) replaces listing the year directories;
+    a listed file that has been pruned meanwhile raises FileNotFoundError.
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    names = files if files is not None else dict.fromkeys(list_years(root, key))
+    years = sorted(y for y in names
+                   if (start is None or y >= start.year) and (end is None or y <= end.year))
+    if not years:
+        return None
+    files = [_part_path(root, key, y, names[y]) for y in years]
+
+    if not _ARROW_OK:
+        df = pd.concat([pd.read_pickle(f) for f in files]).sort_index()
+        if start is not None:
+            df = df.loc[df.index >= start]
+        if end is not None:
+            df = df.loc[df.index <= end]
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        df.index.name = None
+        return df
+
+    dataset = ds.dataset(files, format="parquet")
+    cols = None
+    if columns is not None:
+        names = set(dataset.schema.names)
+        cols = [c for c in columns if c in names and c != DATE_COL] + [DATE_COL]
+    date = ds.field(DATE_COL)
+    filt = None
+    if start is not None:
+        filt = date >= pa.scalar(start.to_datetime64())
+    if end is not None:
+        cond = date <= pa.scalar(end.to_datetime64())
+        filt = cond if filt is None else (filt & cond)
+    df = dataset.to_table(columns=cols, filter=filt).to_pandas()
+    if DATE_COL in df.columns:
+        df = df.set_index(DATE_COL)
+    df.index = pd.DatetimeIndex(df.index)
+    df.index.name = None
+    return df.sort_index()
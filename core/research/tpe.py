@@ -0,0 +1,142 @@
+# core/research/tpe.py
+"""
+Tree-structured Parzen estimator (TPE) search over hyper-parameter ranges, numpy only.
+
+A space maps every parameter to a range, a set of choices or a fixed value:
+
+    {"learning_rate": {"low": 0.01, "high": 0.3, "log": True},
+     "max_depth": [2, 8],                     # two ints: integer range; two floats: float range
+     "tree_method": {"choices": ["hist", "approx"]},
+     "n_jobs": 1}                             # anything else is passed through as is
+
+TPESampler(space, seed).ask(n) proposes n parameter dicts and tell(params, score)
+records a result (higher is better). The first n_startup proposals are uniform. After
+that the trials are split into the best `gamma` share and the rest, every parameter gets
+a Parzen density over each group (in [0, 1], on a log scale where asked), and the
+proposal is, one parameter at a time, the best of n_candidates draws from the good
+density by the ratio good / rest (Bergstra et al., 2011). Seeded runs are reproducible.
+"""
+from __future__ import annotations
+import math
+from typing import Any, Dict, List
+
+import numpy as np
+
+
+class _Dim:
+    """One parameter: 'float' / 'int' range (optionally log-scaled), 'choice' or 'fixed'."""
+
+    def __init__(self, name: str, spec: Any):
+        self.name, self.log = name, False
+        if isinstance(spec, dict) and "choices" in spec:
+            self.kind, self.choices = "choice", list(spec["choices"])
+            if not self.choices:
+                raise ValueError(f"Parameter '{name}' has no choices.")
+        elif isinstance(spec, dict) and "low" in spec and "high" in spec:
+            lo, hi = spec["low"], spec["high"]
+            self.kind = "int" if spec.get("int", isinstance(lo, int) and isinstance(hi, int)) else "float"
+            self._range(lo, hi, bool(spec.get("log", False)))
+        elif isinstance(spec, (list, tuple)) and len(spec) == 2 and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in spec):
+            self.kind = "int" if all(isinstance(v, int) for v in spec) else "float"
+            self._range(spec[0], spec[1], False)
+        else:
+            self.kind, self.value = "fixed", spec
+
+    def _range(self, lo, hi, log: bool):
+        lo, hi = float(lo), float(hi)
+        if not hi > lo:
+            raise ValueError(f"Parameter '{self.name}' needs low < high.")
+        if log and lo <= 0:
+            raise ValueError(f"Parameter '{self.name}' needs low > 0 on a log scale.")
+        self.log = log
+        self.lo, self.hi = (math.log(lo), math.log(hi)) if log else (lo, hi)
+        self.bounds = (lo, hi)
+
+    def to_unit(self, value) -> float:
+        t = math.log(value) if self.log else float(value)
+        return (t - self.lo) / (self.hi - self.lo)
+
+    def from_unit(self, u: float):
+        t = self.lo + float(np.clip(u, 0.0, 1.0)) * (self.hi - self.lo)
+        v = math.exp(t) if self.log else t
+        if self.kind == "int":
+            return int(np.clip(round(v), *self.bounds))
+        return float(np.clip(v, *self.bounds))
+
+
+def _parzen(centers: np.ndarray) -> tuple[np.ndarray, float]:
+    """Component centres and bandwidth (Scott's rule, clipped) of a density in [0, 1]."""
+    n = len(centers)
+    if n < 2:
+        return centers, 0.25
+    return centers, float(np.clip(centers.std() * n ** -0.2, 0.03, 0.5))
+
+
+def _pdf(x: np.ndarray, centers: np.ndarray, bw: float) -> np.ndarray:
+    """Mixture of N(center, bw) and one uniform prior component over [0, 1], equally weighted."""
+    if not len(centers):
+        return np.ones_like(x)
+    z = (x[:, None] - centers[None, :]) / bw
+    gauss = np.exp(-0.5 * z ** 2).sum(axis=1) / (bw * math.sqrt(2 * math.pi))
+    return (gauss + 1.0) / (len(centers) + 1)
+
+
+class TPESampler:
+    def __init__(self, space: Dict[str, Any], seed: int = 0, n_startup: int = 8,
+                 gamma: float = 0.25, n_candidates: int = 24):
+        if not space:
+            raise ValueError("Empty search space.")
+        self.dims = [_Dim(k, v) for k, v in space.items()]
+        self.rng = np.random.default_rng(seed)
+        self.n_startup, self.gamma, self.n_candidates = n_startup, gamma, n_candidates
+        self.trials: List[tuple[dict, float]] = []
+
+    def tell(self, params: dict, score: float) -> None:
+        self.trials.append((params, float(score) if np.isfinite(score) else -np.inf))
+
+    def ask(self, n: int = 1) -> List[dict]:
+        return [self._propose() for _ in range(n)]
+
+    def _split(self) -> tuple[list, list]:
+        order = sorted(range(len(self.trials)), key=lambda i: (-self.trials[i][1], i))
+        n_good = max(1, math.ceil(self.gamma * len(order)))
+        return [self.trials[i][0] for i in order[:n_good]], [self.trials[i][0] for i in order[n_good:]]
+
+    def _propose(self) -> dict:
+        random = len(self.trials) < self.n_startup
+        good, bad = (None, None) if random else self._split()
+        out = {}
+        for d in self.dims:
+            if d.kind == "fixed":
+                out[d.name] = d.value
+            elif d.kind == "choice":
+                out[d.name] = d.choices[self._choice(d, good, bad)]
+            else:
+                out[d.name] = d.from_unit(self.rng.random() if random else self._numeric(d, good, bad))
+        return out
+
+    def _choice(self, d: _Dim, good, bad) -> int:
+        k = len(d.choices)
+        if good is None:
+            return int(self.rng.integers(k))
+
+        def weights(trials):
+            w = np.ones(k)  # one prior count per choice
+            for p in trials:
+                if p.get(d.name) in d.choices:
+                    w[d.choices.index(p[d.name])] += 1
+            return w / w.sum()
+        lw, gw = weights(good), weights(bad)
+        draws = self.rng.choice(k, size=self.n_candidates, p=lw)
+        return int(draws[np.argmax(lw[draws] / gw[draws])])
+
+    def _numeric(self, d: _Dim, good, bad) -> float:
+        lc, lbw = _parzen(np.array([d.to_unit(p[d.name]) for p in good if d.name in p]))
+        gc, gbw = _parzen(np.array([d.to_unit(p[d.name]) for p in bad if d.name in p]))
+        # draws from the good density: a component (or the uniform prior), then its Gaussian
+        comp = self.rng.integers(len(lc) + 1, size=self.n_candidates)
+        from_good = comp < len(lc)
+        draws = self.rng.random(self.n_candidates)  # the prior component: uniform
+        draws[from_good] = lc[comp[from_good]] + self.rng.normal(0.0, lbw, size=int(from_good.sum()))
+        draws = np.clip(draws, 0.0, 1.0)
+        return float(draws[np.argmax(_pdf(draws, lc, lbw) / _pdf(draws, gc, gbw))])
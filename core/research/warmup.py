@@ -0,0 +1,116 @@
+# core/research/warmup.py
+"""
+Warm-up for the configured default universe: refresh prices, build factor tables and
+fit the default walk-forward models ahead of the first request (see precompute.py).
+
+Env:
+  DEFAULT_UNIVERSE   comma-separated tickers (also served by /api/settings)
+  WARMUP_ON_START    1 to run in a background thread when `python main.py` starts
+  WARMUP_START       history start (default 2015-01-01, as the research endpoints)
+  WARMUP_HORIZONS    comma-separated walk-forward horizons (default 1d)
+  WARMUP_WORKERS     worker threads (default 2)
+"""
+from __future__ import annotations
+import os, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List
+
+import pandas as pd
+
+from .marketdata import refresh_prices
+from .precompute import REFERENCE, factor_table, walkforward_result
+
+DEFAULT_UNIVERSE: List[str] = [
+    t.strip().upper() for t in os.getenv("DEFAULT_UNIVERSE", "AAPL,MSFT,GOOGL,AMZN").split(",") if t.strip()
+]
+WARMUP_START = os.getenv("WARMUP_START", "2015-01-01")
+WARMUP_HORIZONS = [h.strip() for h in os.getenv("WARMUP_HORIZONS", "1d").split(",") if h.strip()]
+WARMUP_WORKERS = int(os.getenv("WARMUP_WORKERS", 2))
+
+_lock = threading.Lock()
+_status: Dict[str, object] = {"state": "idle"}
+_thread: threading.Thread | None = None
+
+
+def _now() -> str:
+    return pd.Timestamp.now(tz="UTC").isoformat()
+
+
+def _update(**changes) -> None:
+    with _lock:
+        _status.update(changes)
+
+
+def warmup_status() -> Dict[str, object]:
+    """state: idle | running | done | failed, plus per-step progress and per-ticker errors."""
+    with _lock:
+        out = dict(_status)
+        out["errors"] = dict(out.get("errors", {}))
+    total = int(out.get("steps_total", 0) or 0)
+    out["progress"] = (float(out.get("steps_done", 0)) / total) if total else (1.0 if out["state"] == "done" else 0.0)
+    out["ready"] = out["state"] == "done"
+    return out
+
+
+def _step_done() -> None:
+    with _lock:
+        _status["steps_done"] += 1
+
+
+def _warm_ticker(ticker: str, start: str, horizons: List[str]) -> None:
+    factor_table(ticker, start)
+    _step_done()
+    for h in horizons:
+        walkforward_result(ticker, start, h)
+        _step_done()
+
+
+def run_warmup(
+    tickers: List[str] | None = None,
+    start: str | None = None,
+    horizons: List[str] | None = None,
+    workers: int | None = None,
+) -> Dict[str, object]:
+    """
+    Warm `tickers` (default DEFAULT_UNIVERSE) with at most `workers` tickers in flight.
+    Blocks until done and returns the final warmup_status(). Per-ticker failures are
+    recorded and do not stop the others.
+    """
+    tickers = [t.upper() for t in (tickers or DEFAULT_UNIVERSE)]
+    start = start or WARMUP_START
+    horizons = list(horizons or WARMUP_HORIZONS)
+    workers = max(1, int(workers or WARMUP_WORKERS))
+    _update(state="running", started_at=_now(), finished_at=None, universe=tickers, start=start,
+            horizons=horizons, steps_total=len(tickers) * (1 + len(horizons)), steps_done=0,
+            tickers_done=0, errors={})
+    try:
+        # one grouped refresh for the universe and the cross-asset series
+        have = set(refresh_prices(tickers + list(REFERENCE), start))
+        errors = {t: f"No data for {t}" for t in tickers if t not in have}
+        _update(steps_total=len(have.intersection(tickers)) * (1 + len(horizons)), errors=dict(errors))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="warmup") as pool:
+            futs = {pool.submit(_warm_ticker, t, start, horizons): t for t in tickers if t in have}
+            for fut in as_completed(futs):
+                try:
+                    fut.result()
+                except Exception as e:
+                    errors[futs[fut]] = str(e)
+                with _lock:
+                    _status["tickers_done"] += 1
+                    _status["errors"] = dict(errors)
+        _update(state="done", finished_at=_now(), errors=errors)
+    except Exception as e:
+        _update(state="failed", finished_at=_now(), error=str(e))
+    return warmup_status()
+
+
+def start_background_warmup(**kwargs) -> threading.Thread | None:
+    """Start run_warmup(**kwargs) in a daemon thread unless one is already running."""
+    global _thread
+    with _lock:
+        if _thread is not None and _thread.is_alive():
+            return None
+        _status.update(state="running", steps_done=0, steps_total=0)
+        _thread = threading.Thread(target=run_warmup, kwargs=kwargs, name="warmup", daemon=True)
+        _thread.start()
+        return _thread
@@ -5,13 +5,15 @@ from datetime import datetime
 import numpy as np
 import pandas as pd
 import requests
-import yfinance as yf
 from flask import Flask, request, jsonify, render_template
 from dotenv import load_dotenv
 
 from core.features import ta_features
 from core.backtest import run_backtest
+from core.news import fetch_headlines, fetch_headlines_many
 from core.research.report import report_bp
+from core.research.marketdata import get_history
+from core.research.ohlcv import close_series
 
 
 # NEW: research blueprint (walk-forward ML + backtest)
@@ -91,21 +93,13 @@ NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 
 
 def fetch_news(ticker: str):
-    if not NEWS_API_KEY:
-        raise RuntimeError("Missing NEWS_API_KEY environment variable.")
-    url = "https://newsapi.org/v2/everything"
-    params = {
-        "q": ticker,
-        "language": "en",
-        "sortBy": "publishedAt",
-        "pageSize": 5,
-        "apiKey": NEWS_API_KEY,
-    }
-    r = requests.get(url, params=params, timeout=15)
-    r.raise_for_status()
-    data = r.json()
-    articles = data.get("articles", [])
-    return [a.get("title", "").strip() for a in articles if a.get("title")]
+    """Latest headlines for a ticker (served from the local headline store within NEWS_TTL_SECONDS)."""
+    return fetch_headlines(ticker, NEWS_API_KEY)
+
+
+def fetch_news_many(tickers):
+    """{ticker: headlines or exception}; stale tickers are fetched concurrently."""
+    return fetch_headlines_many(tickers, NEWS_API_KEY)
 
 
 # ---------------- yfinance helpers ----------------
@@ -114,61 +108,18 @@ def normalize_close(df: pd.DataFrame, ticker: str) -> pd.Series:
     Return a 1D Close-price Series with a DatetimeIndex,
     no MultiIndex columns, and tz-naive index.
     """
-    if df is None or df.empty:
-        return pd.Series(dtype="float64")
-
-    # make index tz-naive
-    if getattr(df.index, "tz", None) is not None:
-        df = df.tz_convert(None)
-
-    # collapse MultiIndex if present
-    if isinstance(df.columns, pd.MultiIndex):
-        # try selecting by ticker on any level
-        for level in range(df.columns.nlevels):
-            vals = df.columns.get_level_values(level)
-            if ticker in vals:
-                try:
-                    df = df.xs(ticker, axis=1, level=level, drop_level=True)
-                    break
-                except Exception:
-                    pass
-        # if still multi, try first level 'Close'
-        if isinstance(df.columns, pd.MultiIndex) and "Close" in df.columns.get_level_values(0):
-            df = df.xs("Close", axis=1, level=0, drop_level=True).to_frame(name="Close")
-
-    df = df.rename(columns=lambda c: str(c).title())
-
-    close_col = "Close" if "Close" in df.columns else ("Adj Close" if "Adj Close" in df.columns else None)
-    if close_col is None:
-        return pd.Series(dtype="float64")
-
-    s = pd.to_numeric(df[close_col], errors="coerce").dropna()
-    s.index = pd.to_datetime(s.index).tz_localize(None)
-    s.name = "Close"
-    return s
+    return close_series(df, ticker)
 
 
 def get_price_history(ticker: str, period: str = "2y") -> pd.DataFrame:
     """
-    Returns a DataFrame with a single 'Close' column (normalized).
+    Returns a DataFrame with a single 'Close' column (normalized),
+    served from the shared market-data cache.
     """
     try:
-        raw = yf.download(
-            tickers=ticker,
-            period=period,
-            interval="1d",
-            auto_adjust=True,
-            progress=False,
-            group_by="column",
-            threads=False,
-        )
+        return get_history(ticker, period=period)
     except Exception:
-        raw = pd.DataFrame()
-
-    s = normalize_close(raw, ticker)
-    if s.empty:
         return pd.DataFrame()
-    return pd.DataFrame({"Close": s})
 
 
 def fetch_stock_price(ticker: str) -> str:
@@ -367,4 +318,12 @@ def react_catchall(path):
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    debug = True
+    # Optional: pre-fetch prices, factors and default models for the default universe
+    # in the background (progress at /api/warmup/status). With the debug reloader this
+    # file runs in a watcher process and again in the serving child: only the child
+    # (WERKZEUG_RUN_MAIN=true) warms up, so nothing is downloaded twice.
+    if os.getenv("WARMUP_ON_START", "0") == "1" and (not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+        from core.research.warmup import start_background_warmup
+        start_background_warmup()
+    app.run(debug=debug)